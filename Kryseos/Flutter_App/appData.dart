@@ -20,6 +20,9 @@ class AppData extends ChangeNotifier {
   List<double> equity = [];
   List<DateTime> history = [];
 
+  // Sequence number of the last performance_update applied; -1 until a snapshot arrives
+  int feedbackSeq = -1;
+
   List<MapEntry<DateTime, double>> get equityWithHistory {
     final result = <MapEntry<DateTime, double>>[];
     final len = history.length < equity.length ? history.length : equity.length;
@@ -65,6 +68,48 @@ class AppData extends ChangeNotifier {
     notifyListeners();
   }
 
+  /// Applies a versioned performance_update (snapshot or delta).
+  /// Returns false on a sequence gap, when the caller should ask for a resync.
+  bool applyPerformanceMessage(Map<String, dynamic> message) {
+    final int seq = message['seq'];
+    final data = Map<String, dynamic>.from(message['data'] ?? {});
+
+    if (message['mode'] == 'snapshot') {
+      feedbackSeq = seq;
+      updateFromServer(data);
+      return true;
+    }
+    if (feedbackSeq >= 0 && seq <= feedbackSeq) return true; // already part of the snapshot
+    if (feedbackSeq < 0 || seq != feedbackSeq + 1) return false;
+
+    final dateFormat = DateFormat("MMM d, yyyy, hh:mm:ss a");
+    final trim = Map<String, dynamic>.from(message['trim'] ?? {});
+    final append = Map<String, dynamic>.from(message['append'] ?? {});
+
+    equity = _applyListDelta(equity, trim['equity_history'], append['equity_history'],
+        (v) => (v as num).toDouble());
+    profitRatios = _applyListDelta(profitRatios, trim['trade_profit_ratios'], append['trade_profit_ratios'],
+        (v) => (v as num).toDouble());
+    try {
+      history = _applyListDelta(history, trim['sell_fill_times'], append['sell_fill_times'],
+          (v) => dateFormat.parse(v as String));
+    } catch (e) {
+      print("❌ Failed to parse sell_fill_times: $e");
+      return false;
+    }
+
+    feedbackSeq = seq;
+    updateFromServer(data);
+    return true;
+  }
+
+  List<T> _applyListDelta<T>(List<T> current, dynamic trim, dynamic append, T Function(dynamic) convert) {
+    if (trim == null && append == null) return current;
+    final int dropped = trim ?? 0;
+    final kept = dropped >= current.length ? <T>[] : current.sublist(dropped);
+    return [...kept, ...List.from(append ?? []).map(convert)];
+  }
+
 
 
   void updateBotStatus(String newStatus) {
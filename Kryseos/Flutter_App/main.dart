@@ -14,12 +14,19 @@ void startWebSocket(BuildContext context, String userId) {
   );
 
   appData.setChannel(newChannel); // ✅ Store in AppData
+  appData.feedbackSeq = -1; // a new connection starts with a snapshot
 
   newChannel.stream.listen(
         (message) {
       try {
         final data = jsonDecode(message);
-        if (data['type'] == 'performance_update' && data['data'] != null) {
+        if (data['type'] == 'performance_update' && data['v'] == 2) {
+          print('🔄 Received performance ${data['mode']} #${data['seq']}');
+          if (!appData.applyPerformanceMessage(Map<String, dynamic>.from(data))) {
+            print('🔁 Missed a performance update, requesting resync');
+            newChannel.sink.add(jsonEncode({'type': 'resync'}));
+          }
+        } else if (data['type'] == 'performance_update' && data['data'] != null) {
           print('🔄 Received performance update: ${jsonEncode(data['data'])}');
           appData.updateFromServer(data['data']);
         } else if (data['type'] == 'bot_status' && data['data'] != null) {
@@ -1,88 +1,123 @@
-from binance.client import Client
+import threading
+import numpy as np
 import pandas as pd
-import os
-import joblib
-import sys
-import io
+from market_data import get_closed_klines, klines_to_frame
+from indicators import macd, rsi, as_array
+
+SCALER_FILES = {
+    "BTC/USD": "scaler_standard-BTC-25D.pkl",
+    "ETH/USD": "scaler_standard-ETH-10D.pkl"
+}
+
+# Model name, RSI upper bound and RSI lower bound for each symbol
+ML_SYMBOLS = {
+    "BTC/USD": ("BTC", 83, 25),
+    "ETH/USD": ("ETH", 80, 15)
+}
+
+MODEL_FILES = {
+    "BTC": "model-daily-MACD-BTC-25D.h5",
+    "ETH": "model-daily-MACD-ETH-10D.h5"
+}
+
+# Days of features each model looks at
+MODEL_WINDOWS = {
+    "BTC/USD": 25,
+    "ETH/USD": 10
+}
+
+# Extra days fetched before the window so MACD (26) and RSI have warmed up
+FEATURE_WARMUP_DAYS = 26 + 10
+
+# Scalers are unpickled once per process, on first use
+_scalers = {}
+_scalers_lock = threading.Lock()
+
+
+def get_scaler(symbol):
+    scaler = _scalers.get(symbol)
+    if scaler is None:
+        with _scalers_lock:
+            if symbol not in _scalers:
+                import joblib
+                _scalers[symbol] = joblib.load(SCALER_FILES[symbol])
+            scaler = _scalers[symbol]
+    return scaler
 
-def get_historical_data(symbol):
 
+def preload_scalers():
+    for symbol in SCALER_FILES:
+        get_scaler(symbol)
+
+
+def build_features(close, scaler_std):
     """
-    Fetches OHLCV from Binance, computes continuous Target (% change), MACD, MACD_Signal,
-    scales MACD features, and returns:
-        - np.array of shape (1, window, 3)
-        - last RSI value as integer
+    Computes the model features for every bar of a close-price series:
+        - DataFrame of Target (% change), scaled MACD and scaled MACD_Signal
+        - RSI series aligned with it
     """
-    # Extract_scalers
-    if symbol == "BTC/USD":
-        scaler_std = joblib.load("scaler_standard-BTC-25D.pkl")
-        symbol = "BTCUSDT"
-        window = 25
-
-    elif symbol == "ETH/USD":
-        scaler_std = joblib.load("scaler_standard-ETH-10D.pkl")
-        symbol = "ETHUSDT"
-        window = 10
-
-    extra_days = 26 + 10
-    lookback = window + extra_days
-
-    # Initialize Binance client
-    api_key = os.getenv('BINANCE_API_KEY', '')
-    secret_key = os.getenv('BINANCE_SECRET_KEY', '')
-    client = Client(api_key, secret_key)
-
-    # Fetch klines (1-hour interval)
-    klines = client.get_klines(
-        symbol=symbol,
-        interval=Client.KLINE_INTERVAL_1DAY,
-        limit=lookback
-    )
-
-    # Convert to DataFrame
-    cols = [
-        'timestamp', 'open', 'high', 'low', 'close', 'volume',
-        'close_time', 'quote_asset_volume', 'trades',
-        'taker_buy_base', 'taker_buy_quote', 'ignore'
-    ]
-    df = pd.DataFrame(klines, columns=cols)
-    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-    df.set_index('timestamp', inplace=True)
-    df['close'] = df['close'].astype(float)
-
     # Build DataFrame with close and continuous Target
-    data = pd.DataFrame({'close': df['close']})
+    data = pd.DataFrame({'close': close})
     data['Target'] = data['close'].pct_change() * 100
 
     # Compute MACD and MACD signal
-    ema12 = data['close'].ewm(span=12, adjust=False).mean()
-    ema26 = data['close'].ewm(span=26, adjust=False).mean()
-    data['MACD'] = ema12 - ema26
-    data['MACD_Signal'] = data['MACD'].ewm(span=9, adjust=False).mean()
+    close = data['close'].to_numpy()
+    data['MACD'], data['MACD_Signal'] = macd(close, 12, 26, 9)
 
     # Compute RSI series (not added to `data`)
-    delta = data['close'].diff(1)
-    gain = delta.where(delta > 0, 0).rolling(14).mean()
-    loss = -delta.where(delta < 0, 0).rolling(14).mean()
-    rs = gain / loss
-    rsi_series = 100 - (100 / (1 + rs))
+    rsi_series = pd.Series(rsi(close, period=14), index=data.index)
 
     # Drop NaNs and keep only required columns
     data.dropna(inplace=True)
-    data = data[['Target', 'MACD', 'MACD_Signal']]
-
-    # Take the last `window` rows
-    window_df = data.iloc[-window:].copy()
+    data = data[['Target', 'MACD', 'MACD_Signal']].copy()
 
     # Scale MACD features
     macd_cols = ['MACD_Signal','MACD']
-    window_df[macd_cols] = scaler_std.transform(window_df[macd_cols])
+    data[macd_cols] = scaler_std.transform(data[macd_cols])
+
+    # Align RSI series with valid data indices
+    return data, rsi_series.loc[data.index]
+
+def signals_ML(predictions, rsi_values, upper, lower):
+    """Signal array: BUY when the model predicts a rise while RSI is oversold, SELL on the opposite."""
+    predictions = as_array(predictions)
+    rsi_values = np.trunc(as_array(rsi_values))
+    buy = (predictions > 0) & (rsi_values < lower)
+    sell = (predictions < 0) & (rsi_values > upper)
+    return buy.astype(np.int8) - sell.astype(np.int8)
+
+def get_historical_data(symbol):
+
+    """
+    Fetches OHLCV from Binance, computes continuous Target (% change), MACD, MACD_Signal,
+    scales MACD features, and returns:
+        - np.array of shape (1, window, 3)
+        - last RSI value as integer
+        - timestamp of the last bar, used as the prediction cache key
+    """
+    lookback = MODEL_WINDOWS[symbol] + FEATURE_WARMUP_DAYS
+
+    # Fetch klines (1-day interval)
+    klines = get_closed_klines(symbol, "1d", lookback)
+    return features_ML(klines_to_frame(klines), symbol)
+
+def features_ML(df, symbol):
+    """Model input, last RSI and last bar time from daily candles (see get_historical_data)."""
+    # Extract_scalers
+    scaler_std = get_scaler(symbol)
+    window = MODEL_WINDOWS[symbol]
+
+    # Same history length as the model has always been fed, whatever the caller passes
+    df = df.iloc[-(window + FEATURE_WARMUP_DAYS):]
+    data, rsi_valid = build_features(df['close'], scaler_std)
+
+    # Take the last `window` rows
+    window_df = data.iloc[-window:]
 
     # Build input array
     arr = window_df.to_numpy(dtype='float32').reshape(1, window, 3)
 
-    # Align RSI series with valid data indices and get last RSI value
-    rsi_valid = rsi_series.loc[data.index]
+    # Get last RSI value
     last_rsi = int(rsi_valid.iloc[-1])
 
-    return arr, last_rsi
+    return arr, last_rsi, window_df.index[-1]
@@ -1,85 +1,52 @@
-import alpaca_trade_api as tradeapi
-import pandas as pd
 import numpy as np
-from binance.client import Client
-import os
+from market_data import get_closed_klines, klines_to_frame, resample_closed
+from indicators import rsi, sma, as_array, shift, to_signal
+from streaming_indicators import BarStream, RollingMean, RSI
 
 
 def get_historical_data_RSI(lookback=50,symbol = "BTCUSDT"):
-    
-    if (symbol == "BTC/USD"):
-        symbol = "BTCUSDT"
-    elif(symbol == "ETH/USD"):
-        symbol = "ETHUSDT"
-
-
-    BINANCE_API_KEY = os.getenv("BINANCE_API_KEY", "")
-    BINANCE_SECRET_KEY = os.getenv("BINANCE_SECRET_KEY", "")
-    client = Client(BINANCE_API_KEY, BINANCE_SECRET_KEY)
 
     # Fetch hourly klines since we will aggregate them into 10-hour candles.
-    # To get 'lookback' number of 10H candles, we need at least lookback*10 hourly candles.
-    klines = client.get_klines(symbol=symbol, interval=Client.KLINE_INTERVAL_1HOUR, limit=lookback*10)
-    
-    # Define column names returned by the Binance API
-    columns = ["timestamp", "open", "high", "low", "close", "volume", "close_time",
-               "quote_asset_volume", "number_of_trades", "taker_buy_base", "taker_buy_quote", "ignore"]
-    df = pd.DataFrame(klines, columns=columns)
-
-    # Convert timestamp to datetime and relevant columns to float
-    df["timestamp"] = pd.to_datetime(df["timestamp"], unit="ms")
-    df[["open", "high", "low", "close", "volume"]] = df[["open", "high", "low", "close", "volume"]].astype(float)
-
-    # Set timestamp as index and sort by time
-    df.set_index("timestamp", inplace=True)
-    df = df.sort_index()
-
-    # Resample to 10-hour candles
-    df_resampled = df.resample("10h").agg({
-        "open": "first",
-        "high": "max",
-        "low": "min",
-        "close": "last",
-        "volume": "sum"
-    })
+    # To get 'lookback' complete 10H candles, we need one candle's worth more than lookback*10 hourly candles.
+    klines = get_closed_klines(symbol, "1h", (lookback + 1) * 10)
+    df = klines_to_frame(klines)
 
+    # Resample to 10-hour candles (epoch-aligned, complete candles only)
+    return indicators_RSI(resample_closed(df, "10h"))
 
+def indicators_RSI(df):
+    """Adds RSI and the SMA50 trend filter to 10-hour candles."""
     # Compute RSI (period=14) on the 10-hour candles
-    period = 14
-    delta = df_resampled['close'].diff()
-    gain = delta.where(delta > 0, 0)
-    loss = -delta.where(delta < 0, 0)
-    avg_gain = gain.rolling(window=period).mean()
-    avg_loss = loss.rolling(window=period).mean()
-    RS = avg_gain / avg_loss
-    df_resampled['RSI'] = 100 - (100 / (1 + RS))
+    close = df['close'].to_numpy()
+    df['RSI'] = rsi(close, period=14)
 
     # Compute a 50-period SMA on the 10-hour candles for trend filtering
-    df_resampled['SMA50'] = df_resampled['close'].rolling(window=50).mean()
+    df['SMA50'] = sma(close, 50)
 
-    return df_resampled
+    return df
 
-def check_signal_RSI(data):
-    """Generates BUY/SELL signals based on RSI and SMA50 (trend)."""
-    latest = data.iloc[-1]
-    prev = data.iloc[-2]
-    
-    current_price = latest['close']
-    current_SMA50 = latest['SMA50']
+def stream_RSI():
+    """`indicators_RSI` updated one closed 10-hour candle at a time."""
+    strength, trend = RSI(14), RollingMean(50)
+    return BarStream(lambda bar: {"RSI": strength.update(bar["close"]), "SMA50": trend.update(bar["close"])}, keep=2)
+
+def signals_RSI(close, rsi_values, trend_sma, buy_up=40, sell_up=80, buy_down=30, sell_down=70):
+    """Signal array for the RSI strategy with trend-dependent thresholds."""
+    close, rsi_values, trend_sma = as_array(close), as_array(rsi_values), as_array(trend_sma)
+    prev_rsi = shift(rsi_values)
 
     # Set dynamic RSI thresholds based on trend
-    if current_price > current_SMA50:
-        buy_threshold = 40    # Uptrend: milder oversold threshold
-        sell_threshold = 80   # Uptrend: higher overbought threshold
-    else:
-        buy_threshold = 30
-        sell_threshold = 70
+    uptrend = close > trend_sma
+    buy_threshold = np.where(uptrend, buy_up, buy_down)      # Uptrend: milder oversold threshold
+    sell_threshold = np.where(uptrend, sell_up, sell_down)   # Uptrend: higher overbought threshold
 
-    # Generate signals using conditions identical to your backtest code:
     # For BUY: RSI crosses below the chosen threshold and current price is below SMA50.
     # For SELL: RSI crosses above the chosen threshold and current price is above SMA50.
-    if (prev['RSI'] >= buy_threshold) and (latest['RSI'] < buy_threshold) and (current_price < current_SMA50):
-        return "BUY"
-    elif (prev['RSI'] <= sell_threshold) and (latest['RSI'] > sell_threshold) and (current_price > current_SMA50):
-        return "SELL"
-    return None
+    buy = (prev_rsi >= buy_threshold) & (rsi_values < buy_threshold) & (close < trend_sma)
+    sell = (prev_rsi <= sell_threshold) & (rsi_values > sell_threshold) & (close > trend_sma)
+    return buy.astype(np.int8) - sell.astype(np.int8)
+
+def check_signal_RSI(data):
+    """Generates BUY/SELL signals based on RSI and SMA50 (trend)."""
+    last = data.iloc[-2:]
+    return to_signal(signals_RSI(last['close'], last['RSI'], last['SMA50'])[-1])
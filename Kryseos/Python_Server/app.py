@@ -1,5 +1,5 @@
 import os
-import threading
+import asyncio
 import logging
 from pathlib import Path
 from fastapi import FastAPI
@@ -27,17 +27,13 @@ fernet = Fernet(FERNET_KEY)
 # ----------------------------------------------------------
 
 from routes import router as routes_router
-from database import init_db, load_existing_users
-from services import (
-    user_credentials,
-    user_feedback,
-    user_locks,
-    user_configs,
-    user_sockets,
-    user_threads,
-    user_running_flags,
-    user_thread_function
-)
+from database import init_db
+from services import scheduler, preload_ml_strategy, restore_active_sessions
+from ws_bus import ws_bus
+from kline_stream import kline_stream, KLINE_STREAM_ENABLED
+from market_data import kline_cache
+from candle_store import candle_store
+from write_behind import write_behind
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -52,33 +48,29 @@ async def startup_event():
     logger.info("🔄 Initializing database...")
     await init_db()
 
-    logger.info("📥 Loading users from DB...")
-    users_data = await load_existing_users()
-
-    for user_id, user_info in users_data.items():
-        print(f"🔁 Restoring user session: {user_id}")
-
-        user_credentials[user_id] = {
-            "api_key": user_info["api_key"],
-            "api_secret": user_info["api_secret"],
-            "account": user_info["account"]
-        }
-
-        user_feedback[user_id] = {}
-        user_locks[user_id] = threading.Lock()
-        user_configs[user_id] = None
-        user_running_flags[user_id] = [False]
-        user_sockets[user_id] = set()
-
-        thread = threading.Thread(
-            target=user_thread_function,
-            args=(user_id,),
-            daemon=True
-        )
-        thread.start()
-        user_threads[user_id] = thread
-
-        logger.info(f"✅ Thread started for user: {user_id}")
+    # Lookback windows come from the local candle store, so restarts only download what is new
+    if os.getenv("CANDLE_STORE", "1") == "1":
+        kline_cache.store = candle_store
+
+    write_behind.start()
+    scheduler.start()
+    ws_bus.start()
+    if KLINE_STREAM_ENABLED:
+        kline_stream.start()
+
+    # Optionally warm the ML strategy in the background; startup does not wait for it
+    if os.getenv("PRELOAD_MODELS", "0") == "1":
+        asyncio.get_running_loop().run_in_executor(None, preload_ml_strategy)
+
+    # Bots that were running come back in the background; the server takes requests meanwhile
+    asyncio.get_running_loop().create_task(restore_active_sessions())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await kline_stream.stop()
+    await scheduler.stop()
+    # Commit what analyses queued before the process exits
+    await write_behind.stop()
 
 @app.get("/")
 async def root():
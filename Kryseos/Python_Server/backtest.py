@@ -0,0 +1,318 @@
+"""
+Vectorized backtests of the built-in strategies over the Raw_Data CSVs
+(or, with --store, over the series in the local candle store).
+
+Signals come from the same rule functions the live `check_signal_*` calls
+use, computed for every bar at once. Positions follow the `trade()` rules:
+buy `risk` of cash only when flat, close everything on SELL.
+
+    python backtest.py [--risk 0.5] [--ml] [--store]
+"""
+import argparse
+import functools
+import os
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from candle_store import candle_store, PRICE_COLUMNS
+from indicators import as_array, sma, ema, hma, adx, rsi
+from performance import summarize_performance
+from SMA import signals_SMA
+from MACD import signals_MACD
+from Hull import signals_HMA
+from SMAADX import signals_ADX
+from RSISMA50 import signals_RSI
+
+RAW_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Raw_Data")
+INITIAL_CASH = 10000.0
+
+
+# --- Data loading: one loader per CSV schema, all returning ascending OHLCV bars ---
+
+def _ohlcv(index, open_, high, low, close, volume):
+    bars = pd.DataFrame({
+        "open": open_.to_numpy(dtype=np.float64),
+        "high": high.to_numpy(dtype=np.float64),
+        "low": low.to_numpy(dtype=np.float64),
+        "close": close.to_numpy(dtype=np.float64),
+        "volume": volume.to_numpy(dtype=np.float64)
+    }, index=pd.DatetimeIndex(index, name="timestamp"))
+    return bars[~bars.index.duplicated(keep="last")].sort_index()
+
+
+def load_btc_1d():
+    df = pd.read_csv(os.path.join(RAW_DATA_DIR, "btc_1d_data_2018_to_2025.csv"))
+    index = pd.to_datetime(df["Open time"], format="%m/%d/%Y")
+    return _ohlcv(index, df["Open"], df["High"], df["Low"], df["close"], df["Volume"])
+
+
+def load_btc_daily():
+    # Unix seconds, newest first
+    df = pd.read_csv(os.path.join(RAW_DATA_DIR, "BTC-Daily.csv"))
+    index = pd.to_datetime(df["unix"], unit="s")
+    return _ohlcv(index, df["open"], df["high"], df["low"], df["close"], df["Volume BTC"])
+
+
+def load_eth_1d():
+    df = pd.read_csv(os.path.join(RAW_DATA_DIR, "ethereum_daily_data_2018_2024.csv"))
+    index = pd.to_datetime(df["time"], format="%Y-%m-%d")
+    return _ohlcv(index, df["Open"], df["High"], df["Low"], df["Close"], df["Volume"])
+
+
+# Dataset name -> (loader, symbol traded)
+DATASETS = {
+    "btc_1d_2018_2025": (load_btc_1d, "BTC/USD"),
+    "btc_daily": (load_btc_daily, "BTC/USD"),
+    "eth_1d_2018_2024": (load_eth_1d, "ETH/USD")
+}
+
+
+# Symbol traded for each stored series
+STORE_SYMBOLS = {"BTCUSDT": "BTC/USD", "ETHUSDT": "ETH/USD"}
+
+
+def load_store(symbol, interval="1d"):
+    """Bars from the candle store: a frame over the memory-mapped columns, not a copy of them."""
+    columns = candle_store.series(symbol, interval).read()
+    index = pd.DatetimeIndex(pd.to_datetime(columns["open_time"], unit="ms"), name="timestamp")
+    return pd.DataFrame({column: columns[column] for column in PRICE_COLUMNS}, index=index, copy=False)
+
+
+def store_datasets():
+    """Dataset entries ("store:BTCUSDT:1d") for every series in the candle store."""
+    return {
+        f"store:{symbol}:{interval}": (functools.partial(load_store, symbol, interval), STORE_SYMBOLS.get(symbol, symbol))
+        for symbol, interval in candle_store.keys()
+    }
+
+
+# --- Indicators of one bar series, reusable across parameter sets ---
+
+class Indicators:
+    """
+    Indicator arrays over one set of bars, each computed once per distinct
+    parameter set. A sweep keeps one per dataset so combinations sharing a
+    moving average or an ADX period reuse it; only the building blocks are
+    kept, not the per-combination results. With `max_bytes` the least
+    recently used arrays are dropped past that size.
+    """
+
+    def __init__(self, bars, max_bytes=None):
+        self.close = as_array(bars["close"])
+        self.high = as_array(bars["high"])
+        self.low = as_array(bars["low"])
+        self.max_bytes = max_bytes
+        self._values = OrderedDict()
+        self._bytes = 0
+
+    def _get(self, key, compute):
+        values = self._values.get(key)
+        if values is not None:
+            self._values.move_to_end(key)
+            return values
+        values = self._values[key] = compute()
+        self._bytes += values.nbytes
+        while self.max_bytes is not None and self._bytes > self.max_bytes and len(self._values) > 1:
+            _, dropped = self._values.popitem(last=False)
+            self._bytes -= dropped.nbytes
+        return values
+
+    def sma(self, window):
+        return self._get(("sma", window), lambda: sma(self.close, window))
+
+    def ema(self, span):
+        return self._get(("ema", span), lambda: ema(self.close, span=span))
+
+    def macd(self, fast, slow, signal):
+        """Same as `indicators.macd`; the line is kept, the signal line is per combination."""
+        macd_line = self._get(("macd", fast, slow), lambda: self.ema(fast) - self.ema(slow))
+        return macd_line, ema(macd_line, span=signal)
+
+    def hma(self, length):
+        return self._get(("hma", length), lambda: hma(self.close, length))
+
+    def adx(self, period):
+        return self._get(("adx", period), lambda: adx(self.high, self.low, self.close, period)[0])
+
+    def rsi(self, period):
+        return self._get(("rsi", period), lambda: rsi(self.close, period))
+
+
+# --- Strategy signals over every bar; parameters default to the live values ---
+# `indicators` lets a caller share one Indicators across many calls on the same bars.
+
+def sma_signals(bars, symbol=None, fast=9, slow=21, indicators=None):
+    indicators = indicators or Indicators(bars)
+    return signals_SMA(indicators.sma(fast), indicators.sma(slow))
+
+
+def macd_signals(bars, symbol=None, fast=12, slow=26, signal=9, indicators=None):
+    indicators = indicators or Indicators(bars)
+    return signals_MACD(*indicators.macd(fast, slow, signal))
+
+
+def hma_signals(bars, symbol=None, length=55, lag=2, indicators=None):
+    indicators = indicators or Indicators(bars)
+    return signals_HMA(indicators.hma(length), lag)
+
+
+def adx_signals(bars, symbol=None, fast=9, slow=21, period=14, threshold=20, indicators=None):
+    indicators = indicators or Indicators(bars)
+    return signals_ADX(indicators.sma(fast), indicators.sma(slow), indicators.adx(period), threshold)
+
+
+def rsi_signals(bars, symbol=None, period=14, trend=50, buy_up=40, sell_up=80, buy_down=30, sell_down=70,
+                indicators=None):
+    indicators = indicators or Indicators(bars)
+    return signals_RSI(indicators.close, indicators.rsi(period), indicators.sma(trend),
+                       buy_up, sell_up, buy_down, sell_down)
+
+
+def ml_predictions(bars, symbol):
+    """Model output for every bar with a full feature window (NaN elsewhere), in one batched pass."""
+    from numpy.lib.stride_tricks import sliding_window_view
+    from tensorflow.keras.models import load_model
+    from Model_strategy_BTC_ETH import build_features, get_scaler, MODEL_FILES, MODEL_WINDOWS, ML_SYMBOLS
+
+    window = MODEL_WINDOWS[symbol]
+    features, rsi_values = build_features(bars["close"], get_scaler(symbol))
+    values = features.to_numpy(dtype="float32")
+    windows = sliding_window_view(values, (window, values.shape[1]))[:, 0]
+
+    model = load_model(MODEL_FILES[ML_SYMBOLS[symbol][0]], compile=False)
+    outputs = np.ravel(model.predict(windows, verbose=0, batch_size=1024))
+
+    predictions = pd.Series(np.nan, index=bars.index)
+    predictions.loc[features.index[window - 1:]] = outputs
+    return predictions.to_numpy(), rsi_values.reindex(bars.index).to_numpy()
+
+
+def ml_signals(bars, symbol, upper=None, lower=None, predictions=None, indicators=None):
+    from Model_strategy_BTC_ETH import signals_ML, ML_SYMBOLS
+
+    _, default_upper, default_lower = ML_SYMBOLS[symbol]
+    if predictions is None:
+        predictions = ml_predictions(bars, symbol)
+    model_output, rsi_values = predictions
+    return signals_ML(
+        model_output, rsi_values,
+        default_upper if upper is None else upper,
+        default_lower if lower is None else lower
+    )
+
+
+STRATEGIES = {
+    "SMA": sma_signals,
+    "MACD": macd_signals,
+    "HMA": hma_signals,
+    "SMA&ADX": adx_signals,
+    "RSI&SMA50": rsi_signals,
+    "ML": ml_signals
+}
+
+
+# --- Execution ---
+
+def simulate(close, signals, risk=0.5, initial_cash=INITIAL_CASH):
+    """
+    Applies the `trade()` position rules to a signal array, filling at the bar close.
+    Returns the per-bar equity curve and the fills (bar index, side, price).
+    """
+    close = as_array(close)
+    signals = np.asarray(signals)
+    cash, position = initial_cash, 0.0
+    fill_bars, sides, prices, cash_after, position_after = [], [], [], [], []
+
+    # Only bars with a signal can change the position
+    for i in np.flatnonzero(signals):
+        price = close[i]
+        if signals[i] > 0:
+            quantity = (cash * risk) / price
+            if position == 0 and quantity > 0:
+                position = quantity
+                cash -= quantity * price
+                sides.append("buy")
+            else:
+                continue
+        elif position > 0:
+            cash += position * price
+            position = 0.0
+            sides.append("sell")
+        else:
+            continue
+        fill_bars.append(i)
+        prices.append(price)
+        cash_after.append(cash)
+        position_after.append(position)
+
+    # Cash and position are step functions between fills
+    state = np.searchsorted(np.asarray(fill_bars, dtype=np.int64), np.arange(len(close)), side="right") - 1
+    cash_path = np.where(state >= 0, np.asarray(cash_after + [initial_cash])[state], initial_cash)
+    position_path = np.where(state >= 0, np.asarray(position_after + [0.0])[state], 0.0)
+    equity = cash_path + position_path * close
+
+    return equity, fill_bars, sides, prices
+
+
+def evaluate(bars, signals, risk=0.5, initial_cash=INITIAL_CASH):
+    equity, fill_bars, sides, prices = simulate(as_array(bars["close"]), signals, risk, initial_cash)
+    metrics = summarize_performance(equity, sides, prices)
+    metrics["final_equity"] = float(equity[-1])
+    return metrics
+
+
+def run_backtests(datasets=None, strategies=None, risk=0.5):
+    available = {**DATASETS, **store_datasets()}
+    datasets = datasets or list(DATASETS)
+    strategies = strategies or [name for name in STRATEGIES if name != "ML"]
+    rows = []
+
+    for dataset in datasets:
+        loader, symbol = available[dataset]
+        bars = loader()
+        for strategy in strategies:
+            try:
+                signals = STRATEGIES[strategy](bars, symbol)
+            except ImportError as e:
+                print(f"⚠️ Skipping {strategy} on {dataset}: {e}")
+                continue
+            metrics = evaluate(bars, signals, risk)
+            rows.append({
+                "dataset": dataset,
+                "strategy": strategy,
+                "bars": len(bars),
+                "num_trades": metrics["num_trades"],
+                "winning_rate": metrics["winning_rate"],
+                "last_trade_profit_ratio": metrics["last_trade_profit_ratio"],
+                "total_profit": float(metrics["total_profit"]),
+                "profit_ratio": float(metrics["profit_ratio"]),
+                "max_drawdown": metrics["max_drawdown"],
+                "sharpe": metrics["sharpe"],
+                "sortino": metrics["sortino"],
+                "profit_factor": metrics["profit_factor"],
+                "final_equity": metrics["final_equity"]
+            })
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--risk", type=float, default=0.5)
+    parser.add_argument("--ml", action="store_true", help="include the ML strategy (loads TensorFlow)")
+    parser.add_argument("--store", action="store_true", help="run on the candle store instead of the CSVs")
+    args = parser.parse_args()
+
+    strategies = list(STRATEGIES) if args.ml else None
+    datasets = list(store_datasets()) if args.store else None
+    if args.store and not datasets:
+        parser.error("the candle store is empty; run tools/ingest_raw_data.py first")
+    started = time.perf_counter()
+    results = run_backtests(datasets=datasets, strategies=strategies, risk=args.risk)
+    elapsed = time.perf_counter() - started
+
+    with pd.option_context("display.width", 200, "display.max_columns", 20):
+        print(results.to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+    print(f"\n⏱️ {len(results)} backtests in {elapsed * 1000:.0f} ms")
@@ -0,0 +1,235 @@
+"""
+Pooled Alpaca sessions with short-lived snapshots of account, position and price.
+
+One `BrokerSession` is kept per user, so its HTTP connections are reused
+across logins, config changes and trades; it is dropped on logout or when
+the bot stops. Account and position
+reads are cached for a few seconds and dropped as soon as an order is sent;
+latest prices are cached per symbol for every user. `snapshot` fetches
+whatever is stale concurrently instead of one call after another.
+
+Coroutines reach the broker through `BrokerSession.run`, which moves the
+blocking call to a bounded thread pool with a timeout.
+"""
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import alpaca_trade_api as tradeapi
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+SNAPSHOT_TTL_SECONDS = float(os.getenv("BROKER_SNAPSHOT_TTL_SECONDS", "5"))
+PRICE_TTL_SECONDS = float(os.getenv("BROKER_PRICE_TTL_SECONDS", "1"))
+BROKER_WORKERS = int(os.getenv("BROKER_WORKERS", "32"))
+BROKER_TIMEOUT_SECONDS = float(os.getenv("BROKER_TIMEOUT_SECONDS", "10"))
+# Thread pool that coroutines use for broker I/O, and how much of it one account may hold
+BROKER_IO_WORKERS = int(os.getenv("BROKER_IO_WORKERS", "16"))
+BROKER_CALLS_PER_ACCOUNT = int(os.getenv("BROKER_CALLS_PER_ACCOUNT", "2"))
+
+_executor = ThreadPoolExecutor(max_workers=BROKER_WORKERS, thread_name_prefix="broker")
+_io_executor = ThreadPoolExecutor(max_workers=BROKER_IO_WORKERS, thread_name_prefix="broker-io")
+
+# Latest trade price per symbol, shared by all sessions: symbol -> (expires_at, price)
+_prices = {}
+_prices_lock = threading.Lock()
+
+broker_call_seconds = metrics.histogram("kryseos_broker_call_seconds", "Alpaca REST call latency", ["call"])
+order_submission_seconds = metrics.histogram(
+    "kryseos_order_submission_seconds", "Time from a signal reaching trade() to its order being sent", ["side"]
+)
+
+# REST calls and their latency across all sessions
+call_counts = {}
+call_latencies = deque(maxlen=1000)
+# Time from a signal reaching trade() to its order being sent
+order_latencies = deque(maxlen=1000)
+_stats_lock = threading.Lock()
+
+
+class BrokerSession:
+    def __init__(self, api, ttl=SNAPSHOT_TTL_SECONDS):
+        self.api = api
+        self.ttl = ttl
+        self._cache = {}  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._slots = None
+        self.rest_calls = 0
+        self.timeouts = 0
+
+    async def run(self, fn, *args, timeout=BROKER_TIMEOUT_SECONDS):
+        """
+        Awaits a blocking broker function on the I/O pool, so the event loop
+        keeps serving other requests. Raises asyncio.TimeoutError after `timeout`.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(BROKER_CALLS_PER_ACCOUNT)
+
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout)
+            future = loop.run_in_executor(_io_executor, partial(fn, *args))
+            # The slot is freed when the thread finishes, not on timeout, so a hung
+            # account holds at most BROKER_CALLS_PER_ACCOUNT threads of the pool
+            future.add_done_callback(lambda _: self._slots.release())
+            return await asyncio.wait_for(asyncio.shield(future), max(deadline - loop.time(), 0))
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            print(f"⏱️ Broker call {getattr(fn, '__name__', fn)} timed out after {timeout}s")
+            raise
+
+    def call(self, name, *args, **kwargs):
+        """Runs one REST method on the underlying client, counting it."""
+        started = time.perf_counter()
+        try:
+            return getattr(self.api, name)(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            broker_call_seconds.labels(name).observe(elapsed)
+            with _stats_lock:
+                self.rest_calls += 1
+                call_counts[name] = call_counts.get(name, 0) + 1
+                call_latencies.append(elapsed)
+
+    def __getattr__(self, name):
+        # Anything not wrapped here (list_orders, ...) goes straight to the client
+        if name == "api":
+            raise AttributeError(name)
+        attr = getattr(self.api, name)
+        if not callable(attr):
+            return attr
+        return lambda *args, **kwargs: self.call(name, *args, **kwargs)
+
+    def _cached(self, key, load):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(key)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+        value = load()
+        with self._lock:
+            self._cache[key] = (time.monotonic() + self.ttl, value)
+        return value
+
+    def invalidate(self):
+        with self._lock:
+            self._cache.clear()
+
+    def get_account(self):
+        return self._cached("account", lambda: self.call("get_account"))
+
+    def get_position(self, symbol):
+        """Open quantity for `symbol` (with or without the slash), 0 when there is none."""
+        symbol_no_slash = symbol.replace("/", "")
+
+        def load():
+            try:
+                return float(self.call("get_position", symbol_no_slash).qty)
+            except Exception as e:
+                print(f"⚠️ No position or error for {symbol}: {e}")
+                return 0.0
+        return self._cached(("position", symbol_no_slash), load)
+
+    def get_latest_price(self, symbol):
+        now = time.monotonic()
+        with _prices_lock:
+            entry = _prices.get(symbol)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+        price = self.call("get_latest_crypto_trades", [symbol])[symbol].p
+        with _prices_lock:
+            _prices[symbol] = (time.monotonic() + PRICE_TTL_SECONDS, price)
+        return price
+
+    def snapshot(self, symbol):
+        """Position, latest price and account for `symbol`, fetched concurrently."""
+        position = _executor.submit(self.get_position, symbol)
+        price = _executor.submit(self.get_latest_price, symbol)
+        account = self.get_account()
+        return position.result(), price.result(), account
+
+    def submit_order(self, **order):
+        try:
+            return self.call("submit_order", **order)
+        finally:
+            self.invalidate()
+
+    def close_all_positions(self):
+        try:
+            return self.call("close_all_positions")
+        finally:
+            self.invalidate()
+
+
+class _TimeoutAdapter(HTTPAdapter):
+    """Gives every request a timeout; the Alpaca client doesn't set one."""
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = BROKER_TIMEOUT_SECONDS
+        return super().send(request, **kwargs)
+
+
+def _with_timeouts(rest):
+    session = getattr(rest, "_session", None)
+    if session is not None:
+        session.mount("https://", _TimeoutAdapter())
+        session.mount("http://", _TimeoutAdapter())
+    return rest
+
+
+# --- Session pool: user id -> (credential digest, BrokerSession), least recently used first ---
+MAX_SESSIONS = int(os.getenv("BROKER_MAX_SESSIONS", "10000"))
+_sessions = OrderedDict()
+_sessions_lock = threading.Lock()
+
+
+def _credential_digest(api_key, api_secret, account):
+    # Only a digest is kept, to notice changed credentials without holding them in the pool
+    return hashlib.sha256("\n".join([api_key, api_secret, account]).encode()).digest()
+
+
+def get_broker_session(user_id, api_key, api_secret, account):
+    digest = _credential_digest(api_key, api_secret, account)
+    with _sessions_lock:
+        entry = _sessions.get(user_id)
+        if entry is not None and entry[0] == digest:
+            _sessions.move_to_end(user_id)
+            return entry[1]
+        session = BrokerSession(_with_timeouts(tradeapi.REST(api_key, api_secret, account, api_version="v2")))
+        _sessions[user_id] = (digest, session)
+        _sessions.move_to_end(user_id)
+        while len(_sessions) > MAX_SESSIONS:
+            _sessions.popitem(last=False)
+        return session
+
+
+def close_broker_session(user_id):
+    """Drops a user's pooled session (logout, bot stopped); the next request builds a new one."""
+    with _sessions_lock:
+        _sessions.pop(user_id, None)
+
+
+def broker_stats():
+    with _stats_lock:
+        latencies = sorted(call_latencies)
+        orders = sorted(order_latencies)
+        counts = dict(call_counts)
+    return {
+        "sessions": len(_sessions),
+        "timeouts": sum(session.timeouts for _, session in list(_sessions.values())),
+        "rest_calls": counts,
+        "rest_calls_total": sum(counts.values()),
+        "latency_ms_p50": latencies[len(latencies) // 2] * 1000 if latencies else None,
+        "latency_ms_p99": latencies[int(len(latencies) * 0.99)] * 1000 if latencies else None,
+        "orders": len(orders),
+        "order_latency_ms_p50": orders[len(orders) // 2] * 1000 if orders else None,
+        "order_latency_ms_p99": orders[int(len(orders) * 0.99)] * 1000 if orders else None
+    }
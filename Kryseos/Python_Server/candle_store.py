@@ -0,0 +1,173 @@
+"""
+On-disk columnar candle store.
+
+Each (symbol, interval) is a directory of raw little-endian column files,
+one value per bar in ascending open time:
+
+    <root>/BTCUSDT/1d/open_time.i8   open.f8  high.f8  low.f8  close.f8  volume.f8
+
+Reads map the files with np.memmap, so strategies and backtests get
+zero-copy views. Appends write every price column first and open_time
+last; the series length is the shortest column, so a crash mid-append
+leaves the extra values invisible and the next append overwrites them.
+"""
+import os
+import shutil
+import threading
+
+import numpy as np
+
+from market_data import INTERVAL_MS
+
+CANDLE_STORE_DIR = os.getenv(
+    "CANDLE_STORE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Candle_Store")
+)
+
+# Column name -> dtype; open_time (Unix ms) is written last on append
+COLUMNS = {
+    "open": "<f8",
+    "high": "<f8",
+    "low": "<f8",
+    "close": "<f8",
+    "volume": "<f8",
+    "open_time": "<i8"
+}
+PRICE_COLUMNS = ["open", "high", "low", "close", "volume"]
+
+
+def _file_name(column):
+    return f"{column}.{COLUMNS[column][1:]}"
+
+
+class CandleSeries:
+    """The stored bars of one (symbol, interval)."""
+
+    def __init__(self, path, interval):
+        self.path = path
+        self.interval = interval
+        self.lock = threading.Lock()
+
+    def _column_path(self, column):
+        return os.path.join(self.path, _file_name(column))
+
+    def __len__(self):
+        sizes = []
+        for column, dtype in COLUMNS.items():
+            try:
+                sizes.append(os.path.getsize(self._column_path(column)) // np.dtype(dtype).itemsize)
+            except FileNotFoundError:
+                return 0
+        return min(sizes)
+
+    def read(self, limit=None, start_ms=None):
+        """
+        Read-only views of the stored columns (name -> array), oldest first.
+        `limit` keeps the newest bars, `start_ms` the bars opened at or after it.
+        """
+        length = len(self)
+        if length == 0:
+            return {column: np.empty(0, dtype=dtype) for column, dtype in COLUMNS.items()}
+
+        columns = {
+            column: np.memmap(self._column_path(column), dtype=dtype, mode="r", shape=(length,))
+            for column, dtype in COLUMNS.items()
+        }
+        first = 0
+        if start_ms is not None:
+            first = int(np.searchsorted(columns["open_time"], start_ms))
+        if limit is not None:
+            first = max(first, length - limit)
+        return {column: values[first:] for column, values in columns.items()}
+
+    def last_open_time(self):
+        length = len(self)
+        if length == 0:
+            return None
+        return int(np.memmap(self._column_path("open_time"), dtype=COLUMNS["open_time"], mode="r")[length - 1])
+
+    def append(self, columns):
+        """
+        Appends bars (name -> array, ascending) that open after the last stored bar.
+        Bars that would leave a gap after it are refused. Returns the number appended.
+        """
+        open_time = np.asarray(columns["open_time"], dtype=COLUMNS["open_time"])
+        with self.lock:
+            length = len(self)
+            last = self.last_open_time()
+            keep = open_time > last if last is not None else np.ones(len(open_time), dtype=bool)
+            if not keep.any():
+                return 0
+            if last is not None and open_time[keep][0] != last + INTERVAL_MS[self.interval]:
+                print(f"[candle-store] refusing non-contiguous append to {self.path}")
+                return 0
+
+            os.makedirs(self.path, exist_ok=True)
+            for column, dtype in COLUMNS.items():
+                values = np.asarray(columns[column], dtype=dtype)[keep]
+                with open(self._column_path(column), "ab") as f:
+                    # Drop values left behind by an interrupted append
+                    f.truncate(length * np.dtype(dtype).itemsize)
+                    f.write(values.tobytes())
+            return int(keep.sum())
+
+    def replace(self, columns):
+        """Rewrites the series with `columns` (ascending, unique open times)."""
+        with self.lock:
+            staging = self.path + ".new"
+            shutil.rmtree(staging, ignore_errors=True)
+            os.makedirs(staging)
+            for column, dtype in COLUMNS.items():
+                np.asarray(columns[column], dtype=dtype).tofile(os.path.join(staging, _file_name(column)))
+
+            old = self.path + ".old"
+            shutil.rmtree(old, ignore_errors=True)
+            if os.path.isdir(self.path):
+                os.rename(self.path, old)
+            os.rename(staging, self.path)
+            shutil.rmtree(old, ignore_errors=True)
+
+
+class CandleStore:
+    def __init__(self, root=CANDLE_STORE_DIR):
+        self.root = root
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def series(self, symbol, interval):
+        with self._lock:
+            key = (symbol, interval)
+            if key not in self._series:
+                self._series[key] = CandleSeries(os.path.join(self.root, symbol, interval), interval)
+            return self._series[key]
+
+    def keys(self):
+        """Every stored (symbol, interval)."""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            (symbol, interval)
+            for symbol in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, symbol))
+            for interval in os.listdir(os.path.join(self.root, symbol))
+            if interval in INTERVAL_MS and len(self.series(symbol, interval))
+        )
+
+    def read_klines(self, symbol, interval, limit):
+        """The newest `limit` stored bars as rows in the REST klines format."""
+        columns = self.series(symbol, interval).read(limit=limit)
+        length = INTERVAL_MS[interval]
+        return [
+            [int(t), o, h, l, c, v, int(t) + length - 1, 0.0, 0, 0.0, 0.0, "0"]
+            for t, o, h, l, c, v in zip(columns["open_time"].tolist(), *(columns[c].tolist() for c in PRICE_COLUMNS))
+        ]
+
+    def append_klines(self, symbol, interval, klines):
+        """Appends REST-format rows; the caller passes closed bars only."""
+        if not klines:
+            return 0
+        columns = {"open_time": [row[0] for row in klines]}
+        for i, column in enumerate(PRICE_COLUMNS, start=1):
+            columns[column] = [float(row[i]) for row in klines]
+        return self.series(symbol, interval).append(columns)
+
+
+candle_store = CandleStore()
@@ -0,0 +1,116 @@
+import itertools
+import threading
+import time
+
+from market_data import INTERVAL_MS, kline_cache, to_binance_symbol
+from resampler import IncrementalResampler, timeframe_ms
+
+
+def base_interval(timeframes):
+    """The longest Binance interval (up to a day, so bars stay epoch-aligned) that divides every timeframe."""
+    lengths = [timeframe_ms(timeframe) for timeframe in timeframes]
+    candidates = [
+        interval for interval, length in INTERVAL_MS.items()
+        if length <= INTERVAL_MS["1d"] and all(tf % length == 0 for tf in lengths)
+    ]
+    return max(candidates, key=INTERVAL_MS.get)
+
+
+class DataPlanner:
+    """
+    Serves every (symbol, timeframe) the strategies read from one kline series per symbol.
+
+    `needs` maps each timeframe to the most bars any strategy reads from it.
+    The planner downloads only the base interval, and keeps an
+    IncrementalResampler per (symbol, timeframe) that takes the base bars
+    closed since the last read, so the aggregated bars are never rebuilt
+    from scratch. Streaming indicators (`stream`) follow those resamplers
+    and take each aggregated bar once, as it closes.
+    """
+
+    def __init__(self, needs, cache=kline_cache, clock=time.time):
+        self.needs = dict(needs)
+        self.base_interval = base_interval(self.needs)
+        self.base_ms = INTERVAL_MS[self.base_interval]
+        # Enough base bars for the longest lookback, plus a leading bucket that may be partial
+        self.window = max((lookback + 1) * timeframe_ms(tf) // self.base_ms for tf, lookback in self.needs.items())
+        self.cache = cache
+        self._clock = clock
+        self._resamplers = {}
+        self._streams = {}  # ((symbol, timeframe), name) -> [state, resampler it follows, last bar fed]
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def closed_base_bars(self, symbol):
+        now_ms = int(self._clock() * 1000)
+        rows = self.cache.get_klines(to_binance_symbol(symbol), self.base_interval, self.window + 1)
+        return [row for row in rows if row[6] < now_ms]
+
+    def _lock_for(self, key):
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _advance(self, key, timeframe, lookback, rows):
+        """Feeds the resampler of `key` the base bars it has not seen yet. Call with the key's lock held."""
+        resampler = self._resamplers.get(key)
+        if resampler is not None and rows and resampler.last_open is not None \
+                and rows[0][0] > resampler.last_open + self.base_ms:
+            # The window moved past what was fed (e.g. a long outage): start over from it
+            resampler = None
+        if resampler is None:
+            resampler = self._resamplers[key] = IncrementalResampler(
+                timeframe_ms(timeframe), self.base_ms, max_bars=max(self.needs.get(timeframe, 0), lookback) + 1
+            )
+        # Rows are in time order: only the tail after the last bar fed is new
+        start = len(rows)
+        while start and (resampler.last_open is None or rows[start - 1][0] > resampler.last_open):
+            start -= 1
+        for row in itertools.islice(rows, start, None):
+            resampler.update(row[0], float(row[1]), float(row[2]), float(row[3]), float(row[4]), float(row[5]))
+        return resampler
+
+    def bars(self, symbol, timeframe, lookback, rows=None):
+        """The newest `lookback` complete `timeframe` bars of `symbol` as a frame."""
+        key = (to_binance_symbol(symbol), timeframe)
+        lock = self._lock_for(key)
+        if rows is None:
+            rows = self.closed_base_bars(symbol)
+        with lock:
+            return self._advance(key, timeframe, lookback, rows).frame(lookback)
+
+    def stream(self, symbol, timeframe, name, factory, rows=None):
+        """
+        Feeds the streaming state `name` over the complete `timeframe` bars
+        of `symbol` every bar closed since the last call, and returns its
+        `frame()`.
+
+        `factory()` builds the state (an object with `update(open_time, open,
+        high, low, close, volume)` and `frame()`); a new one is warmed from
+        the bars the resampler holds, and rebuilt the same way whenever bars
+        were missed.
+        """
+        key = (to_binance_symbol(symbol), timeframe)
+        lock = self._lock_for(key)
+        if rows is None:
+            rows = self.closed_base_bars(symbol)
+        with lock:
+            resampler = self._advance(key, timeframe, self.needs.get(timeframe, 0), rows)
+            times = resampler.columns["open_time"]
+            entry = self._streams.get((key, name))
+            if entry is None or entry[1] is not resampler or \
+                    (entry[2] is not None and times and entry[2] + resampler.rule_ms < times[0]):
+                entry = self._streams[(key, name)] = [factory(), resampler, None]
+            state, _, last_open = entry
+
+            # The bars closed since the last feed are at the end of the resampler's columns
+            new = 0
+            while new < len(times) and (last_open is None or times[-1 - new] > last_open):
+                new += 1
+            start = len(times) - new
+            columns = [itertools.islice(resampler.columns[column], start, None)
+                       for column in ["open_time", "open", "high", "low", "close", "volume"]]
+            for bar in zip(*columns):
+                state.update(*bar)
+            if new:
+                entry[2] = times[-1]
+            return state.frame()
@@ -0,0 +1,111 @@
+"""
+Equity history per user, stored as one row per snapshot.
+
+Inserts and lookups of the first/last point go through the
+(user_id, timestamp) index, so they cost the same however long an account
+has been running. Aggregation happens in SQL so callers only receive the
+points they display.
+"""
+from datetime import datetime
+
+from sqlalchemy import func, and_
+from sqlalchemy.future import select
+
+from models import EquitySnapshot
+
+# Equity points sent with each performance update
+FEEDBACK_POINTS = 500
+
+
+def utcnow():
+    return datetime.utcnow()
+
+
+def _in_range(user_id, start=None, end=None):
+    conditions = [EquitySnapshot.user_id == user_id]
+    if start is not None:
+        conditions.append(EquitySnapshot.timestamp >= start)
+    if end is not None:
+        conditions.append(EquitySnapshot.timestamp <= end)
+    return and_(*conditions)
+
+
+async def last_equity(session, user_id):
+    result = await session.execute(
+        select(EquitySnapshot.equity)
+        .where(EquitySnapshot.user_id == user_id)
+        .order_by(EquitySnapshot.timestamp.desc(), EquitySnapshot.id.desc())
+        .limit(1)
+    )
+    return result.scalar_one_or_none()
+
+
+async def first_equity(session, user_id):
+    result = await session.execute(
+        select(EquitySnapshot.equity)
+        .where(EquitySnapshot.user_id == user_id)
+        .order_by(EquitySnapshot.timestamp, EquitySnapshot.id)
+        .limit(1)
+    )
+    return result.scalar_one_or_none()
+
+
+async def new_equity_snapshot(session, user_id, equity, timestamp=None):
+    """A snapshot row to store, or None when it would repeat the latest value."""
+    previous = await last_equity(session, user_id)
+    if previous is not None and round(previous, 2) == round(equity, 2):
+        return None
+    return EquitySnapshot(user_id=user_id, timestamp=timestamp or utcnow(), equity=equity)
+
+
+async def append_equity(session, user_id, equity, timestamp=None):
+    """Adds a snapshot unless it repeats the latest value. Returns True when a row was added."""
+    snapshot = await new_equity_snapshot(session, user_id, equity, timestamp)
+    if snapshot is None:
+        return False
+    session.add(snapshot)
+    return True
+
+
+async def equity_range(session, user_id, start=None, end=None, limit=None):
+    """(timestamp, equity) points in time order; with `limit`, only the most recent ones."""
+    query = select(EquitySnapshot.timestamp, EquitySnapshot.equity).where(_in_range(user_id, start, end))
+    if limit is None:
+        result = await session.execute(query.order_by(EquitySnapshot.timestamp, EquitySnapshot.id))
+        return [tuple(row) for row in result.all()]
+
+    result = await session.execute(
+        query.order_by(EquitySnapshot.timestamp.desc(), EquitySnapshot.id.desc()).limit(limit)
+    )
+    return [tuple(row) for row in reversed(result.all())]
+
+
+async def equity_daily(session, user_id, start=None, end=None):
+    """Last equity of each UTC day, as (date string, equity) in time order."""
+    day = func.date(EquitySnapshot.timestamp)
+    last_of_day = (
+        select(func.max(EquitySnapshot.timestamp).label("timestamp"))
+        .where(_in_range(user_id, start, end))
+        .group_by(day)
+        .subquery()
+    )
+    result = await session.execute(
+        select(day, EquitySnapshot.equity)
+        .join(last_of_day, EquitySnapshot.timestamp == last_of_day.c.timestamp)
+        .where(EquitySnapshot.user_id == user_id)
+        .order_by(EquitySnapshot.timestamp)
+    )
+    daily = {}
+    for date, equity in result.all():
+        daily[date] = equity  # ties on the same timestamp keep the later row
+    return list(daily.items())
+
+
+async def equity_summary(session, user_id, points=FEEDBACK_POINTS):
+    """First and latest equity plus the most recent `points` values, for performance updates."""
+    recent = await equity_range(session, user_id, limit=points)
+    return {
+        "first": await first_equity(session, user_id),
+        "last": recent[-1][1] if recent else None,
+        "recent": [equity for _, equity in recent]
+    }
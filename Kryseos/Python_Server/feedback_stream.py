@@ -0,0 +1,76 @@
+"""
+Versioned performance_update messages.
+
+Each user's updates carry a sequence number. A client first gets a
+snapshot with the full state; after that, each delta holds only the scalar
+fields that changed, plus the points appended to (and dropped from the
+front of) the list fields. A client that sees a gap in `seq` sends
+`{"type": "resync"}` and gets a new snapshot.
+"""
+import threading
+
+PROTOCOL_VERSION = 2
+
+# Lists that only grow at the end (equity_history is a sliding window, so it can also lose points at the front)
+LIST_FIELDS = ("equity_history", "trade_profit_ratios", "sell_fill_times")
+
+
+def list_delta(old, new):
+    """(points dropped from the front of `old`, points appended) that turn `old` into `new`."""
+    for trim in range(len(old) + 1):
+        kept = len(old) - trim
+        if kept <= len(new) and new[:kept] == old[trim:]:
+            return trim, new[kept:]
+
+
+class FeedbackStream:
+    def __init__(self):
+        self._states = {}  # user_id -> (seq, feedback)
+        self._lock = threading.Lock()
+
+    def update(self, user_id, feedback):
+        """Records the user's new feedback and returns the message to publish for it."""
+        with self._lock:
+            seq, previous = self._states.get(user_id, (0, None))
+            seq += 1
+            self._states[user_id] = (seq, feedback)
+
+        if not previous:
+            return self._snapshot(seq, feedback)
+
+        changed = {
+            field: value for field, value in feedback.items()
+            if field not in LIST_FIELDS and previous.get(field) != value
+        }
+        append, trim = {}, {}
+        for field in LIST_FIELDS:
+            if field not in feedback:
+                continue
+            dropped, added = list_delta(previous.get(field) or [], feedback[field])
+            if dropped:
+                trim[field] = dropped
+            if added:
+                append[field] = added
+
+        message = {"v": PROTOCOL_VERSION, "seq": seq, "mode": "delta", "data": changed}
+        if append:
+            message["append"] = append
+        if trim:
+            message["trim"] = trim
+        return message
+
+    def snapshot(self, user_id):
+        with self._lock:
+            seq, feedback = self._states.get(user_id, (0, None))
+        return self._snapshot(seq, feedback) if feedback else None
+
+    @staticmethod
+    def _snapshot(seq, feedback):
+        return {"v": PROTOCOL_VERSION, "seq": seq, "mode": "snapshot", "data": feedback}
+
+    def reset(self, user_id):
+        with self._lock:
+            self._states.pop(user_id, None)
+
+
+feedback_stream = FeedbackStream()
@@ -0,0 +1,155 @@
+"""
+NumPy implementations of the indicators used by the strategies.
+
+Every function works on float64 arrays along the last axis, so a 2-D array
+computes one series per row in a single call. Outputs have the same shape as
+the input, with NaN where the pandas equivalent has not warmed up yet.
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def as_array(values):
+    return np.ascontiguousarray(values, dtype=np.float64)
+
+
+def shift(x, periods=1):
+    x = as_array(x)
+    out = np.full(x.shape, np.nan)
+    if periods < x.shape[-1]:
+        out[..., periods:] = x[..., :-periods]
+    return out
+
+
+def sma(x, window):
+    """Equivalent to `series.rolling(window).mean()`."""
+    x = as_array(x)
+    out = np.full(x.shape, np.nan)
+    if x.shape[-1] < window:
+        return out
+
+    missing = np.isnan(x)
+    pad = np.zeros(x.shape[:-1] + (1,))
+    sums = np.concatenate([pad, np.cumsum(np.where(missing, 0.0, x), axis=-1)], axis=-1)
+    nans = np.concatenate([pad, np.cumsum(missing, axis=-1)], axis=-1)
+
+    window_sums = sums[..., window:] - sums[..., :-window]
+    window_nans = nans[..., window:] - nans[..., :-window]
+    out[..., window - 1:] = np.where(window_nans == 0, window_sums / window, np.nan)
+    return out
+
+
+def ema(x, span=None, alpha=None):
+    """Equivalent to `series.ewm(span=span, adjust=False).mean()` (or `alpha=`)."""
+    # The recursion has no stable closed form in NumPy; pandas runs it in compiled
+    # code. Imported here so this module stays cheap to import (market_data loads it anyway).
+    import pandas as pd
+
+    x = as_array(x)
+    if alpha is None:
+        alpha = 2.0 / (span + 1)
+
+    if x.ndim == 1:
+        return pd.Series(x).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+    rows = x.reshape(-1, x.shape[-1])
+    out = pd.DataFrame(rows.T).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+    return np.ascontiguousarray(out.T).reshape(x.shape)
+
+
+def wma(x, window):
+    """Linearly weighted moving average with weights 1..window, newest weighted highest."""
+    x = as_array(x)
+    out = np.full(x.shape, np.nan)
+    if x.shape[-1] < window:
+        return out
+
+    weights = np.arange(1, window + 1, dtype=np.float64)
+    out[..., window - 1:] = sliding_window_view(x, window, axis=-1) @ (weights / weights.sum())
+    return out
+
+
+def hma(x, length=55):
+    """Hull moving average: WMA(2 * WMA(length / 2) - WMA(length), sqrt(length))."""
+    raw_hull = 2 * wma(x, length // 2) - wma(x, length)
+    return wma(raw_hull, int(np.sqrt(length)))
+
+
+def macd(close, fast=12, slow=26, signal=9):
+    """Returns the MACD line and its signal line."""
+    macd_line = ema(close, span=fast) - ema(close, span=slow)
+    return macd_line, ema(macd_line, span=signal)
+
+
+def rsi(close, period=14, wilder=False):
+    """
+    RSI with gains and losses averaged by a simple rolling mean, as the
+    strategies compute it, or with Wilder's smoothing when `wilder=True`.
+    """
+    close = as_array(close)
+    delta = np.diff(close, axis=-1, prepend=np.nan)
+    gain = np.where(delta > 0, delta, 0.0)
+    loss = np.where(delta < 0, -delta, 0.0)
+
+    if wilder:
+        avg_gain = ema(gain, alpha=1.0 / period)
+        avg_loss = ema(loss, alpha=1.0 / period)
+    else:
+        avg_gain = sma(gain, period)
+        avg_loss = sma(loss, period)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return 100 - (100 / (1 + avg_gain / avg_loss))
+
+
+def true_range(high, low, close):
+    high, low = as_array(high), as_array(low)
+    prev_close = shift(close)
+    return np.maximum.reduce([high - low, np.abs(high - prev_close), np.abs(low - prev_close)])
+
+
+def atr(high, low, close, period=14):
+    return sma(true_range(high, low, close), period)
+
+
+def directional_movement(high, low):
+    """Returns +DM and -DM."""
+    high, low = as_array(high), as_array(low)
+    up = high - shift(high)
+    down = shift(low) - low
+    plus_dm = np.where(up > down, np.maximum(up, 0), 0.0)
+    minus_dm = np.where(down > up, np.maximum(down, 0), 0.0)
+    return plus_dm, minus_dm
+
+
+def directional_index(high, low, close, period=14):
+    """Returns +DI and -DI."""
+    average_range = atr(high, low, close, period)
+    plus_dm, minus_dm = directional_movement(high, low)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        plus_di = 100 * (sma(plus_dm, period) / average_range)
+        minus_di = 100 * (sma(minus_dm, period) / average_range)
+    return plus_di, minus_di
+
+
+def adx(high, low, close, period=14):
+    """Returns ADX, +DI and -DI."""
+    plus_di, minus_di = directional_index(high, low, close, period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dx = 100 * (np.abs(plus_di - minus_di) / (plus_di + minus_di))
+    return sma(dx, period), plus_di, minus_di
+
+
+# --- Signal helpers shared by the strategies and the backtester ---
+# Signal arrays use 1 for BUY, -1 for SELL and 0 for no signal.
+
+def crossover(fast, slow):
+    """1 where `fast` crosses above `slow`, -1 where it crosses below."""
+    fast, slow = as_array(fast), as_array(slow)
+    prev_fast, prev_slow = shift(fast), shift(slow)
+    up = (prev_fast < prev_slow) & (fast > slow)
+    down = (prev_fast > prev_slow) & (fast < slow)
+    return up.astype(np.int8) - down.astype(np.int8)
+
+
+def to_signal(code):
+    return {1: "BUY", -1: "SELL"}.get(int(code))
@@ -0,0 +1,164 @@
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+
+import numpy as np
+
+import metrics
+
+BATCH_WINDOW_SECONDS = float(os.getenv("INFERENCE_BATCH_WINDOW_SECONDS", "0.02"))
+CACHE_SIZE = 256
+
+inference_seconds = metrics.histogram(
+    "kryseos_inference_seconds", "Model prediction latency, queueing and batching included", ["model"]
+)
+
+
+class InferenceWorker:
+    """
+    Serves Keras predictions from one background thread.
+
+    Requests arriving within `batch_window` of each other are stacked into a
+    single forward pass per model, and each prediction is cached by
+    (model, last bar timestamp) so later callers on the same bar get it for
+    free. Identical requests that are still in flight share one result.
+
+    TensorFlow and the model files are only loaded on first use (or by
+    `preload`), once per process.
+    """
+
+    def __init__(self, model_files, batch_window=BATCH_WINDOW_SECONDS, cache_size=CACHE_SIZE):
+        self.model_files = model_files
+        self.models = {}
+        self._load_lock = threading.Lock()
+        self.batch_window = batch_window
+        self.cache_size = cache_size
+        self._queue = queue.Queue()
+        self._cache = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+        self.requests = 0
+        self.cache_hits = 0
+        self.batches = 0
+        self.batched_requests = 0
+        self.latencies = deque(maxlen=1000)
+
+    def get_model(self, model_name):
+        model = self.models.get(model_name)
+        if model is not None:
+            return model
+
+        with self._load_lock:
+            if model_name not in self.models:
+                from tensorflow.keras.models import load_model
+
+                started = time.perf_counter()
+                self.models[model_name] = load_model(self.model_files[model_name], compile=False)
+                print(f"[inference] loaded {model_name} model in {time.perf_counter() - started:.1f}s")
+            return self.models[model_name]
+
+    def preload(self):
+        for model_name in self.model_files:
+            self.get_model(model_name)
+
+    def predict(self, model_name, arr, bar_time, timeout=60):
+        """Returns the model output for a (1, window, features) input as a float."""
+        key = (model_name, bar_time)
+
+        with self._lock:
+            self.requests += 1
+            if key in self._cache:
+                self.cache_hits += 1
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+            future = self._pending.get(key)
+            if future is None:
+                future = self._pending[key] = Future()
+                self._queue.put((key, arr, future, time.perf_counter()))
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="inference", daemon=True)
+                    self._thread.start()
+            else:
+                self.cache_hits += 1
+
+        return future.result(timeout)
+
+    def _collect_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.batch_window
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return batch
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                return batch
+
+    def _run(self):
+        try:
+            while True:
+                by_model = {}
+                for item in self._collect_batch():
+                    by_model.setdefault(item[0][0], []).append(item)
+
+                for model_name, items in by_model.items():
+                    try:
+                        self._serve(model_name, items)
+                    except Exception as e:
+                        # Whatever failed (the model, or splitting its output), no caller waits for a timeout
+                        self._fail(items, e)
+        finally:
+            # Should the loop die anyway, a new one takes over whatever is still queued
+            with self._lock:
+                self._thread = None
+                if not self._queue.empty():
+                    self._thread = threading.Thread(target=self._run, name="inference", daemon=True)
+                    self._thread.start()
+
+    def _serve(self, model_name, items):
+        inputs = np.concatenate([arr for _, arr, _, _ in items], axis=0)
+        outputs = self.get_model(model_name).predict(inputs, verbose=0)
+        values = [float(np.ravel(outputs[i])[0]) for i in range(len(items))]
+
+        with self._lock:
+            self.batches += 1
+            self.batched_requests += len(items)
+            for (key, _, future, started), value in zip(items, values):
+                self._pending.pop(key, None)
+                self._cache[key] = value
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+                elapsed = time.perf_counter() - started
+                self.latencies.append(elapsed)
+                inference_seconds.labels(model_name).observe(elapsed)
+                future.set_result(value)
+
+    def _fail(self, items, error):
+        with self._lock:
+            self.batches += 1
+            self.batched_requests += len(items)
+            for key, _, future, _ in items:
+                self._pending.pop(key, None)
+                if not future.done():
+                    future.set_exception(error)
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self.latencies)
+        return {
+            "models_loaded": sorted(self.models),
+            "requests": self.requests,
+            "cache_hits": self.cache_hits,
+            "cache_hit_rate": self.cache_hits / self.requests if self.requests else 0.0,
+            "batches": self.batches,
+            "avg_batch_size": self.batched_requests / self.batches if self.batches else 0.0,
+            "latency_ms_p50": latencies[len(latencies) // 2] * 1000 if latencies else None,
+            "latency_ms_p99": latencies[int(len(latencies) * 0.99)] * 1000 if latencies else None
+        }
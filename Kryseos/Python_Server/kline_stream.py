@@ -0,0 +1,192 @@
+import asyncio
+import itertools
+import json
+import os
+
+from market_data import kline_cache
+
+BINANCE_STREAM_URL = os.getenv("BINANCE_STREAM_URL", "wss://stream.binance.com:9443/stream")
+KLINE_STREAM_ENABLED = os.getenv("KLINE_STREAM", "1") == "1"
+RECONNECT_SECONDS = float(os.getenv("KLINE_STREAM_RECONNECT_SECONDS", "1"))
+MAX_RECONNECT_SECONDS = 60
+
+
+def stream_name(symbol, interval):
+    return f"{symbol.lower()}@kline_{interval}"
+
+
+def kline_row(k):
+    """A kline stream payload in the row format of the REST klines endpoint."""
+    return [k["t"], k["o"], k["h"], k["l"], k["c"], k["v"], k["T"], k["q"], k["n"], k["V"], k["Q"], k["B"]]
+
+
+class KlineStream:
+    """
+    Keeps the kline cache current from Binance kline WebSocket streams.
+
+    Every update is merged into the cache, which then serves reads without
+    REST calls, and each closed bar is announced to the listeners as
+    `listener(symbol, interval, close_ms)` from the event loop. On connect,
+    on reconnect, and whenever an update does not follow the cached bars,
+    the key is backfilled over REST; a bar close missed in the meantime is
+    announced once the backfill has caught up.
+    """
+
+    def __init__(self, cache=kline_cache, url=BINANCE_STREAM_URL, reconnect_seconds=RECONNECT_SECONDS):
+        self.cache = cache
+        self.url = url
+        self.reconnect_seconds = reconnect_seconds
+        self.streams = {}  # stream name -> (symbol, interval)
+        self.listeners = []
+        self.last_closed = {}  # (symbol, interval) -> close time of the last announced bar
+        self._backfilling = set()
+        self._backfill_again = set()
+        self._request_ids = itertools.count(1)
+        self._ws = None
+        self._loop = None
+        self._task = None
+
+        self.messages = 0
+        self.bar_closes = 0
+        self.backfills = 0
+        self.reconnects = 0
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._task = self._loop.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def subscribe(self, symbol, interval):
+        name = stream_name(symbol, interval)
+        if name in self.streams:
+            return
+        self.streams[name] = (symbol, interval)
+        if self._ws is not None:
+            self._loop.create_task(self._send_method("SUBSCRIBE", [name]))
+            self._loop.create_task(self._backfill(symbol, interval))
+
+    def unsubscribe(self, symbol, interval):
+        name = stream_name(symbol, interval)
+        if self.streams.pop(name, None) is None:
+            return
+        self.cache.set_live(symbol, interval, False)
+        self.last_closed.pop((symbol, interval), None)
+        if self._ws is not None:
+            self._loop.create_task(self._send_method("UNSUBSCRIBE", [name]))
+
+    async def _send_method(self, method, params):
+        try:
+            await self._ws.send(json.dumps({"method": method, "params": params, "id": next(self._request_ids)}))
+        except Exception as e:
+            print(f"[kline-stream] {method} failed: {e}")
+
+    async def _run(self):
+        import websockets
+
+        delay = self.reconnect_seconds
+        while True:
+            try:
+                async with websockets.connect(self.url, ping_interval=20, ping_timeout=20, close_timeout=1) as ws:
+                    self._ws = ws
+                    delay = self.reconnect_seconds
+                    print(f"[kline-stream] connected to {self.url}")
+                    if self.streams:
+                        await self._send_method("SUBSCRIBE", list(self.streams))
+                    # Catch up on whatever changed while disconnected
+                    for symbol, interval in list(self.streams.values()):
+                        self._loop.create_task(self._backfill(symbol, interval))
+                    async for text in ws:
+                        self._handle(text)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[kline-stream] disconnected: {e}")
+            finally:
+                self._ws = None
+                for symbol, interval in list(self.streams.values()):
+                    self.cache.set_live(symbol, interval, False)
+
+            # Until the stream is back, reads fall back to REST refreshes
+            self.reconnects += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RECONNECT_SECONDS)
+
+    def _handle(self, text):
+        data = json.loads(text)
+        data = data.get("data", data)
+        if not isinstance(data, dict) or data.get("e") != "kline":
+            return  # subscription acknowledgements
+        self.messages += 1
+
+        k = data["k"]
+        symbol, interval = k["s"], k["i"]
+        if stream_name(symbol, interval) not in self.streams:
+            return
+        if not self.cache.apply_kline(symbol, interval, kline_row(k)):
+            self._loop.create_task(self._backfill(symbol, interval))
+            return
+        if k["x"]:
+            self._announce(symbol, interval, k["T"])
+
+    async def _backfill(self, symbol, interval):
+        key = (symbol, interval)
+        if key in self._backfilling:
+            # Something was missed while a backfill is in flight: run it once more afterwards
+            self._backfill_again.add(key)
+            return
+
+        self._backfilling.add(key)
+        try:
+            while True:
+                self._backfill_again.discard(key)
+                close_ms = await self._loop.run_in_executor(None, self.cache.backfill, symbol, interval)
+                self.backfills += 1
+                if key not in self._backfill_again:
+                    break
+            if stream_name(symbol, interval) in self.streams and self._ws is not None:
+                self.cache.set_live(symbol, interval, True)
+            # Announce a close missed while away; the first connect only sets the baseline
+            if close_ms is not None and key in self.last_closed:
+                self._announce(symbol, interval, close_ms)
+            elif close_ms is not None:
+                self.last_closed[key] = close_ms
+        except Exception as e:
+            print(f"[kline-stream] backfill failed for {symbol} {interval}: {e}")
+        finally:
+            self._backfilling.discard(key)
+
+    def _announce(self, symbol, interval, close_ms):
+        key = (symbol, interval)
+        if close_ms <= self.last_closed.get(key, -1):
+            return
+        self.last_closed[key] = close_ms
+        self.bar_closes += 1
+        for listener in self.listeners:
+            try:
+                listener(symbol, interval, close_ms)
+            except Exception as e:
+                print(f"[kline-stream] bar-close listener failed: {e}")
+
+    def stats(self):
+        return {
+            "connected": self._ws is not None,
+            "streams": sorted(self.streams),
+            "messages": self.messages,
+            "bar_closes": self.bar_closes,
+            "backfills": self.backfills,
+            "reconnects": self.reconnects
+        }
+
+
+kline_stream = KlineStream()
@@ -0,0 +1,262 @@
+import os
+import threading
+import time
+import pandas as pd
+
+import metrics
+from resampler import timeframe_ms
+
+# Define column names returned by the Binance API
+KLINE_COLUMNS = ["timestamp", "open", "high", "low", "close", "volume", "close_time",
+                 "quote_asset_volume", "number_of_trades", "taker_buy_base", "taker_buy_quote", "ignore"]
+
+# Length of each Binance interval in milliseconds
+INTERVAL_MS = {
+    "1m": 60_000, "3m": 180_000, "5m": 300_000, "15m": 900_000, "30m": 1_800_000,
+    "1h": 3_600_000, "2h": 7_200_000, "4h": 14_400_000, "6h": 21_600_000, "8h": 28_800_000,
+    "12h": 43_200_000, "1d": 86_400_000, "3d": 259_200_000, "1w": 604_800_000
+}
+
+MAX_BATCH = 1000  # Binance returns at most 1000 klines per request
+MAX_WINDOW = int(os.getenv("KLINE_CACHE_MAX_BARS", "2000"))
+MIN_REFRESH_SECONDS = float(os.getenv("KLINE_CACHE_MIN_REFRESH_SECONDS", "5"))
+
+_client = None
+_client_lock = threading.Lock()
+
+kline_fetch_seconds = metrics.histogram("kryseos_kline_fetch_seconds", "Upstream kline download duration", ["interval"])
+
+
+def to_binance_symbol(symbol):
+    if symbol == "BTC/USD":
+        return "BTCUSDT"
+    elif symbol == "ETH/USD":
+        return "ETHUSDT"
+    return symbol
+
+
+def get_binance_client():
+    """Returns the single Binance client shared by the whole process."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            from binance.client import Client
+            _client = Client(os.getenv("BINANCE_API_KEY", ""), os.getenv("BINANCE_SECRET_KEY", ""))
+        return _client
+
+
+def download_klines(symbol, interval, limit=None, start_time=None):
+    """
+    Downloads klines from Binance, paging past the 1000-bar request limit.
+    With `start_time` every bar opened at or after it is returned,
+    otherwise the newest `limit` bars.
+    """
+    client = get_binance_client()
+    rows = []
+
+    if start_time is not None:
+        while True:
+            batch = client.get_klines(symbol=symbol, interval=interval, startTime=start_time, limit=MAX_BATCH)
+            rows.extend(batch)
+            if len(batch) < MAX_BATCH:
+                return rows
+            start_time = batch[-1][0] + 1
+
+    end_time = None
+    while len(rows) < limit:
+        batch_limit = min(MAX_BATCH, limit - len(rows))
+        if end_time is None:
+            batch = client.get_klines(symbol=symbol, interval=interval, limit=batch_limit)
+        else:
+            batch = client.get_klines(symbol=symbol, interval=interval, endTime=end_time, limit=batch_limit)
+        if not batch:
+            break
+        rows = batch + rows
+        if len(batch) < batch_limit:
+            break
+        end_time = batch[0][0] - 1
+    return rows
+
+
+class _CacheEntry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.rows = []
+        self.window = 0
+        self.refreshed_at = None
+        self.live = False  # kept current by the kline stream, so reads skip the REST refresh
+
+
+class KlineCache:
+    """
+    Candle store keyed by (symbol, interval).
+
+    Each key keeps a bounded window of raw klines. A refresh only downloads the
+    bars opened since the last closed bar, and callers asking for the same key
+    while a refresh is running wait for it instead of issuing their own request.
+    While the kline stream keeps a key live, its updates are merged in with
+    `apply_kline` and reads do not go to REST at all. With a candle store
+    attached, a window is seeded from disk and only the bars since the last
+    stored one are downloaded.
+    """
+
+    def __init__(self, max_window=MAX_WINDOW, min_refresh_seconds=MIN_REFRESH_SECONDS, download=download_klines,
+                 clock=time.time, store=None):
+        self.max_window = max_window
+        self.min_refresh_seconds = min_refresh_seconds
+        self._download = download
+        self._clock = clock
+        # Optional CandleStore: seeds empty windows from disk and keeps every closed bar
+        self.store = store
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.upstream_calls = 0
+
+    def _entry(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _CacheEntry()
+            return entry
+
+    def get_klines(self, symbol, interval, limit):
+        limit = min(limit, self.max_window)
+        entry = self._entry((symbol, interval))
+
+        with entry.lock:
+            fresh = entry.live or (entry.refreshed_at is not None
+                                   and time.monotonic() - entry.refreshed_at < self.min_refresh_seconds)
+
+            if len(entry.rows) < limit:
+                entry.window = max(entry.window, limit)
+                seeded = self.store.read_klines(symbol, interval, entry.window) if self.store else []
+                if len(seeded) >= limit:
+                    entry.rows = seeded
+                    self._refresh(entry, symbol, interval)
+                else:
+                    entry.rows = self._fetch(symbol, interval, limit=entry.window)
+                    self._persist(symbol, interval, entry.rows)
+                entry.refreshed_at = time.monotonic()
+            elif not fresh:
+                self._refresh(entry, symbol, interval)
+                entry.refreshed_at = time.monotonic()
+
+            return entry.rows[-limit:]
+
+    def _refresh(self, entry, symbol, interval):
+        now_ms = int(self._clock() * 1000)
+        rows = entry.rows
+
+        # Keep every closed bar and re-download from the first one still forming
+        closed = len(rows)
+        while closed > 0 and rows[closed - 1][6] >= now_ms:
+            closed -= 1
+        if closed == len(rows):
+            start_time = rows[-1][0] + 1
+        else:
+            start_time = rows[closed][0]
+
+        new_rows = self._fetch(symbol, interval, start_time=start_time)
+        entry.rows = (rows[:closed] + new_rows)[-entry.window:]
+        self._persist(symbol, interval, new_rows)
+
+    def _fetch(self, symbol, interval, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self._download(symbol, interval, **kwargs)
+        finally:
+            self.upstream_calls += 1
+            kline_fetch_seconds.labels(interval).observe(time.perf_counter() - started)
+
+    def _persist(self, symbol, interval, rows):
+        if self.store is None:
+            return
+        now_ms = int(self._clock() * 1000)
+        try:
+            self.store.append_klines(symbol, interval, [row for row in rows if row[6] < now_ms])
+        except Exception as e:
+            print(f"[candle-store] append failed for {symbol} {interval}: {e}")
+
+    def apply_kline(self, symbol, interval, row):
+        """
+        Merges one streamed kline (REST row format) into the cached window.
+        Returns False when it does not follow the cached bars, i.e. updates were
+        missed and the key needs a backfill.
+        """
+        entry = self._entry((symbol, interval))
+        with entry.lock:
+            rows = entry.rows
+            if not rows or row[0] < rows[-1][0]:
+                # Not downloaded yet (the first read will) or a stale update
+                return True
+            if row[0] == rows[-1][0]:
+                rows[-1] = row
+            elif row[0] == rows[-1][0] + INTERVAL_MS[interval]:
+                rows.append(row)
+                if len(rows) > entry.window:
+                    del rows[:len(rows) - entry.window]
+            else:
+                entry.live = False
+                return False
+            self._persist(symbol, interval, [row])
+            return True
+
+    def backfill(self, symbol, interval):
+        """Brings a cached window up to date over REST; returns the close time of its last closed bar."""
+        entry = self._entry((symbol, interval))
+        with entry.lock:
+            if not entry.rows:
+                return None
+            self._refresh(entry, symbol, interval)
+            entry.refreshed_at = time.monotonic()
+            now_ms = int(self._clock() * 1000)
+            closed = [row[6] for row in entry.rows if row[6] < now_ms]
+            return closed[-1] if closed else None
+
+    def set_live(self, symbol, interval, live):
+        self._entry((symbol, interval)).live = live
+
+
+kline_cache = KlineCache()
+
+
+def get_klines(symbol, interval, limit):
+    return kline_cache.get_klines(to_binance_symbol(symbol), interval, limit)
+
+
+def get_closed_klines(symbol, interval, limit):
+    """The newest `limit` bars that have closed; the bar still forming is left out."""
+    now_ms = int(time.time() * 1000)
+    klines = get_klines(symbol, interval, limit + 1)
+    return [row for row in klines if row[6] < now_ms][-limit:]
+
+
+def klines_to_frame(klines):
+    df = pd.DataFrame(klines, columns=KLINE_COLUMNS)
+
+    # Convert timestamp to datetime and relevant columns to float
+    df["timestamp"] = pd.to_datetime(df["timestamp"], unit="ms")
+    df[["open", "high", "low", "close", "volume"]] = df[["open", "high", "low", "close", "volume"]].astype(float)
+
+    # Set timestamp as index and sort by time
+    df.set_index("timestamp", inplace=True)
+    return df.sort_index()
+
+
+def resample_closed(df, rule):
+    """
+    Aggregates closed klines into `rule` candles aligned to the Unix epoch (like
+    Binance's own intervals), dropping a last candle that is not complete yet.
+    """
+    length = pd.Timedelta(milliseconds=timeframe_ms(rule))
+    resampled = df.resample(length, origin="epoch").agg({
+        "open": "first",
+        "high": "max",
+        "low": "min",
+        "close": "last",
+        "volume": "sum"
+    })
+    if len(df):
+        step = df.index[-1] - df.index[-2] if len(df) > 1 else pd.Timedelta(0)
+        resampled = resampled[resampled.index + length <= df.index[-1] + step]
+    return resampled
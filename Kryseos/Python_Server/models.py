@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, JSON
+from sqlalchemy import Column, String, JSON, Integer, Float, DateTime, Index, Boolean
 from sqlalchemy.ext.mutable import MutableList
 from sqlalchemy.orm import declarative_base
 
@@ -11,4 +11,56 @@ class User(Base):
     api_key = Column(String, nullable=False)     # 🔐 Encrypted API key
     api_secret = Column(String, nullable=False)  # 🔐 Encrypted API secret
     account = Column(String, nullable=False)
-    equity = Column(MutableList.as_mutable(JSON), default=list)  # ✅ Equity history
+    credential_fingerprint = Column(String, index=True)  # 🔎 HMAC of key, secret and account, for login lookup
+    equity = Column(MutableList.as_mutable(JSON), default=list)  # Legacy equity history, migrated to equity_snapshots
+
+class EquitySnapshot(Base):
+    __tablename__ = "equity_snapshots"
+    __table_args__ = (
+        Index("ix_equity_snapshots_user_time", "user_id", "timestamp"),  # ✅ Range scans per user
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(String, nullable=False)
+    timestamp = Column(DateTime, nullable=False)  # UTC
+    equity = Column(Float, nullable=False)
+
+
+class FilledOrder(Base):
+    __tablename__ = "filled_orders"
+    __table_args__ = (
+        Index("ix_filled_orders_user_seq", "user_id", "seq"),
+        Index("ix_filled_orders_user_submitted", "user_id", "submitted_at"),
+    )
+
+    order_id = Column(String, primary_key=True)  # Alpaca order id
+    user_id = Column(String, nullable=False)
+    seq = Column(Integer, nullable=False)  # Order in which fills were paired
+    side = Column(String, nullable=False)
+    price = Column(Float, nullable=False)
+    submitted_at = Column(DateTime, nullable=False)  # UTC
+    filled_at = Column(DateTime)  # UTC
+    trade_profit_ratio = Column(Float)  # Set on the fill that closes a buy/sell pair
+
+class PerformanceState(Base):
+    __tablename__ = "performance_state"
+
+    user_id = Column(String, primary_key=True)
+    last_submitted_at = Column(DateTime)  # Sync cursor
+    pending_side = Column(String)  # Unpaired fill waiting for its counterpart
+    pending_price = Column(Float)
+    num_fills = Column(Integer, nullable=False, default=0)
+    num_pairs = Column(Integer, nullable=False, default=0)
+    num_wins = Column(Integer, nullable=False, default=0)
+    last_trade_profit_ratio = Column(Float, nullable=False, default=0.0)
+
+class TradingConfig(Base):
+    __tablename__ = "trading_configs"
+
+    user_id = Column(String, primary_key=True)
+    symbol = Column(String, nullable=False)
+    strategy = Column(Integer, nullable=False)
+    risk = Column(Float, nullable=False)
+    account = Column(String, nullable=False)
+    active = Column(Boolean, nullable=False, default=True, index=True)  # ▶️ Restored on startup while set
+    updated_at = Column(DateTime)  # UTC
@@ -0,0 +1,176 @@
+"""
+Local mirror of each user's filled orders, with the trade statistics kept
+up to date as fills arrive.
+
+`sync_filled_orders` asks Alpaca only for orders submitted after the last
+one seen and pairs the new fills onto the stored state, so re-analysis
+costs the number of new orders rather than the whole history (and orders
+beyond the last 100 are no longer dropped).
+"""
+import asyncio
+from datetime import timedelta
+
+import pandas as pd
+from sqlalchemy.future import select
+
+from database import release_connection
+from models import FilledOrder, PerformanceState
+from write_behind import write_behind
+
+PAGE_SIZE = 500
+# Re-read this much before the cursor so orders sharing its timestamp are not skipped
+SYNC_OVERLAP = timedelta(seconds=1)
+
+# user_id -> [lock, syncs holding or waiting on it]; the last one out drops the entry
+_sync_locks = {}
+
+
+def _utc(value):
+    if value is None:
+        return None
+    dt = pd.to_datetime(value)
+    if dt.tzinfo is None:
+        dt = dt.tz_localize("UTC")
+    return dt.tz_convert(None).to_pydatetime()
+
+
+def fetch_filled_orders(api, after=None):
+    """Filled orders submitted after `after` (UTC), oldest first, across pages (pages may overlap)."""
+    orders = []
+    while True:
+        page = api.list_orders(
+            status='filled',
+            limit=PAGE_SIZE,
+            after=after.isoformat() + "Z" if after is not None else None,
+            direction='asc'
+        )
+        orders.extend(page)
+        if len(page) < PAGE_SIZE:
+            return orders
+        next_after = _utc(page[-1].submitted_at) - SYNC_OVERLAP
+        if after is not None and next_after <= after:
+            return orders
+        after = next_after
+
+
+def apply_fill(state, fill):
+    """
+    Pairs one fill onto the running state, the same way
+    `performance.pair_trade_profit_ratios` walks the full list.
+    Returns the trade profit ratio when the fill closes a pair.
+    """
+    state.num_fills += 1
+    if state.pending_side is None or state.pending_side == fill.side:
+        state.pending_side, state.pending_price = fill.side, fill.price
+        return None
+
+    buy_price = state.pending_price if state.pending_side == 'buy' else fill.price
+    sell_price = fill.price if state.pending_side == 'buy' else state.pending_price
+    ratio = (sell_price - buy_price) / sell_price
+
+    state.pending_side, state.pending_price = None, None
+    state.num_pairs += 1
+    state.num_wins += ratio > 0
+    state.last_trade_profit_ratio = ratio
+    return ratio
+
+
+async def get_state(session, user_id):
+    state = await session.get(PerformanceState, user_id)
+    if state is None:
+        # Not added to the session: it is stored with the first fill
+        state = PerformanceState(
+            user_id=user_id, num_fills=0, num_pairs=0, num_wins=0, last_trade_profit_ratio=0.0
+        )
+    return state
+
+
+async def sync_filled_orders(session, api, user_id):
+    """
+    Mirrors new filled orders and updates the aggregates through the
+    write-behind queue. Returns how many fills were added.
+
+    Syncs of the same user run one at a time, so two analyses never pair
+    (and insert) the same fills twice.
+    """
+    entry = _sync_locks.setdefault(user_id, [asyncio.Lock(), 0])
+    entry[1] += 1
+    try:
+        async with entry[0]:
+            # Start a new read so the fills committed by the previous sync are visible
+            await release_connection(session)
+            return await _sync(session, api, user_id)
+    finally:
+        entry[1] -= 1
+        if entry[1] == 0:
+            _sync_locks.pop(user_id, None)
+
+
+async def _sync(session, api, user_id):
+    state = await get_state(session, user_id)
+    after = state.last_submitted_at - SYNC_OVERLAP if state.last_submitted_at else None
+    await release_connection(session)
+    orders = await api.run(fetch_filled_orders, api, after)
+
+    known = set()
+    if orders:
+        result = await session.execute(
+            select(FilledOrder.order_id).where(FilledOrder.order_id.in_([o.id for o in orders]))
+        )
+        known = set(result.scalars().all())
+
+    new_fills = []
+    for o in orders:
+        if o.id in known or o.filled_avg_price is None or o.submitted_at is None:
+            continue
+        known.add(o.id)
+        new_fills.append(FilledOrder(
+            order_id=o.id,
+            user_id=user_id,
+            side=o.side.lower(),
+            price=float(o.filled_avg_price),
+            submitted_at=_utc(o.submitted_at),
+            filled_at=_utc(o.filled_at)
+        ))
+
+    new_fills.sort(key=lambda fill: fill.submitted_at)
+    for fill in new_fills:
+        fill.seq = state.num_fills
+        fill.trade_profit_ratio = apply_fill(state, fill)
+        if state.last_submitted_at is None or fill.submitted_at > state.last_submitted_at:
+            state.last_submitted_at = fill.submitted_at
+
+    if new_fills:
+        # The state leaves this session so autoflush does not write it here as well
+        if state in session:
+            session.expunge(state)
+        await release_connection(session)
+        await write_behind.write(user_id, add=new_fills, merge=[state])
+    return len(new_fills)
+
+
+async def trade_statistics(session, user_id):
+    """Trade metrics in the shape `summarize_performance` reports them, from the stored aggregates."""
+    state = await get_state(session, user_id)
+
+    result = await session.execute(
+        select(FilledOrder.trade_profit_ratio)
+        .where(FilledOrder.user_id == user_id, FilledOrder.trade_profit_ratio.is_not(None))
+        .order_by(FilledOrder.seq)
+    )
+    trade_profit_ratios = list(result.scalars().all())
+
+    result = await session.execute(
+        select(FilledOrder.filled_at)
+        .where(FilledOrder.user_id == user_id, FilledOrder.side == 'sell', FilledOrder.filled_at.is_not(None))
+        .order_by(FilledOrder.seq)
+    )
+    sell_fill_times = [dt.strftime("%b %d, %Y, %I:%M:%S %p") for dt in result.scalars().all()]
+
+    return {
+        "last_trade_profit_ratio": state.last_trade_profit_ratio,
+        "trade_profit_ratios": trade_profit_ratios,
+        "winning_rate": state.num_wins / state.num_pairs if state.num_pairs else 0.0,
+        "num_trades": state.num_fills // 2,
+        "sell_fill_times": sell_fill_times
+    }
@@ -0,0 +1,225 @@
+"""
+Trading performance analytics on NumPy arrays.
+
+Used by the live feedback payload and by the offline backtests, so both
+report the same numbers. Metrics that are undefined for the given history
+(e.g. a profit factor without losing trades) are None, which keeps the
+results JSON-safe.
+"""
+import math
+
+import numpy as np
+
+
+def _finite(value):
+    value = float(value)
+    return value if math.isfinite(value) else None
+
+
+# --- Trades ---
+
+def pair_trades(sides, prices):
+    """
+    Pairs consecutive buy/sell fills (in time order) into trades.
+
+    Walking the fills, the last fill of each run of same-side fills pairs
+    with the first fill of the next run, unless it is a run of one fill that
+    the previous pair already used. Returns the trade profit ratios
+    (sell - buy) / sell and the index of each trade's closing fill.
+    """
+    sides = np.asarray(sides, dtype=str)
+    prices = np.asarray(prices, dtype=np.float64)
+    if len(sides) < 2:
+        return np.empty(0), np.empty(0, dtype=np.int64)
+    if not np.isin(sides, ["buy", "sell"]).all():
+        sides = np.char.lower(sides)
+    is_buy = sides == "buy"
+
+    run_starts = np.flatnonzero(np.concatenate([[True], is_buy[1:] != is_buy[:-1]]))
+    run_ends = np.append(run_starts[1:], len(sides)) - 1
+    single = run_starts == run_ends
+
+    # A run of two or more fills always pairs with the next run. Through a stretch
+    # of single-fill runs pairing alternates, starting from whether the run before
+    # the stretch paired (it did if there is one).
+    runs = np.arange(len(run_starts))
+    last_long = np.maximum.accumulate(np.where(single, -1, runs))
+    paired = np.where(single, ((runs - last_long) % 2 == 1) != (last_long >= 0), True)
+    paired[-1] = False
+
+    first = run_ends[paired]
+    second = run_starts[np.flatnonzero(paired) + 1]
+    first_is_buy = is_buy[first]
+    buy_price = np.where(first_is_buy, prices[first], prices[second])
+    sell_price = np.where(first_is_buy, prices[second], prices[first])
+    return (sell_price - buy_price) / sell_price, second
+
+
+def pair_trade_profit_ratios(sides, prices):
+    return pair_trades(sides, prices)[0].tolist()
+
+
+def trade_metrics(trade_profit_ratios):
+    ratios = np.asarray(trade_profit_ratios, dtype=np.float64)
+    wins = ratios[ratios > 0]
+    losses = ratios[ratios < 0]
+    gross_loss = -losses.sum()
+    return {
+        "last_trade_profit_ratio": float(ratios[-1]) if len(ratios) else 0.0,
+        "winning_rate": len(wins) / len(ratios) if len(ratios) else 0.0,
+        "profit_factor": _finite(wins.sum() / gross_loss) if gross_loss > 0 else None,
+        "avg_win": float(wins.mean()) if len(wins) else None,
+        "avg_loss": float(losses.mean()) if len(losses) else None
+    }
+
+
+# --- Equity ---
+
+def equity_performance(equity_history):
+    """Total profit and profit ratio between the first and last equity values."""
+    if len(equity_history) >= 2:
+        total_profit = round(float(equity_history[-1] - equity_history[0]), 2)
+        return total_profit, round(total_profit / float(equity_history[0]), 4)
+    return 0.0, 0.0
+
+
+def returns(equity):
+    equity = np.asarray(equity, dtype=np.float64)
+    return np.diff(equity) / equity[:-1]
+
+
+def drawdown(equity):
+    """Drawdown from the running peak at every point, and the index of that peak."""
+    equity = np.asarray(equity, dtype=np.float64)
+    peak = np.maximum.accumulate(equity)
+    peak_index = np.maximum.accumulate(np.where(equity >= peak, np.arange(len(equity)), 0))
+    return equity / peak - 1, peak_index
+
+
+def max_drawdown(equity, timestamps=None):
+    """
+    Deepest drawdown and the longest time spent below a previous peak,
+    in points or, with `timestamps`, in their units.
+    """
+    if len(equity) == 0:
+        return 0.0, 0
+    dd, peak_index = drawdown(equity)
+    if timestamps is None:
+        duration = np.arange(len(dd)) - peak_index
+    else:
+        timestamps = np.asarray(timestamps)
+        duration = timestamps - timestamps[peak_index]
+    return float(dd.min()), duration.max().item()
+
+
+def sharpe_ratio(period_returns, periods_per_year=365):
+    r = np.asarray(period_returns, dtype=np.float64)
+    if len(r) < 2:
+        return None
+    std = r.std(ddof=1)
+    return _finite(r.mean() / std * np.sqrt(periods_per_year)) if std > 0 else None
+
+
+def sortino_ratio(period_returns, periods_per_year=365):
+    r = np.asarray(period_returns, dtype=np.float64)
+    if len(r) < 2:
+        return None
+    downside = np.sqrt(np.mean(np.minimum(r, 0.0) ** 2))
+    return _finite(r.mean() / downside * np.sqrt(periods_per_year)) if downside > 0 else None
+
+
+def equity_metrics(equity, timestamps=None, periods_per_year=365):
+    equity = np.asarray(equity, dtype=np.float64)
+    total_profit, profit_ratio = equity_performance(equity)
+    deepest, duration = max_drawdown(equity, timestamps)
+    r = returns(equity) if len(equity) >= 2 else np.empty(0)
+    return {
+        "total_profit": total_profit,
+        "profit_ratio": profit_ratio,
+        "max_drawdown": deepest,
+        "drawdown_duration": duration,
+        "sharpe": sharpe_ratio(r, periods_per_year),
+        "sortino": sortino_ratio(r, periods_per_year)
+    }
+
+
+# --- Rolling windows: element i covers the `window` values ending at i, NaN before that ---
+
+def _rolling_sum(x, window):
+    sums = np.concatenate([[0.0], np.cumsum(x)])
+    out = np.full(len(x), np.nan)
+    if len(x) >= window:
+        out[window - 1:] = sums[window:] - sums[:-window]
+    return out
+
+
+def rolling_sharpe(equity, window, periods_per_year=365):
+    """Sharpe ratio over the last `window` returns, aligned with `returns(equity)`."""
+    r = returns(equity)
+    mean = _rolling_sum(r, window) / window
+    variance = (_rolling_sum(r * r, window) - window * mean * mean) / (window - 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return mean / np.sqrt(np.maximum(variance, 0.0)) * np.sqrt(periods_per_year)
+
+
+def rolling_sortino(equity, window, periods_per_year=365):
+    """Sortino ratio over the last `window` returns, aligned with `returns(equity)`."""
+    r = returns(equity)
+    mean = _rolling_sum(r, window) / window
+    downside = np.sqrt(_rolling_sum(np.minimum(r, 0.0) ** 2, window) / window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return mean / downside * np.sqrt(periods_per_year)
+
+
+def rolling_max_drawdown(equity, window):
+    """Deepest drawdown inside each run of `window` equity points."""
+    equity = np.asarray(equity, dtype=np.float64)
+    n = len(equity)
+    out = np.full(n, np.nan)
+    count = n - window + 1
+    if count <= 0:
+        return out
+
+    # Cut the series into blocks of `window` points: each window is the tail of one block
+    # followed by the head of the next, so running extremes per block cover every window in O(n).
+    # Blocks are columns, so each accumulate step runs over all blocks at once
+    blocks = -(-n // window)
+    x = np.pad(equity, (0, blocks * window - n), mode="edge").reshape(blocks, window).T.copy()
+    rx = x[::-1]
+    head_low = np.minimum.accumulate(x).T.ravel()
+    head_drawdown = np.minimum.accumulate(x / np.maximum.accumulate(x) - 1).T.ravel()
+    tail_peak = np.maximum.accumulate(rx)[::-1].T.ravel()
+    # From each point, the fall to the lowest point after it; the deepest of those from i on is the tail's drawdown
+    tail_drawdown = np.minimum.accumulate(np.minimum.accumulate(rx) / rx - 1)[::-1].T.ravel()
+
+    # A peak in the tail and a low in the head; windows starting a block have no head
+    across = head_low[window - 1:n] / tail_peak[:count] - 1
+    across[::window] = 0.0
+    out[window - 1:] = np.minimum(np.minimum(tail_drawdown[:count], head_drawdown[window - 1:n]), across)
+    return out
+
+
+def rolling_trade_metrics(trade_profit_ratios, window):
+    """Win rate, profit factor, average win and average loss over the last `window` trades."""
+    ratios = np.asarray(trade_profit_ratios, dtype=np.float64)
+    win_count = _rolling_sum((ratios > 0).astype(np.float64), window)
+    loss_count = _rolling_sum((ratios < 0).astype(np.float64), window)
+    win_sum = _rolling_sum(np.where(ratios > 0, ratios, 0.0), window)
+    loss_sum = _rolling_sum(np.where(ratios < 0, ratios, 0.0), window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return {
+            "winning_rate": win_count / window,
+            "profit_factor": np.where(loss_sum < 0, win_sum / -loss_sum, np.nan),
+            "avg_win": win_sum / win_count,
+            "avg_loss": loss_sum / loss_count
+        }
+
+
+def summarize_performance(equity_history, sides, prices, timestamps=None, periods_per_year=365):
+    """Equity and trade metrics from an equity history and time-ordered fills."""
+    ratios, _ = pair_trades(sides, prices)
+    metrics = equity_metrics(equity_history, timestamps, periods_per_year)
+    metrics.update(trade_metrics(ratios))
+    metrics["trade_profit_ratios"] = ratios.tolist()
+    metrics["num_trades"] = len(sides) // 2
+    return metrics
@@ -0,0 +1,241 @@
+"""
+On-demand profiling of the trading loop and requests.
+
+While a capture runs, a background thread samples the call stack of every
+thread (`sys._current_frames`) and `span` records how long each stage
+took. When the window ends, or on `stop`, two files go to PROFILE_DIR:
+
+- `<name>.folded`: one line per distinct stack with its sample count, for
+  flamegraph.pl, speedscope or inferno
+- `<name>.trace.json`: spans as Chrome trace events, for chrome://tracing
+  or Perfetto
+
+Nothing runs between captures: `span` returns a shared no-op context
+manager after a single global check.
+
+A capture can be limited to one user: spans of other users are dropped
+(shared work such as a group's signal evaluation is kept), and stacks are
+only sampled on threads inside one of that user's spans or a shared one.
+Coroutines share the event loop thread, so while one of the user's
+coroutine spans is open every sample of that thread is kept, whoever's
+code it caught.
+"""
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "300"))
+PROFILE_MAX_SPANS = int(os.getenv("PROFILE_MAX_SPANS", "200000"))
+DEFAULT_INTERVAL_MS = 5
+MAX_STACK_DEPTH = 64
+
+_capture = None  # the running Capture, if any
+
+
+class _NoSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+class _Span:
+    __slots__ = ("capture", "name", "user_id", "args", "tid", "started")
+
+    def __init__(self, capture, name, user_id, args):
+        self.capture = capture
+        self.name = name
+        self.user_id = user_id
+        self.args = args
+
+    def __enter__(self):
+        self.tid = threading.get_ident()
+        self.started = time.perf_counter()
+        self.capture.enter(self.tid, self.user_id)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.capture.exit(self, time.perf_counter(), exc_type)
+        return False
+
+
+def span(name, user_id=None, **args):
+    """Times a stage while a capture runs; free otherwise."""
+    capture = _capture
+    if capture is None or not capture.wants(user_id):
+        return _NO_SPAN
+    return _Span(capture, name, user_id, args)
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class Capture:
+    def __init__(self, seconds, user_id=None, interval_ms=DEFAULT_INTERVAL_MS, directory=PROFILE_DIR):
+        self.seconds = min(float(seconds), PROFILE_MAX_SECONDS)
+        self.user_id = user_id
+        self.interval = max(float(interval_ms), 1.0) / 1000
+        self.directory = directory
+        suffix = "-" + re.sub(r"[^\w.-]", "_", user_id) if user_id else ""
+        self.name = datetime.utcnow().strftime("profile-%Y%m%d-%H%M%S") + suffix
+        self.started_at = time.time()
+        self.origin = time.perf_counter()
+        self.samples = Counter()
+        self.sample_count = 0
+        self.spans = []
+        self.dropped_spans = 0
+        self.open = {}  # thread id -> Counter of the users with spans open on it
+        self.files = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def wants(self, user_id):
+        return self.user_id is None or user_id is None or user_id == self.user_id
+
+    def enter(self, tid, user_id):
+        with self._lock:
+            self.open.setdefault(tid, Counter())[user_id] += 1
+
+    def exit(self, span, ended, exc_type):
+        with self._lock:
+            users = self.open.get(span.tid)
+            if users is not None:
+                users[span.user_id] -= 1
+                if users[span.user_id] <= 0:
+                    del users[span.user_id]
+                if not users:
+                    del self.open[span.tid]
+            if len(self.spans) >= PROFILE_MAX_SPANS:
+                self.dropped_spans += 1
+                return
+            args = dict(span.args)
+            if span.user_id is not None:
+                args["user_id"] = span.user_id
+            if exc_type is not None:
+                args["error"] = exc_type.__name__
+            self.spans.append((span.name, span.tid, span.user_id, span.started - self.origin,
+                               ended - span.started, args))
+
+    def _sampled_threads(self):
+        if self.user_id is None:
+            return None
+        with self._lock:
+            return {tid for tid, users in self.open.items() if users.get(self.user_id) or users.get(None)}
+
+    def _run(self):
+        own = threading.get_ident()
+        deadline = time.perf_counter() + self.seconds
+        while not self._stop.wait(self.interval) and time.perf_counter() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            wanted = self._sampled_threads()
+            for tid, frame in sys._current_frames().items():
+                if tid == own or (wanted is not None and tid not in wanted):
+                    continue
+                stack = []
+                while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(tid, str(tid)))
+                self.samples[";".join(reversed(stack))] += 1
+                self.sample_count += 1
+        finish(self)
+
+    def write(self):
+        os.makedirs(self.directory, exist_ok=True)
+        folded = os.path.join(self.directory, self.name + ".folded")
+        trace = os.path.join(self.directory, self.name + ".trace.json")
+
+        with open(folded, "w") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+        with self._lock:
+            spans = list(self.spans)
+        pid = os.getpid()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        # One track per (thread, user): coroutines of different users interleave on the loop thread
+        tracks = {}
+        for _, tid, user_id, _, _, _ in spans:
+            tracks.setdefault((tid, user_id), len(tracks) + 1)
+        events = [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": track,
+             "args": {"name": names.get(tid, str(tid)) + (f" {user_id}" if user_id else "")}}
+            for (tid, user_id), track in tracks.items()
+        ]
+        events.extend(
+            {"name": name, "cat": "span", "ph": "X", "pid": pid, "tid": tracks[(tid, user_id)],
+             "ts": round(start * 1e6, 1), "dur": round(duration * 1e6, 1), "args": args}
+            for name, tid, user_id, start, duration, args in spans
+        )
+        with open(trace, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms",
+                       "otherData": {"started_at": self.started_at, "user_id": self.user_id}}, f)
+        return {"folded": folded, "trace": trace}
+
+    def status(self):
+        return {
+            "name": self.name,
+            "user_id": self.user_id,
+            "seconds": self.seconds,
+            "elapsed": round(time.time() - self.started_at, 2),
+            "samples": self.sample_count,
+            "spans": len(self.spans),
+            "dropped_spans": self.dropped_spans,
+            "files": self.files
+        }
+
+
+_control_lock = threading.Lock()
+last_capture = None
+
+
+def start(seconds, user_id=None, interval_ms=DEFAULT_INTERVAL_MS):
+    """Starts a capture unless one is running. Returns it, or None when busy."""
+    global _capture
+    with _control_lock:
+        if _capture is not None:
+            return None
+        capture = _capture = Capture(seconds, user_id, interval_ms)
+    capture._thread.start()
+    print(f"[profile] capturing {capture.seconds:g}s" + (f" for {user_id}" if user_id else ""))
+    return capture
+
+
+def stop():
+    """Ends the running capture early and waits for its files. Returns it, or None when idle."""
+    capture = _capture
+    if capture is None:
+        return None
+    capture._stop.set()
+    capture._thread.join()
+    return capture
+
+
+def finish(capture):
+    global _capture, last_capture
+    with _control_lock:
+        if _capture is capture:
+            _capture = None
+        last_capture = capture
+    try:
+        capture.files = capture.write()
+        print(f"[profile] {capture.sample_count} samples, {len(capture.spans)} spans -> {capture.files['folded']}")
+    except Exception as e:
+        print(f"[profile] could not write {capture.name}: {e}")
+
+
+def status():
+    capture = _capture or last_capture
+    return {"active": _capture is not None, "capture": capture.status() if capture else None}
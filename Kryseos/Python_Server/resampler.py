@@ -0,0 +1,98 @@
+import itertools
+import re
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+_UNIT_MS = {"m": 60_000, "h": 3_600_000, "d": 86_400_000, "w": 604_800_000}
+
+NAN = float("nan")
+
+
+def timeframe_ms(timeframe):
+    """Length of a timeframe such as "10h" or "1d" in milliseconds."""
+    match = re.fullmatch(r"(\d+)([mhdw])", timeframe)
+    if match is None:
+        raise ValueError(f"Unknown timeframe: {timeframe}")
+    return int(match.group(1)) * _UNIT_MS[match.group(2)]
+
+
+class IncrementalResampler:
+    """
+    Aggregates closed base bars into `rule_ms` OHLCV bars as they arrive.
+
+    The bars match `resample_closed` (an epoch-aligned
+    `df.resample(rule).agg(first/max/min/last/sum)` without the incomplete
+    last bar) over the same base bars, including the NaN bars pandas makes
+    for buckets with no data. The difference is the first bucket: when the
+    input starts partway through a bucket, that bucket is left out rather
+    than aggregated from whatever base bars it has. A bar is complete once
+    the base bar ending at its close arrives, or any later one. Only the
+    newest `max_bars` complete bars are kept.
+    """
+
+    def __init__(self, rule_ms, base_ms, max_bars=2000):
+        if rule_ms % base_ms:
+            raise ValueError(f"{rule_ms} ms bars cannot be built from {base_ms} ms bars")
+        self.rule_ms = rule_ms
+        self.base_ms = base_ms
+        self.columns = {name: deque(maxlen=max_bars) for name in ["open_time", "open", "high", "low", "close", "volume"]}
+        self.last_open = None  # open time of the last base bar fed
+        self._current = None  # [bucket open time, open, high, low, close, volume]
+        self._last_bucket = None  # open time of the last complete bar
+        self._skip_bucket = None
+
+    def __len__(self):
+        return len(self.columns["open_time"])
+
+    def update(self, open_ms, open_, high, low, close, volume):
+        """Feeds one closed base bar; bars at or before the last one fed are ignored."""
+        if self.last_open is not None and open_ms <= self.last_open:
+            return
+        bucket = open_ms - open_ms % self.rule_ms
+
+        if self.last_open is None and open_ms != bucket:
+            # Started partway through a bucket: leave that bucket out
+            self._skip_bucket = bucket
+        self.last_open = open_ms
+        if bucket == self._skip_bucket:
+            return
+
+        current = self._current
+        if current is not None and current[0] != bucket:
+            self._finish(current)
+            current = None
+        if current is None:
+            if self._last_bucket is not None:
+                # Buckets without any base bar, as pandas reports them
+                for missing in range(self._last_bucket + self.rule_ms, bucket, self.rule_ms):
+                    self._append(missing, NAN, NAN, NAN, NAN, 0.0)
+            current = self._current = [bucket, open_, high, low, close, volume]
+        else:
+            current[2] = max(current[2], high)
+            current[3] = min(current[3], low)
+            current[4] = close
+            current[5] += volume
+
+        if open_ms + self.base_ms == bucket + self.rule_ms:
+            self._finish(current)
+
+    def _finish(self, current):
+        self._append(*current)
+        self._current = None
+
+    def _append(self, open_ms, open_, high, low, close, volume):
+        for name, value in zip(self.columns, (open_ms, open_, high, low, close, volume)):
+            self.columns[name].append(value)
+        self._last_bucket = open_ms
+
+    def frame(self, lookback=None):
+        """The newest `lookback` complete bars, in the layout of `klines_to_frame`."""
+        count = len(self) if lookback is None else min(lookback, len(self))
+        start = len(self) - count
+        tail = {name: list(itertools.islice(values, start, None)) for name, values in self.columns.items()}
+        index = pd.DatetimeIndex(pd.to_datetime(np.asarray(tail.pop("open_time"), dtype=np.int64), unit="ms"),
+                                 name="timestamp")
+        return pd.DataFrame({name: np.asarray(values, dtype=np.float64) for name, values in tail.items()}, index=index)
+
@@ -1,25 +1,37 @@
-from fastapi import APIRouter, Form, WebSocket, WebSocketDisconnect
-from fastapi.responses import JSONResponse
-import threading
+from fastapi import APIRouter, Form, Header, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, PlainTextResponse
 import uuid
+import hmac
 import httpx
 import asyncio
 import json
 import os
+from datetime import datetime
+from typing import Optional
 from cryptography.fernet import Fernet
-from sqlalchemy.future import select
 from models import User
-from database import AsyncSessionLocal
+from database import (
+    AsyncSessionLocal, find_user_id, credential_fingerprint, save_trading_config, deactivate_trading_config
+)
+from equity_store import equity_daily, equity_range
 from services import (
-    user_locks, user_configs, user_threads, user_sockets,
-    user_thread_function, user_credentials, user_feedback, user_running_flags,
-    broadcast_feedback_to_user, send_bot_status
+    user_locks, user_configs, user_feedback, user_running_flags, register_user, ensure_user,
+    broadcast_feedback_to_user, send_feedback_snapshot, send_bot_status, notify_config_changed,
+    signal_group_stats, inference_worker
 )
+from feedback_stream import feedback_stream
 from TradeExecutor import analyze_trading_performance
-import alpaca_trade_api as tradeapi
+from broker import get_broker_session, close_broker_session, broker_stats
+from write_behind import write_behind
+from ws_bus import ws_bus
+import metrics
+import profiling
+from profiling import span
 
 router = APIRouter()
 fernet = Fernet(os.environ["FERNET_KEY"])
+# Profiling endpoints are disabled unless a token is configured
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
 
 def encrypt(text: str) -> str:
     return fernet.encrypt(text.encode()).decode()
@@ -44,59 +56,42 @@ async def validate_alpaca_keys(api_key: str, api_secret: str, account: str) -> b
 
 @router.post("/login")
 async def login(api_key: str = Form(...), api_secret: str = Form(...), account: str = Form(...)):
+    with span("login"):
+        return await _login(api_key, api_secret, account)
+
+async def _login(api_key, api_secret, account):
     if account not in ["https://paper-api.alpaca.markets", "https://live-api.alpaca.markets"]:
         return JSONResponse(content={"message": "Invalid account URL"}, status_code=400)
 
-    is_valid = await validate_alpaca_keys(api_key, api_secret, account)
+    with span("login.validate"):
+        is_valid = await validate_alpaca_keys(api_key, api_secret, account)
     if not is_valid:
         return JSONResponse(content={"message": "Invalid API keys. Please enter valid keys."}, status_code=401)
 
-    enc_key = encrypt(api_key)
-    enc_secret = encrypt(api_secret)
-
     async with AsyncSessionLocal() as session:
-        result = await session.execute(select(User))
-        users = result.scalars().all()
-
-        user_id = None
-        for user in users:
-            try:
-                if (
-                    decrypt(user.api_key) == api_key and
-                    decrypt(user.api_secret) == api_secret and
-                    user.account == account
-                ):
-                    user_id = user.user_id
-                    break
-            except Exception:
-                continue
+        with span("login.lookup"):
+            user_id = await find_user_id(session, api_key, api_secret, account)
 
         if user_id is None:
             user_id = str(uuid.uuid4())
             session.add(User(
                 user_id=user_id,
-                api_key=enc_key,
-                api_secret=enc_secret,
+                api_key=encrypt(api_key),
+                api_secret=encrypt(api_secret),
                 account=account,
+                credential_fingerprint=credential_fingerprint(api_key, api_secret, account),
                 equity=[]
             ))
             await session.commit()
 
     if user_id not in user_locks:
-        user_credentials[user_id] = {"api_key": api_key, "api_secret": api_secret, "account": account}
-        user_feedback[user_id] = {}
-        user_locks[user_id] = threading.Lock()
-        user_configs[user_id] = None
-        user_running_flags[user_id] = [False]
-        user_sockets[user_id] = set()
-        thread = threading.Thread(target=user_thread_function, args=(user_id,), daemon=True)
-        thread.start()
-        user_threads[user_id] = thread
-        print(f"🟢 Initialized session and thread for user {user_id}")
+        print(f"🟢 Initialized session for user {user_id}")
+    register_user(user_id, credentials={"api_key": api_key, "api_secret": api_secret, "account": account})
 
     try:
-        api = tradeapi.REST(api_key, api_secret, account, api_version="v2")
-        feedback = await analyze_trading_performance(api, user_id)
+        api = get_broker_session(user_id, api_key, api_secret, account)
+        with span("feedback", user_id):
+            feedback = await analyze_trading_performance(api, user_id)
         if feedback:
             user_feedback[user_id] = feedback
             await asyncio.sleep(1.5)
@@ -112,16 +107,19 @@ async def login(api_key: str = Form(...), api_secret: str = Form(...), account:
 
 @router.post("/start-trading")
 async def start_trading(user_id: str = Form(...), symbol: str = Form(...), strategy: int = Form(...), risk: float = Form(...), account: str = Form(...)):
-    if user_id not in user_locks:
+    if not await ensure_user(user_id):
         return JSONResponse(content={"message": "Invalid user ID"}, status_code=401)
 
+    config = {
+        "symbol": symbol,
+        "strategy": strategy,
+        "risk": risk,
+        "account": account
+    }
+    await save_trading_config(user_id, config)
     with user_locks[user_id]:
-        user_configs[user_id] = {
-            "symbol": symbol,
-            "strategy": strategy,
-            "risk": risk,
-            "account": account
-        }
+        user_configs[user_id] = config
+    notify_config_changed(user_id)
 
     print(f"▶️ Trading started for user {user_id}")
     await send_bot_status(user_id, "Running")
@@ -129,62 +127,122 @@ async def start_trading(user_id: str = Form(...), symbol: str = Form(...), strat
 
 @router.post("/stop-trading")
 async def stop_trading(user_id: str = Form(...)):
-    if user_id not in user_locks:
+    if not await ensure_user(user_id):
         return JSONResponse(content={"message": "Invalid user ID"}, status_code=401)
 
+    await deactivate_trading_config(user_id)
     with user_locks[user_id]:
         user_configs[user_id] = None
+    notify_config_changed(user_id)
 
     print(f"⏹️ Trading stopped for user {user_id}")
     await send_bot_status(user_id, "Stopped")
     return JSONResponse(content={"message": "Trading stopped", "user_id": user_id}, status_code=200)
 
+@router.get("/signal-groups")
+async def signal_groups():
+    return JSONResponse(content=signal_group_stats(), status_code=200)
+
+@router.get("/inference-stats")
+async def inference_stats():
+    return JSONResponse(content=inference_worker.stats(), status_code=200)
+
+@router.get("/broker-stats")
+async def broker_stats_endpoint():
+    return JSONResponse(content=broker_stats(), status_code=200)
+
+@router.get("/equity-history/{user_id}")
+async def equity_history(user_id: str, resolution: str = "daily", start: Optional[datetime] = None, end: Optional[datetime] = None):
+    if not await ensure_user(user_id):
+        return JSONResponse(content={"message": "Invalid user ID"}, status_code=401)
+    if resolution not in ("raw", "daily"):
+        return JSONResponse(content={"message": "resolution must be raw or daily"}, status_code=400)
+
+    async with AsyncSessionLocal() as session:
+        if resolution == "daily":
+            points = await equity_daily(session, user_id, start, end)
+        else:
+            points = [(t.isoformat(), e) for t, e in await equity_range(session, user_id, start, end)]
+    return JSONResponse(content={"user_id": user_id, "resolution": resolution, "points": points}, status_code=200)
+
 @router.websocket("/ws/{user_id}")
 async def websocket_endpoint(websocket: WebSocket, user_id: str):
     await websocket.accept()
-    user_sockets.setdefault(user_id, set()).add(websocket)
+    subscriber = ws_bus.subscribe(user_id, websocket)
 
-    if user_id in user_feedback and user_feedback[user_id]:
-        try:
-            await websocket.send_text(json.dumps({
-                "type": "performance_update",
-                "data": user_feedback[user_id]
-            }))
-        except Exception as e:
-            print(f"❌ WebSocket error sending feedback: {e}")
+    send_feedback_snapshot(subscriber, user_id)
 
-    try:
-        is_running = user_running_flags.get(user_id, [False])[0]
-        await websocket.send_text(json.dumps({
-            "type": "bot_status",
-            "data": {"status": "Running" if is_running else "Stopped"}
-        }))
-    except Exception as e:
-        print(f"❌ WebSocket error sending status: {e}")
+    is_running = user_running_flags.get(user_id, [False])[0]
+    ws_bus.send_to(subscriber, "bot_status", {"status": "Running" if is_running else "Stopped"})
 
     try:
         while True:
-            await websocket.receive_text()
+            text = await websocket.receive_text()
+            try:
+                message = json.loads(text)
+            except ValueError:
+                continue
+            if isinstance(message, dict) and message.get("type") == "resync":
+                send_feedback_snapshot(subscriber, user_id)
     except WebSocketDisconnect:
-        user_sockets[user_id].discard(websocket)
         print(f"🔌 WebSocket disconnected for user {user_id}")
+    finally:
+        ws_bus.unsubscribe(subscriber)
+
+def _is_admin(token):
+    return ADMIN_TOKEN is not None and token is not None and hmac.compare_digest(token, ADMIN_TOKEN)
+
+@router.post("/admin/profile")
+async def start_profile(seconds: float = Form(30), user_id: Optional[str] = Form(None),
+                        interval_ms: float = Form(profiling.DEFAULT_INTERVAL_MS),
+                        x_admin_token: Optional[str] = Header(None)):
+    if not _is_admin(x_admin_token):
+        return JSONResponse(content={"message": "Forbidden"}, status_code=403)
+    capture = profiling.start(seconds, user_id, interval_ms)
+    if capture is None:
+        return JSONResponse(content={"message": "A capture is already running", **profiling.status()}, status_code=409)
+    return JSONResponse(content=profiling.status(), status_code=200)
+
+@router.post("/admin/profile/stop")
+async def stop_profile(x_admin_token: Optional[str] = Header(None)):
+    if not _is_admin(x_admin_token):
+        return JSONResponse(content={"message": "Forbidden"}, status_code=403)
+    # Joins the sampler and writes the files, so keep it off the event loop
+    await asyncio.get_running_loop().run_in_executor(None, profiling.stop)
+    return JSONResponse(content=profiling.status(), status_code=200)
+
+@router.get("/admin/profile")
+async def profile_status(x_admin_token: Optional[str] = Header(None)):
+    if not _is_admin(x_admin_token):
+        return JSONResponse(content={"message": "Forbidden"}, status_code=403)
+    return JSONResponse(content=profiling.status(), status_code=200)
+
+@router.get("/metrics")
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@router.get("/db-stats")
+async def db_stats():
+    return JSONResponse(content=write_behind.stats(), status_code=200)
+
+@router.get("/ws-stats")
+async def ws_stats():
+    return JSONResponse(content=ws_bus.stats(), status_code=200)
 
 @router.post("/logout")
 async def logout(user_id: str = Form(...)):
-    if user_id in user_sockets:
-        for ws in list(user_sockets[user_id]):
-            try:
-                await ws.close()
-            except:
-                pass
-        user_sockets[user_id].clear()
+    await ws_bus.close_topic(user_id)
 
+    await deactivate_trading_config(user_id)
     if user_id in user_configs:
         user_configs[user_id] = None
+        notify_config_changed(user_id)
     if user_id in user_feedback:
         user_feedback[user_id] = {}
+    feedback_stream.reset(user_id)
     if user_id in user_running_flags:
         user_running_flags[user_id][0] = False
+    close_broker_session(user_id)
 
     print(f"👋 User {user_id} logged out and memory cleared")
     return JSONResponse(content={"message": "Logout successful"}, status_code=200)
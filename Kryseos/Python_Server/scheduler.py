@@ -0,0 +1,143 @@
+import asyncio
+import functools
+import heapq
+import itertools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+MAX_WORKERS = int(os.getenv("STRATEGY_WORKERS", "16"))
+ERROR_RETRY_SECONDS = 10
+# Seconds after a bar closes before jobs on it run, so the exchange has published the final bar
+BAR_CLOSE_DELAY_SECONDS = float(os.getenv("BAR_CLOSE_DELAY_SECONDS", "2"))
+
+scheduler_lag_seconds = metrics.histogram(
+    "kryseos_scheduler_job_lag_seconds", "How late each job started versus its due time"
+)
+
+
+def next_bar_close(interval_seconds, now=None, delay=BAR_CLOSE_DELAY_SECONDS):
+    """
+    Run time just after the first close of an `interval_seconds` bar after
+    `now`. Bars are aligned to the Unix epoch, like Binance klines, so every
+    job on the same interval lands on the same instant.
+    """
+    now = time.time() if now is None else now
+    return now // interval_seconds * interval_seconds + interval_seconds + delay
+
+
+class StrategyScheduler:
+    """
+    Runs strategy jobs inside the server's event loop.
+
+    Jobs wait in a priority queue ordered by their next run time. The scheduler
+    sleeps until the earliest job is due or until a job is (re)scheduled, so
+    idle users cost nothing. A job is a coroutine function called with its key
+    that returns the next run time (epoch seconds) or None to stop. Blocking
+    broker and pandas work goes through `run_blocking` on a bounded pool.
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="strategy")
+        self._heap = []
+        self._jobs = {}
+        self._locks = {}
+        self._tokens = itertools.count()
+        self._wakeup = None
+        self._loop = None
+        self._task = None
+        self.last_lag = 0.0  # seconds the most recently started job ran late
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = self._loop.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.executor.shutdown(wait=False)
+
+    def schedule(self, key, job, when=None):
+        """Runs `job(key)` at `when` (default: now), replacing any pending run of `key`."""
+        token = next(self._tokens)
+        self._jobs[key] = (job, token)
+        heapq.heappush(self._heap, (time.time() if when is None else when, token, key))
+
+        # Drop entries left behind by rescheduled or cancelled jobs
+        if len(self._heap) > 2 * len(self._jobs) + 64:
+            self._heap = [item for item in self._heap if self._jobs.get(item[2], (None, None))[1] == item[1]]
+            heapq.heapify(self._heap)
+
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def cancel(self, key):
+        self._jobs.pop(key, None)
+
+    def is_scheduled(self, key):
+        return key in self._jobs
+
+    def pending(self):
+        return len(self._jobs)
+
+    async def run_blocking(self, fn, *args, **kwargs):
+        return await self._loop.run_in_executor(self.executor, functools.partial(fn, *args, **kwargs))
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            now = time.time()
+
+            while self._heap and self._heap[0][0] <= now:
+                due, token, key = heapq.heappop(self._heap)
+                job, current = self._jobs.get(key, (None, None))
+                if current == token:
+                    self._loop.create_task(self._execute(key, job, token, due))
+
+            timeout = self._heap[0][0] - now if self._heap else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _execute(self, key, job, token, due):
+        # [lock, runs holding or waiting on it]; dropped by the last one out so keys don't pile up
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                await self._run_job(key, job, token, due)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                self._locks.pop(key, None)
+
+    async def _run_job(self, key, job, token, due):
+        if self._jobs.get(key, (None, None))[1] != token:
+            return
+        self.last_lag = max(time.time() - due, 0.0)
+        scheduler_lag_seconds.observe(self.last_lag)
+
+        try:
+            next_run = await job(key)
+        except Exception as e:
+            print(f"[scheduler] job error for {key}: {e}")
+            next_run = time.time() + ERROR_RETRY_SECONDS
+
+        # A start/stop that arrived while the job ran has already replaced it
+        if self._jobs.get(key, (None, None))[1] != token:
+            return
+        if next_run is None:
+            self._jobs.pop(key, None)
+        else:
+            self.schedule(key, job, next_run)
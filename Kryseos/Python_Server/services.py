@@ -1,196 +1,335 @@
-import threading
+import os
 import time
+import random
 import asyncio
-import json
-from fastapi import WebSocket
-
-import alpaca_trade_api as tradeapi
-from tensorflow.keras.models import load_model
-
-from Model_strategy_BTC_ETH import get_historical_data
-from SMA import get_historical_data_SMA, check_signal_SMA
-from MACD import get_historical_data_MACD, check_signal_MACD
-from Hull import get_historical_data_HMA, check_signal_HMA
-from SMAADX import get_historical_data_ADX, check_signal_ADX
-from RSISMA50 import get_historical_data_RSI, check_signal_RSI
-from TradeExecutor import trade, get_position
+import threading
+
+from broker import get_broker_session, close_broker_session
+from database import decrypt_credentials, load_encrypted_credentials, load_active_configs
+
+from Model_strategy_BTC_ETH import preload_scalers
+from strategy_registry import STRATEGY_REGISTRY, evaluate_strategy, data_planner, inference_worker
+from TradeExecutor import trade
 from TradeExecutor import analyze_trading_performance
+from scheduler import StrategyScheduler, next_bar_close
+from signal_service import SignalService, group_configs
+from ws_bus import ws_bus
+from kline_stream import kline_stream
+from market_data import to_binance_symbol
+from feedback_stream import feedback_stream
+import metrics
+from profiling import span
 
 # Persistent user data
 user_credentials = {}
+user_encrypted_credentials = {}  # Restored users' credentials as stored, decrypted on first use
 user_configs = {}
 user_feedback = {}
 
 # Runtime memory
-user_threads = {}
 user_locks = {}
-user_sockets = {}
 user_running_flags = {}
+user_apis = {}
+user_active_configs = {}
+user_test_phase = {}
+user_signal_bars = {}
+
+scheduler = StrategyScheduler()
+
+metrics.gauge("kryseos_active_users", "Users with a session in memory", lambda: len(user_locks))
+metrics.gauge("kryseos_running_bots", "Users whose bot is running",
+              lambda: sum(1 for flag in list(user_running_flags.values()) if flag[0]))
+metrics.gauge("kryseos_scheduled_jobs", "Jobs waiting in the scheduler", scheduler.pending)
+metrics.gauge("kryseos_scheduler_lag_seconds", "How late the most recently started job ran",
+              lambda: scheduler.last_lag)
+
+# Bar length in seconds for each strategy; evaluations run just after each (epoch-aligned) bar close
+SLEEP_TIMES = {strategy: spec.bar_seconds for strategy, spec in STRATEGY_REGISTRY.items()}
+
+# Each subscriber's order goes out within this many seconds of the group's signal, to spread broker load
+DISPATCH_JITTER_SECONDS = float(os.getenv("DISPATCH_JITTER_SECONDS", "3"))
+
+# First analyses of starting sessions that run at once; a mass restore queues the rest instead of flooding the broker
+SESSION_ANALYSIS_CONCURRENCY = int(os.getenv("SESSION_ANALYSIS_CONCURRENCY", "16"))
+session_analyses = asyncio.Semaphore(SESSION_ANALYSIS_CONCURRENCY)
 
-# Load ML model once
-model_BTC = load_model("model-daily-MACD-BTC-25D.h5", compile=False)
-model_ETH = load_model("model-daily-MACD-ETH-10D.h5", compile=False)
+# Kline interval each strategy reads; its bar closes drive the strategy's evaluations.
+# Every timeframe is derived from the planner's single base interval.
+STREAM_INTERVALS = {strategy: data_planner.base_interval for strategy in STRATEGY_REGISTRY}
 
+# (strategy, symbol) groups with a scheduled job, i.e. the pairs the kline stream must follow
+stream_groups = set()
 
-def interruptible_sleep(user_id: str, total_seconds: int, check_interval: int = 2):
-    slept = 0
-    while slept < total_seconds:
-        if user_configs.get(user_id) is None:
-            print(f"[sleep] interrupted for {user_id}")
-            return
-        time.sleep(check_interval)
-        slept += check_interval
+def preload_ml_strategy():
+    """Loads TensorFlow, the models and the scalers ahead of the first strategy 1 evaluation."""
+    try:
+        started = time.perf_counter()
+        preload_scalers()
+        inference_worker.preload()
+        print(f"[inference] ML strategy preloaded in {time.perf_counter() - started:.1f}s")
+    except Exception as e:
+        print(f"[inference] preload failed: {e}")
 
 
 async def broadcast_feedback_to_user(user_id: str, feedback: dict):
-    if user_id in user_sockets:
-        for ws in list(user_sockets[user_id]):
-            try:
-                await send_feedback(ws, feedback)
-            except Exception as e:
-                print(f"[feedback] failed to send for {user_id}: {e}")
+    # Deltas share one key, so a lagging socket coalesces them, sees a seq gap and asks for a resync
+    ws_bus.publish(user_id, "performance_update", **feedback_stream.update(user_id, feedback))
+
+
+def send_feedback_snapshot(subscriber, user_id: str):
+    """Queues the user's full performance state, with its current seq, for one socket."""
+    snapshot = feedback_stream.snapshot(user_id)
+    if snapshot:
+        # Own key: a delta published right after must not replace the snapshot before it is sent
+        ws_bus.send_to(subscriber, "performance_update", key="performance_snapshot", **snapshot)
 
 
 async def analyze_and_broadcast(api, user_id):
     try:
-        feedback = await analyze_trading_performance(api, user_id)
-        if feedback:
-            user_feedback[user_id] = feedback
-            await broadcast_feedback_to_user(user_id, feedback)
-            print(f"[feedback] sent for {user_id}")
+        with span("feedback", user_id):
+            feedback = await analyze_trading_performance(api, user_id)
+            if feedback:
+                user_feedback[user_id] = feedback
+                await broadcast_feedback_to_user(user_id, feedback)
+                print(f"[feedback] sent for {user_id}")
     except Exception as e:
         print(f"[feedback] analyze failed for {user_id}: {e}")
 
 
-def user_thread_function(user_id):
-    print(f"[thread] started for {user_id}")
+def register_user(user_id, credentials=None, encrypted=None):
+    """Creates a user's runtime entries, with plain or still-encrypted credentials."""
+    if credentials is not None:
+        user_credentials[user_id] = credentials
+        user_encrypted_credentials.pop(user_id, None)
+    elif encrypted is not None and user_id not in user_credentials:
+        user_encrypted_credentials[user_id] = encrypted
+    if user_id in user_locks:
+        return
+    user_feedback[user_id] = {}
+    user_locks[user_id] = threading.Lock()
+    user_configs[user_id] = None
     user_running_flags[user_id] = [False]
-    api = None
-    prev_config = None
 
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
 
-    while True:
-        try:
-            config = user_configs.get(user_id)
-
-            if config != prev_config:
-                if config is not None:
-                    creds = user_credentials.get(user_id)
-                    if not creds:
-                        time.sleep(5)
-                        continue
-
-                    api = tradeapi.REST(
-                        creds["api_key"],
-                        creds["api_secret"],
-                        creds["account"],
-                        api_version='v2'
-                    )
-                    user_running_flags[user_id][0] = True
-                    prev_config = config
-
-                    try:
-                        feedback = loop.run_until_complete(analyze_trading_performance(api, user_id))
-                        if feedback:
-                            user_feedback[user_id] = feedback
-                            loop.run_until_complete(broadcast_feedback_to_user(user_id, feedback))
-                    except Exception as e:
-                        print(f"[thread] initial feedback error for {user_id}: {e}")
-                else:
-                    if user_running_flags[user_id][0]:
-                        print(f"[thread] stopped for {user_id}")
-                        user_running_flags[user_id][0] = False
-                        prev_config = None
-                        api = None
-
-            if user_running_flags[user_id][0] and config:
-                strategy = int(config["strategy"])
-                symbol = config["symbol"]
-                risk = float(config["risk"])
-                signal = "NONE"
-
-                if strategy == 1:
-                    arr_data, last_rsi = get_historical_data(symbol=symbol)
-                    predict = 0
-                    if symbol == "BTCUSD":
-                        predict = model_BTC.predict(arr_data)
-                        ris_UL = 83
-                        ris_LL = 25
-                    elif symbol == "ETHUSD":
-                        predict = model_ETH.predict(arr_data)
-                        ris_UL = 80
-                        ris_LL = 15
-
-                    if predict > 0 and last_rsi < ris_LL:
-                        signal = "BUY"
-                    elif predict < 0 and last_rsi > ris_UL:
-                        signal = "SELL"
-
-                elif strategy == 2:
-                    df = get_historical_data_SMA(symbol=symbol)
-                    signal = check_signal_SMA(df)
-                elif strategy == 3:
-                    df = get_historical_data_MACD(symbol=symbol)
-                    signal = check_signal_MACD(df)
-                elif strategy == 4:
-                    df = get_historical_data_HMA(symbol=symbol)
-                    signal = check_signal_HMA(df)
-                elif strategy == 5:
-                    df = get_historical_data_ADX(symbol=symbol)
-                    signal = check_signal_ADX(df)
-                elif strategy == 6:
-                    df = get_historical_data_RSI(symbol=symbol)
-                    signal = check_signal_RSI(df)
-                elif strategy == 7:
-                    signal = "BUY"
-                    trade(api, signal, risk, symbol)
-                    interruptible_sleep(user_id, 30)
-                    signal = "SELL"
-                    trade(api, signal, risk, symbol)
-                    loop.run_until_complete(analyze_and_broadcast(api, user_id))
-                    interruptible_sleep(user_id, 30)
-                    continue
-                else:
-                    interruptible_sleep(user_id, 10)
-                    continue
-
-                trade(api, signal, risk, symbol)
-
-                if signal == "SELL":
-                    loop.run_until_complete(analyze_and_broadcast(api, user_id))
-
-                sleep_times = {1: 86400, 2: 3600 * 16, 3: 3600 * 8, 4: 86400, 5: 86400, 6: 36000}
-                interruptible_sleep(user_id, sleep_times.get(strategy, 30))
-
-            time.sleep(2)
+async def ensure_user(user_id):
+    """Registers a stored user who has not been seen since the restart. False if there is no such user."""
+    if user_id in user_locks:
+        return True
+    encrypted = await load_encrypted_credentials(user_id)
+    if encrypted is None:
+        return False
+    register_user(user_id, encrypted=encrypted)
+    return True
+
+
+def get_credentials(user_id):
+    creds = user_credentials.get(user_id)
+    if creds is None and user_id in user_encrypted_credentials:
+        creds = user_credentials[user_id] = decrypt_credentials(*user_encrypted_credentials.pop(user_id))
+    return creds
+
+
+async def restore_active_sessions():
+    """Restarts the bots that were running at shutdown; users without an active config load on demand."""
+    started = time.perf_counter()
+    configs = await load_active_configs()
+    for user_id, (config, encrypted) in configs.items():
+        register_user(user_id, encrypted=encrypted)
+        user_configs[user_id] = config
+        notify_config_changed(user_id)
+    print(f"🔁 Restoring {len(configs)} trading sessions ({time.perf_counter() - started:.2f}s to load)")
+    return len(configs)
 
+
+async def start_user_session(user_id, config):
+    try:
+        creds = get_credentials(user_id)
+    except Exception as e:
+        print(f"[scheduler] could not decrypt credentials for {user_id}: {e}")
+        return False
+    if not creds:
+        return False
+
+    api = get_broker_session(user_id, creds["api_key"], creds["api_secret"], creds["account"])
+    user_apis[user_id] = api
+    user_active_configs[user_id] = config
+    user_running_flags[user_id][0] = True
+
+    # The bot does not wait for its first analysis
+    scheduler.schedule(("feedback", user_id), send_initial_feedback)
+    return True
+
+
+async def send_initial_feedback(key):
+    user_id = key[1]
+    api = user_apis.get(user_id)
+    if api is None:
+        return None
+    async with session_analyses:
+        try:
+            with span("feedback", user_id):
+                feedback = await analyze_trading_performance(api, user_id)
+                if feedback:
+                    user_feedback[user_id] = feedback
+                    await broadcast_feedback_to_user(user_id, feedback)
         except Exception as e:
-            print(f"[thread] loop error for {user_id}: {e}")
-            time.sleep(10)
+            print(f"[scheduler] initial feedback error for {user_id}: {e}")
+    return None
+
+
+signal_service = SignalService(evaluate_strategy, SLEEP_TIMES)
+
+
+def active_subscribers(strategy, symbol):
+    return [
+        user_id for user_id, config in list(user_active_configs.items())
+        if user_configs.get(user_id) == config
+        and int(config["strategy"]) == strategy and config["symbol"] == symbol
+    ]
+
+
+def signal_group_stats():
+    groups = group_configs({
+        user_id: config for user_id, config in user_active_configs.items()
+        if user_configs.get(user_id) == config and int(config["strategy"]) in SLEEP_TIMES
+    })
+    subscribers = sum(len(users) for users in groups.values())
+    return {
+        "groups": [
+            {"strategy": strategy, "symbol": symbol, "users": len(users)}
+            for (strategy, symbol), users in sorted(groups.items())
+        ],
+        "subscribers": subscribers,
+        "fan_out_ratio": subscribers / len(groups) if groups else 0.0,
+        "signal_requests": signal_service.requests,
+        "signal_evaluations": signal_service.evaluations,
+        "kline_stream": kline_stream.stats()
+    }
+
+
+def watch_group(strategy, symbol):
+    stream_groups.add((strategy, symbol))
+    kline_stream.subscribe(to_binance_symbol(symbol), STREAM_INTERVALS[strategy])
+
+
+def unwatch_group(strategy, symbol):
+    stream_groups.discard((strategy, symbol))
+    stream = (to_binance_symbol(symbol), STREAM_INTERVALS[strategy])
+    if all((to_binance_symbol(s), STREAM_INTERVALS[g]) != stream for g, s in stream_groups):
+        kline_stream.unsubscribe(*stream)
 
 
-async def send_feedback(websocket: WebSocket, message: dict):
+def on_bar_close(binance_symbol, interval, close_ms):
+    """Kline stream listener: runs every group whose strategy bar has just closed, instead of at its next poll."""
+    closed_at = (close_ms + 1) / 1000
+    for strategy, symbol in list(stream_groups):
+        if (to_binance_symbol(symbol), STREAM_INTERVALS[strategy]) != (binance_symbol, interval):
+            continue
+        if round(closed_at) % SLEEP_TIMES[strategy] == 0:
+            scheduler.schedule(("group", strategy, symbol), run_signal_group, closed_at)
+
+
+kline_stream.add_listener(on_bar_close)
+
+
+async def dispatch_signal(user_id, strategy, bar, signal, jitter=0):
+    """Executes a group's signal for one subscriber, at most once per bar."""
+    if jitter:
+        await asyncio.sleep(random.uniform(0, jitter))
+    config = user_active_configs.get(user_id)
+    api = user_apis.get(user_id)
+    if config is None or api is None:
+        return
+
+    signal_key = (strategy, config["symbol"], bar)
+    if user_signal_bars.get(user_id) == signal_key:
+        return
+    user_signal_bars[user_id] = signal_key
+
     try:
-        await websocket.send_text(json.dumps({
-            "type": "performance_update",
-            "data": message
-        }))
+        await scheduler.run_blocking(trade, api, signal, float(config["risk"]), config["symbol"], user_id=user_id)
+        if signal == "SELL":
+            await analyze_and_broadcast(api, user_id)
     except Exception as e:
-        print(f"[feedback] websocket send error: {e}")
+        print(f"[signal] dispatch failed for {user_id}: {e}")
+
+
+async def run_signal_group(key):
+    """Scheduler job: evaluates one (strategy, symbol) pair and fans the signal out to its subscribers."""
+    _, strategy, symbol = key
+    subscribers = active_subscribers(strategy, symbol)
+    if not subscribers:
+        unwatch_group(strategy, symbol)
+        return None
+
+    with span("group", strategy=strategy, symbol=symbol):
+        bar, signal = await scheduler.run_blocking(signal_service.get_signal, strategy, symbol)
+    print(f"[signal] strategy {strategy} {symbol}: {signal} -> {len(subscribers)} users")
+    jitter = DISPATCH_JITTER_SECONDS if signal else 0
+    await asyncio.gather(*(dispatch_signal(user_id, strategy, bar, signal, jitter) for user_id in subscribers))
+    return next_bar_close(SLEEP_TIMES[strategy])
+
+
+async def run_user_cycle(user_id):
+    """Scheduler job: starts or stops a user's session and handles strategies that are not shared."""
+    with span("cycle", user_id):
+        return await _user_cycle(user_id)
+
+
+async def _user_cycle(user_id):
+    config = user_configs.get(user_id)
+
+    if config is None:
+        if user_running_flags.get(user_id, [False])[0]:
+            print(f"[scheduler] stopped for {user_id}")
+            user_running_flags[user_id][0] = False
+        if user_apis.pop(user_id, None) is not None:
+            close_broker_session(user_id)
+        user_active_configs.pop(user_id, None)
+        user_test_phase.pop(user_id, None)
+        user_signal_bars.pop(user_id, None)
+        return None
+
+    if config != user_active_configs.get(user_id):
+        user_test_phase.pop(user_id, None)
+        user_signal_bars.pop(user_id, None)
+        if not await start_user_session(user_id, config):
+            return time.time() + 5
+
+    api = user_apis[user_id]
+    strategy = int(config["strategy"])
+    symbol = config["symbol"]
+    risk = float(config["risk"])
+
+    if strategy == 7:
+        # Test strategy: BUY, then SELL 30 seconds later, forever
+        signal = user_test_phase.get(user_id, "BUY")
+        await scheduler.run_blocking(trade, api, signal, risk, symbol, user_id=user_id)
+        if signal == "SELL":
+            await analyze_and_broadcast(api, user_id)
+        user_test_phase[user_id] = "SELL" if signal == "BUY" else "BUY"
+        return time.time() + 30
+
+    if strategy not in SLEEP_TIMES:
+        return time.time() + 10
+
+    # Act on the current bar right away, then follow the shared group schedule
+    bar, signal = await scheduler.run_blocking(signal_service.get_signal, strategy, symbol)
+    await dispatch_signal(user_id, strategy, bar, signal)
+
+    group = ("group", strategy, symbol)
+    if not scheduler.is_scheduled(group):
+        # Runs just after each bar close; with the kline stream up, the close event runs it first
+        scheduler.schedule(group, run_signal_group, next_bar_close(SLEEP_TIMES[strategy]))
+        watch_group(strategy, symbol)
+    return None
+
+
+def notify_config_changed(user_id):
+    """Runs the user's job right away so a start or stop takes effect immediately."""
+    scheduler.schedule(user_id, run_user_cycle)
 
 
 async def send_bot_status(user_id: str, status: str):
-    message = {
-        "type": "bot_status",
-        "data": {"status": status}
-    }
-
-    if user_id in user_sockets:
-        for ws in list(user_sockets[user_id]):
-            try:
-                await ws.send_text(json.dumps(message))
-                print(f"[bot status] sent '{status}' to {user_id}")
-            except Exception as e:
-                print(f"[bot status] send error for {user_id}: {e}")
+    ws_bus.publish(user_id, "bot_status", {"status": status})
+    print(f"[bot status] '{status}' published to {user_id}")
@@ -0,0 +1,53 @@
+import threading
+import time
+
+
+class SignalService:
+    """
+    Computes each (strategy, symbol) signal once per bar.
+
+    Strategies 1-6 depend only on the symbol and market data, so every user on
+    the same pair shares one evaluation. Callers asking for a pair while it is
+    being evaluated wait for that result instead of computing it again.
+    """
+
+    def __init__(self, evaluate, intervals):
+        self.evaluate = evaluate
+        self.intervals = intervals
+        self._signals = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.evaluations = 0
+
+    def bar_of(self, strategy, now=None):
+        return int((time.time() if now is None else now) // self.intervals[strategy])
+
+    def get_signal(self, strategy, symbol):
+        """Returns (bar, signal) for the current bar of `strategy`, evaluating at most once per bar."""
+        key = (strategy, symbol)
+        bar = self.bar_of(strategy)
+
+        with self._lock:
+            lock = self._locks.setdefault(key, threading.Lock())
+            self.requests += 1
+
+        with lock:
+            cached = self._signals.get(key)
+            if cached is not None and cached[0] == bar:
+                return cached
+
+            signal = self.evaluate(strategy, symbol)
+            self._signals[key] = (bar, signal)
+            self.evaluations += 1
+            return bar, signal
+
+
+def group_configs(configs):
+    """Groups active user configs by (strategy, symbol)."""
+    groups = {}
+    for user_id, config in configs.items():
+        if config is None:
+            continue
+        groups.setdefault((int(config["strategy"]), config["symbol"]), []).append(user_id)
+    return groups
@@ -0,0 +1,105 @@
+"""
+Live strategies: the bars each one reads and how it turns them into a signal.
+
+Every strategy declares a timeframe and a lookback; the data planner
+derives all the timeframes from one base kline series per symbol. Where a
+strategy has a streaming version of its indicators (`stream`), the planner
+keeps it per (symbol, timeframe) and feeds it each bar as it closes,
+instead of the indicators being recomputed over the whole lookback on
+every evaluation.
+"""
+import time
+
+import metrics
+from profiling import span
+from Model_strategy_BTC_ETH import features_ML, signals_ML, ML_SYMBOLS, MODEL_FILES, MODEL_WINDOWS, FEATURE_WARMUP_DAYS
+from SMA import indicators_SMA, stream_SMA, check_signal_SMA
+from MACD import indicators_MACD, check_signal_MACD
+from Hull import indicators_HMA, stream_HMA, check_signal_HMA
+from SMAADX import indicators_ADX, stream_ADX, check_signal_ADX
+from RSISMA50 import indicators_RSI, stream_RSI, check_signal_RSI
+from indicators import to_signal
+from inference import InferenceWorker
+from data_planner import DataPlanner
+from resampler import timeframe_ms
+
+
+class StrategySpec:
+    def __init__(self, name, timeframe, lookback, indicators, check, symbols=None, stream=None):
+        self.name = name
+        self.timeframe = timeframe
+        self.lookback = lookback
+        self.indicators = indicators  # indicators(bars, symbol) -> what `check` reads
+        self.check = check  # check(indicators, symbol) -> "BUY", "SELL" or None
+        self.stream = stream  # stream() -> a BarStream whose frame `check` reads instead, or None
+        self.symbols = symbols  # None: any symbol
+        self.bar_seconds = timeframe_ms(timeframe) // 1000
+
+    def supports(self, symbol):
+        return self.symbols is None or symbol in self.symbols
+
+
+STRATEGY_REGISTRY = {}
+
+indicator_seconds = metrics.histogram(
+    "kryseos_indicator_seconds", "Indicator and signal computation per evaluation (ML includes inference)", ["strategy"]
+)
+
+
+def register(strategy_id, name, timeframe, lookback, indicators, check, symbols=None, stream=None):
+    STRATEGY_REGISTRY[strategy_id] = StrategySpec(name, timeframe, lookback, indicators, check, symbols, stream)
+
+
+def per_frame(fn):
+    """Adapts a strategy function of one frame to the (frame, symbol) signature."""
+    return lambda df, symbol: fn(df)
+
+
+# ML models are loaded on first use of strategy 1
+inference_worker = InferenceWorker(MODEL_FILES)
+
+
+def signal_ML(features, symbol):
+    model_name, ris_UL, ris_LL = ML_SYMBOLS[symbol]
+    arr_data, last_rsi, bar_time = features
+    predict = inference_worker.predict(model_name, arr_data, bar_time)
+    return to_signal(signals_ML([predict], [last_rsi], ris_UL, ris_LL)[-1])
+
+
+register(1, "ML", "1d", max(MODEL_WINDOWS.values()) + FEATURE_WARMUP_DAYS, features_ML, signal_ML, symbols=ML_SYMBOLS)
+register(2, "SMA", "16h", 22, per_frame(indicators_SMA), per_frame(check_signal_SMA), stream=stream_SMA)
+# MACD keeps the frame: its EMAs restart at the start of the lookback, which a running EMA cannot reproduce
+register(3, "MACD", "8h", 100, per_frame(indicators_MACD), per_frame(check_signal_MACD))
+register(4, "HMA", "1d", 65, per_frame(indicators_HMA), per_frame(check_signal_HMA), stream=stream_HMA)
+register(5, "SMA&ADX", "1d", 30, per_frame(indicators_ADX), per_frame(check_signal_ADX), stream=stream_ADX)
+register(6, "RSI&SMA50", "10h", 50, per_frame(indicators_RSI), per_frame(check_signal_RSI), stream=stream_RSI)
+
+
+def strategy_needs():
+    """Timeframe -> the most bars any registered strategy reads from it."""
+    needs = {}
+    for spec in STRATEGY_REGISTRY.values():
+        needs[spec.timeframe] = max(needs.get(spec.timeframe, 0), spec.lookback)
+    return needs
+
+
+data_planner = DataPlanner(strategy_needs())
+
+
+def evaluate_strategy(strategy_id, symbol):
+    spec = STRATEGY_REGISTRY.get(strategy_id)
+    if spec is None or not spec.supports(symbol):
+        return None
+    with span("fetch", strategy=spec.name, symbol=symbol):
+        rows = data_planner.closed_base_bars(symbol)
+    started = time.perf_counter()
+    try:
+        with span("indicators", strategy=spec.name, symbol=symbol):
+            if spec.stream is not None:
+                indicators = data_planner.stream(symbol, spec.timeframe, spec.name, spec.stream, rows)
+            else:
+                indicators = spec.indicators(data_planner.bars(symbol, spec.timeframe, spec.lookback, rows), symbol)
+        with span("signal", strategy=spec.name, symbol=symbol):
+            return spec.check(indicators, symbol)
+    finally:
+        indicator_seconds.labels(spec.name).observe(time.perf_counter() - started)
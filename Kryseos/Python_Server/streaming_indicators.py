@@ -0,0 +1,282 @@
+import math
+from collections import deque
+
+NAN = float("nan")
+
+# Running sums are rebuilt from the window this often to stop float drift
+RESYNC_EVERY = 4096
+
+
+class RollingMean:
+    """Simple moving average, equivalent to `series.rolling(window).mean()`."""
+
+    def __init__(self, window):
+        self.window = window
+        self.values = deque()
+        self.total = 0.0
+        self.nan_count = 0
+        self.updates = 0
+        self.value = NAN
+
+    def update(self, x):
+        self.values.append(x)
+        if x != x:
+            self.nan_count += 1
+        else:
+            self.total += x
+
+        if len(self.values) > self.window:
+            old = self.values.popleft()
+            if old != old:
+                self.nan_count -= 1
+            else:
+                self.total -= old
+
+        self.updates += 1
+        if self.updates % RESYNC_EVERY == 0:
+            self.total = math.fsum(v for v in self.values if v == v)
+
+        if len(self.values) == self.window and self.nan_count == 0:
+            self.value = self.total / self.window
+        else:
+            self.value = NAN
+        return self.value
+
+    def warm_up(self, values):
+        for x in values:
+            self.update(x)
+        return self.value
+
+
+class EMA:
+    """Exponential moving average, equivalent to `series.ewm(span=span, adjust=False).mean()`."""
+
+    def __init__(self, span=None, alpha=None):
+        self.alpha = alpha if alpha is not None else 2.0 / (span + 1)
+        self.value = NAN
+
+    def update(self, x):
+        if self.value != self.value:
+            self.value = x
+        else:
+            self.value = self.alpha * x + (1 - self.alpha) * self.value
+        return self.value
+
+    def warm_up(self, values):
+        for x in values:
+            self.update(x)
+        return self.value
+
+
+class MACD:
+    """MACD line, signal line and histogram as computed in MACD.py."""
+
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.fast = EMA(span=fast)
+        self.slow = EMA(span=slow)
+        self.signal_ema = EMA(span=signal)
+        self.macd = NAN
+        self.signal = NAN
+
+    @property
+    def histogram(self):
+        return self.macd - self.signal
+
+    def update(self, close):
+        self.macd = self.fast.update(close) - self.slow.update(close)
+        self.signal = self.signal_ema.update(self.macd)
+        return self.macd, self.signal
+
+    def warm_up(self, closes):
+        for close in closes:
+            self.update(close)
+        return self.macd, self.signal
+
+
+class RSI:
+    """
+    RSI over close prices. The default averages gains and losses with a simple
+    rolling mean like RSISMA50.py; `wilder=True` uses Wilder's smoothing instead.
+    """
+
+    def __init__(self, period=14, wilder=False):
+        if wilder:
+            self.avg_gain = EMA(alpha=1.0 / period)
+            self.avg_loss = EMA(alpha=1.0 / period)
+        else:
+            self.avg_gain = RollingMean(period)
+            self.avg_loss = RollingMean(period)
+        self.prev_close = None
+        self.value = NAN
+
+    def update(self, close):
+        delta = 0.0 if self.prev_close is None else close - self.prev_close
+        self.prev_close = close
+
+        gain = self.avg_gain.update(delta if delta > 0 else 0.0)
+        loss = self.avg_loss.update(-delta if delta < 0 else 0.0)
+
+        if gain != gain or loss != loss:
+            self.value = NAN
+        elif loss == 0:
+            self.value = 100.0 if gain > 0 else NAN
+        else:
+            self.value = 100 - (100 / (1 + gain / loss))
+        return self.value
+
+    def warm_up(self, closes):
+        for close in closes:
+            self.update(close)
+        return self.value
+
+
+class ADX:
+    """True range, ATR, +DI/-DI, DX and ADX following the rolling-mean definitions in SMAADX.py."""
+
+    def __init__(self, period=14):
+        self.atr_mean = RollingMean(period)
+        self.plus_dm_mean = RollingMean(period)
+        self.minus_dm_mean = RollingMean(period)
+        self.adx_mean = RollingMean(period)
+        self.prev = None
+        self.tr = NAN
+        self.atr = NAN
+        self.plus_di = NAN
+        self.minus_di = NAN
+        self.dx = NAN
+        self.value = NAN
+
+    def update(self, high, low, close):
+        if self.prev is None:
+            self.tr = NAN
+            plus_dm = minus_dm = 0.0
+        else:
+            prev_high, prev_low, prev_close = self.prev
+            self.tr = max(high - low, abs(high - prev_close), abs(low - prev_close))
+            up = high - prev_high
+            down = prev_low - low
+            plus_dm = max(up, 0.0) if up > down else 0.0
+            minus_dm = max(down, 0.0) if down > up else 0.0
+        self.prev = (high, low, close)
+
+        self.atr = self.atr_mean.update(self.tr)
+        plus_mean = self.plus_dm_mean.update(plus_dm)
+        minus_mean = self.minus_dm_mean.update(minus_dm)
+
+        if self.atr != self.atr or self.atr == 0:
+            self.plus_di = self.minus_di = NAN
+        else:
+            self.plus_di = 100 * (plus_mean / self.atr)
+            self.minus_di = 100 * (minus_mean / self.atr)
+
+        di_sum = self.plus_di + self.minus_di
+        if di_sum != di_sum or di_sum == 0:
+            self.dx = NAN
+        else:
+            self.dx = 100 * (abs(self.plus_di - self.minus_di) / di_sum)
+
+        self.value = self.adx_mean.update(self.dx)
+        return self.value
+
+    def warm_up(self, highs, lows, closes):
+        for high, low, close in zip(highs, lows, closes):
+            self.update(high, low, close)
+        return self.value
+
+
+class WMA:
+    """Linearly weighted moving average with weights 1..window, newest weighted highest."""
+
+    def __init__(self, window):
+        self.window = window
+        self.denominator = window * (window + 1) / 2
+        self.values = deque()
+        self.total = 0.0
+        self.weighted = NAN
+        self.nan_count = 0
+        self.updates = 0
+        self.value = NAN
+
+    def _rebuild(self):
+        self.total = math.fsum(self.values)
+        self.weighted = math.fsum(w * v for w, v in enumerate(self.values, start=1))
+
+    def update(self, x):
+        old = self.values.popleft() if len(self.values) == self.window else None
+        self.values.append(x)
+        if x != x:
+            self.nan_count += 1
+        if old is not None and old != old:
+            self.nan_count -= 1
+
+        self.updates += 1
+        if len(self.values) < self.window or self.nan_count:
+            self.weighted = NAN
+            self.value = NAN
+            return self.value
+
+        if old is None or self.weighted != self.weighted or self.updates % RESYNC_EVERY == 0:
+            self._rebuild()
+        else:
+            # Every weight drops by one as the window slides; the new value takes the top weight
+            self.weighted += self.window * x - self.total
+            self.total += x - old
+
+        self.value = self.weighted / self.denominator
+        return self.value
+
+    def warm_up(self, values):
+        for x in values:
+            self.update(x)
+        return self.value
+
+
+class HMA:
+    """Hull moving average as computed in Hull.py."""
+
+    def __init__(self, length=55):
+        self.full = WMA(length)
+        self.half = WMA(length // 2)
+        self.smooth = WMA(int(math.sqrt(length)))
+        self.value = NAN
+
+    def update(self, close):
+        half = self.half.update(close)
+        full = self.full.update(close)
+        if full == full:
+            self.value = self.smooth.update(2 * half - full)
+        return self.value
+
+    def warm_up(self, closes):
+        for close in closes:
+            self.update(close)
+        return self.value
+
+
+class BarStream:
+    """
+    Indicator columns kept up to date one closed bar at a time.
+
+    `step(bar)` gets each bar as a dict of open/high/low/close/volume, feeds
+    its streaming indicators and returns their values by column name.
+    `frame` returns the newest `keep` bars with those columns, in the layout
+    of the strategy's `indicators_*` frame, which is all its `check_signal_*`
+    reads.
+    """
+
+    def __init__(self, step, keep=3):
+        self.step = step
+        self.times = deque(maxlen=keep)
+        self.rows = deque(maxlen=keep)
+
+    def update(self, open_time, open_, high, low, close, volume):
+        bar = {"open": open_, "high": high, "low": low, "close": close, "volume": volume}
+        bar.update(self.step(bar))
+        self.times.append(open_time)
+        self.rows.append(bar)
+
+    def frame(self):
+        import pandas as pd  # only needed once bars are read; keeps this module cheap to import
+
+        index = pd.DatetimeIndex(pd.to_datetime(list(self.times), unit="ms"), name="timestamp")
+        return pd.DataFrame(list(self.rows), index=index)
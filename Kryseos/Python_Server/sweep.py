@@ -0,0 +1,166 @@
+"""
+Parallel parameter sweep over the backtest strategies.
+
+The OHLCV arrays of each dataset are copied once into shared memory; worker
+processes attach to them at startup, so tasks only carry parameter dicts.
+Each worker computes an indicator (an EMA span, an ADX period, ...) once per
+dataset and reuses it for every combination that needs it.
+Combinations are sent in chunks and the results come back as a table ranked
+by return.
+
+    python sweep.py --strategy SMA [--dataset btc_daily] [--workers 8] [--top 20]
+"""
+import argparse
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from backtest import DATASETS, STRATEGIES, Indicators, evaluate, ml_predictions, store_datasets
+
+COLUMNS = ["open", "high", "low", "close", "volume"]
+ML_COLUMNS = ["ml_output", "ml_rsi"]
+CHUNK_SIZE = 64
+INDICATOR_CACHE_MB = int(os.getenv("SWEEP_INDICATOR_CACHE_MB", "512"))  # per worker
+
+# Default grids around the live parameters
+GRIDS = {
+    "SMA": {"fast": range(3, 31), "slow": range(10, 101, 2)},
+    "MACD": {"fast": range(4, 21), "slow": range(14, 41, 2), "signal": range(3, 16)},
+    "HMA": {"length": range(10, 121), "lag": [1, 2, 3, 4]},
+    "SMA&ADX": {"fast": range(5, 21), "slow": range(15, 61, 3), "threshold": range(10, 41, 2)},
+    "RSI&SMA50": {
+        "period": [7, 10, 14, 21],
+        "trend": range(20, 201, 30),
+        "buy_up": range(30, 51, 5),
+        "sell_up": range(65, 91, 5),
+        "buy_down": range(20, 41, 5),
+        "sell_down": range(60, 81, 5)
+    },
+    "ML": {"upper": range(60, 96), "lower": range(5, 41)}
+}
+
+# Combinations that make no sense for a strategy are dropped before dispatch
+CONSTRAINTS = {
+    "SMA": lambda p: p["fast"] < p["slow"],
+    "MACD": lambda p: p["fast"] < p["slow"],
+    "SMA&ADX": lambda p: p["fast"] < p["slow"],
+    "RSI&SMA50": lambda p: p["buy_up"] < p["sell_up"] and p["buy_down"] < p["sell_down"],
+    "ML": lambda p: p["lower"] < p["upper"]
+}
+
+
+def expand_grid(strategy, grid=None):
+    grid = grid or GRIDS[strategy]
+    names = list(grid)
+    allowed = CONSTRAINTS.get(strategy, lambda p: True)
+    combos = (dict(zip(names, values)) for values in itertools.product(*grid.values()))
+    return [params for params in combos if allowed(params)]
+
+
+# --- Shared memory: one (columns, bars) float64 block per dataset ---
+
+def share_dataset(bars, columns):
+    values = np.ascontiguousarray(bars[columns].to_numpy(dtype=np.float64).T)
+    block = shared_memory.SharedMemory(create=True, size=values.nbytes)
+    np.ndarray(values.shape, dtype=np.float64, buffer=block.buf)[:] = values
+    return block, (block.name, columns, values.shape)
+
+
+# Per-worker state filled by `_attach`
+_blocks = []
+_datasets = {}
+
+
+def _attach(specs):
+    for dataset, (symbol, (name, columns, shape)) in specs.items():
+        block = shared_memory.SharedMemory(name=name)
+        _blocks.append(block)
+        values = np.ndarray(shape, dtype=np.float64, buffer=block.buf)
+        bars = {column: values[i] for i, column in enumerate(columns)}
+        _datasets[dataset] = (symbol, bars, Indicators(bars, max_bytes=INDICATOR_CACHE_MB * 2 ** 20))
+
+
+def _run_chunk(dataset, strategy, chunk):
+    symbol, bars, indicators = _datasets[dataset]
+    signal_fn = STRATEGIES[strategy]
+    rows = []
+    for params in chunk:
+        params = dict(params)
+        risk = params.pop("risk", 0.5)
+        if strategy == "ML":
+            params["predictions"] = (bars["ml_output"], bars["ml_rsi"])
+        metrics = evaluate(bars, signal_fn(bars, symbol, indicators=indicators, **params), risk)
+        params.pop("predictions", None)
+        rows.append({
+            "dataset": dataset,
+            "strategy": strategy,
+            **params,
+            "risk": risk,
+            "profit_ratio": float(metrics["profit_ratio"]),
+            "winning_rate": metrics["winning_rate"],
+            "max_drawdown": metrics["max_drawdown"],
+            "sharpe": metrics["sharpe"],
+            "num_trades": metrics["num_trades"]
+        })
+    return rows
+
+
+def run_sweep(strategy, grid=None, datasets=None, workers=None, chunk_size=CHUNK_SIZE):
+    """Evaluates every combination of `grid` on each dataset and returns them ranked by return."""
+    available = {**DATASETS, **store_datasets()}
+    datasets = datasets or list(DATASETS)
+    combos = expand_grid(strategy, grid)
+    columns = COLUMNS + ML_COLUMNS if strategy == "ML" else COLUMNS
+
+    blocks, specs = [], {}
+    try:
+        for dataset in datasets:
+            loader, symbol = available[dataset]
+            bars = loader()
+            if strategy == "ML":
+                # The model runs once here; workers only sweep the RSI bounds
+                bars["ml_output"], bars["ml_rsi"] = ml_predictions(bars, symbol)
+            block, spec = share_dataset(bars, columns)
+            blocks.append(block)
+            specs[dataset] = (symbol, spec)
+
+        tasks = [
+            (dataset, combos[i:i + chunk_size])
+            for dataset in datasets for i in range(0, len(combos), chunk_size)
+        ]
+        rows = []
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_attach, initargs=(specs,)) as pool:
+            futures = [pool.submit(_run_chunk, dataset, strategy, chunk) for dataset, chunk in tasks]
+            for future in as_completed(futures):
+                rows.extend(future.result())
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    results = pd.DataFrame(rows)
+    if results.empty:
+        return results
+    return results.sort_values(["profit_ratio", "max_drawdown"], ascending=False, ignore_index=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--strategy", choices=list(STRATEGIES), default="SMA")
+    parser.add_argument("--dataset", choices=list(DATASETS) + list(store_datasets()), action="append")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    results = run_sweep(args.strategy, datasets=args.dataset, workers=args.workers)
+    elapsed = time.perf_counter() - started
+
+    with pd.option_context("display.width", 200, "display.max_columns", 20):
+        print(results.head(args.top).to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+    print(f"\n⏱️ {len(results)} backtests in {elapsed:.1f}s ({len(results) / elapsed:.0f}/s)")
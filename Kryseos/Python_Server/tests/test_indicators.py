@@ -0,0 +1,201 @@
+"""
+Equivalence of indicators.py with the pandas formulas the strategies used
+before switching to it. The reference functions below are those formulas,
+copied from SMA.py, MACD.py, Hull.py, SMAADX.py, RSISMA50.py and the ML
+strategy as they were.
+
+    python -m pytest tests
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import indicators
+
+BARS = 600
+
+
+def ohlc(seed, bars=BARS):
+    rng = np.random.default_rng(seed)
+    close = 30000 + np.cumsum(rng.normal(0, 150, bars))
+    spread = np.abs(rng.normal(0, 80, bars))
+    return pd.DataFrame({
+        "high": close + spread,
+        "low": close - spread,
+        "close": close,
+    })
+
+
+# --- Reference formulas ---
+
+def ref_sma(close, window):
+    return close.rolling(window).mean()
+
+
+def ref_ema(close, span):
+    return close.ewm(span=span, adjust=False).mean()
+
+
+def ref_macd(close):
+    macd_line = close.ewm(span=12, adjust=False).mean() - close.ewm(span=26, adjust=False).mean()
+    return macd_line, macd_line.ewm(span=9, adjust=False).mean()
+
+
+def ref_wma(close, length):
+    weights = np.arange(1, length + 1)
+    return close.rolling(length).apply(lambda x: np.dot(x, weights) / weights.sum(), raw=True)
+
+
+def ref_hma(close, length=55):
+    raw_hull = 2 * ref_wma(close, length // 2) - ref_wma(close, length)
+    return ref_wma(raw_hull, int(np.sqrt(length)))
+
+
+def ref_rsi(close, period=14):
+    delta = close.diff()
+    gain = delta.where(delta > 0, 0)
+    loss = -delta.where(delta < 0, 0)
+    avg_gain = gain.rolling(window=period).mean()
+    avg_loss = loss.rolling(window=period).mean()
+    return 100 - (100 / (1 + avg_gain / avg_loss))
+
+
+def ref_rsi_wilder(close, period=14):
+    delta = close.diff()
+    gain = delta.where(delta > 0, 0)
+    loss = -delta.where(delta < 0, 0)
+    avg_gain = gain.ewm(alpha=1 / period, adjust=False).mean()
+    avg_loss = loss.ewm(alpha=1 / period, adjust=False).mean()
+    return 100 - (100 / (1 + avg_gain / avg_loss))
+
+
+def ref_adx(df):
+    df = df.copy()
+    df['TR'] = np.maximum.reduce([
+        df['high'] - df['low'],
+        abs(df['high'] - df['close'].shift(1)),
+        abs(df['low'] - df['close'].shift(1))
+    ])
+    df['ATR'] = df['TR'].rolling(14).mean()
+    df['+DM'] = np.where((df['high'] - df['high'].shift(1)) > (df['low'].shift(1) - df['low']),
+                         np.maximum(df['high'] - df['high'].shift(1), 0), 0)
+    df['-DM'] = np.where((df['low'].shift(1) - df['low']) > (df['high'] - df['high'].shift(1)),
+                         np.maximum(df['low'].shift(1) - df['low'], 0), 0)
+    df['+DI'] = 100 * (df['+DM'].rolling(14).mean() / df['ATR'])
+    df['-DI'] = 100 * (df['-DM'].rolling(14).mean() / df['ATR'])
+    df['DX'] = 100 * (abs(df['+DI'] - df['-DI']) / (df['+DI'] + df['-DI']))
+    df['ADX'] = df['DX'].rolling(14).mean()
+    return df['ADX'], df['+DI'], df['-DI']
+
+
+def assert_same(actual, expected):
+    expected = np.asarray(expected, dtype=np.float64)
+    assert actual.shape == expected.shape
+    np.testing.assert_array_equal(np.isnan(actual), np.isnan(expected))
+    np.testing.assert_allclose(actual, expected, rtol=1e-10, atol=1e-8, equal_nan=True)
+
+
+# --- One series ---
+
+@pytest.mark.parametrize("window", [9, 21, 50])
+def test_sma(window):
+    close = ohlc(1)["close"]
+    assert_same(indicators.sma(close, window), ref_sma(close, window))
+
+
+@pytest.mark.parametrize("span", [9, 12, 26])
+def test_ema(span):
+    close = ohlc(2)["close"]
+    assert_same(indicators.ema(close, span=span), ref_ema(close, span))
+
+
+@pytest.mark.parametrize("length", [27, 55])
+def test_wma(length):
+    close = ohlc(3)["close"]
+    assert_same(indicators.wma(close, length), ref_wma(close, length))
+
+
+def test_hma():
+    close = ohlc(4)["close"]
+    assert_same(indicators.hma(close, 55), ref_hma(close, 55))
+
+
+def test_macd():
+    close = ohlc(5)["close"]
+    macd_line, signal = indicators.macd(close)
+    ref_line, ref_signal = ref_macd(close)
+    assert_same(macd_line, ref_line)
+    assert_same(signal, ref_signal)
+
+
+def test_rsi():
+    close = ohlc(6)["close"]
+    assert_same(indicators.rsi(close, 14), ref_rsi(close, 14))
+
+
+def test_rsi_wilder():
+    close = ohlc(7)["close"]
+    assert_same(indicators.rsi(close, 14, wilder=True), ref_rsi_wilder(close, 14))
+
+
+def test_adx():
+    df = ohlc(8)
+    for actual, expected in zip(indicators.adx(df["high"], df["low"], df["close"]), ref_adx(df)):
+        assert_same(actual, expected)
+
+
+# --- Many series at once (the backtester and sweep path) ---
+
+def batch(rows=6, bars=BARS):
+    frames = [ohlc(100 + row, bars) for row in range(rows)]
+    stack = lambda column: np.vstack([frame[column].to_numpy() for frame in frames])
+    return frames, stack
+
+
+def test_batch_moving_averages():
+    frames, stack = batch()
+    close = stack("close")
+    for ours, reference in [
+        (indicators.sma(close, 21), lambda c: ref_sma(c, 21)),
+        (indicators.ema(close, span=26), lambda c: ref_ema(c, 26)),
+        (indicators.hma(close, 55), ref_hma),
+        (indicators.rsi(close, 14), ref_rsi),
+        (indicators.rsi(close, 14, wilder=True), ref_rsi_wilder),
+    ]:
+        for row, frame in enumerate(frames):
+            assert_same(ours[row], reference(frame["close"]))
+
+
+def test_batch_macd():
+    frames, stack = batch()
+    macd_line, signal = indicators.macd(stack("close"))
+    for row, frame in enumerate(frames):
+        ref_line, ref_signal = ref_macd(frame["close"])
+        assert_same(macd_line[row], ref_line)
+        assert_same(signal[row], ref_signal)
+
+
+def test_batch_adx():
+    frames, stack = batch()
+    ours = indicators.adx(stack("high"), stack("low"), stack("close"))
+    for row, frame in enumerate(frames):
+        for actual, expected in zip(ours, ref_adx(frame)):
+            assert_same(actual[row], expected)
+
+
+def test_batch_leading_gaps():
+    """Rows padded with NaN, as series of different lengths are when stacked."""
+    frames, stack = batch()
+    close = stack("close")
+    for row in range(close.shape[0]):
+        close[row, :row * 40] = np.nan
+    ours_sma, ours_ema = indicators.sma(close, 21), indicators.ema(close, span=12)
+    for row in range(close.shape[0]):
+        series = pd.Series(close[row])
+        assert_same(ours_sma[row], ref_sma(series, 21))
+        assert_same(ours_ema[row], ref_ema(series, 12))
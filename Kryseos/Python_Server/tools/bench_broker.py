@@ -0,0 +1,106 @@
+"""
+Signal-to-order latency and REST calls per trade: the old sequential
+`trade()` against pooled broker sessions, on a fake Alpaca client that
+sleeps a fixed time per call.
+
+A group of users receives the same BUY and then the same SELL, the way
+a signal group fans out.
+
+    python tools/bench_broker.py [users] [call_ms]
+"""
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from cryptography.fernet import Fernet
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ.setdefault("FERNET_KEY", Fernet.generate_key().decode())  # TradeExecutor imports database
+
+import broker
+from broker import BrokerSession
+from TradeExecutor import trade
+
+
+class FakeAlpaca:
+    def __init__(self, delay):
+        self.delay = delay
+        self.calls = 0
+        self.qty = 0.0
+
+    def _wait(self):
+        self.calls += 1
+        time.sleep(self.delay)
+
+    def get_position(self, symbol):
+        self._wait()
+        if self.qty == 0:
+            raise Exception("position does not exist")
+        return SimpleNamespace(qty=str(self.qty))
+
+    def get_latest_crypto_trades(self, symbols):
+        self._wait()
+        symbols = [symbols] if isinstance(symbols, str) else symbols
+        return {symbol: SimpleNamespace(p=60000.0) for symbol in symbols}
+
+    def get_account(self):
+        self._wait()
+        return SimpleNamespace(cash="10000", equity="10000")
+
+    def submit_order(self, **order):
+        self._wait()
+        self.qty = order["qty"]
+
+    def close_all_positions(self):
+        self._wait()
+        self.qty = 0.0
+
+
+def legacy_trade(api, signal, risk=0.5, symbol="BTC/USD"):
+    """trade() as it was: four sequential calls per signal."""
+    try:
+        position = float(api.get_position(symbol.replace("/", "")).qty)
+    except Exception:
+        position = 0
+    price = api.get_latest_crypto_trades(symbol)[symbol].p
+    cash = float(api.get_account().cash)
+    quantity = (cash * risk) / price
+    if signal == "BUY" and position == 0 and quantity > 0:
+        api.submit_order(symbol=symbol, qty=quantity, side="buy", type="market", time_in_force="gtc")
+    elif signal == "SELL" and position > 0:
+        api.close_all_positions()
+
+
+def run(label, clients, execute):
+    latencies = []
+
+    def one(client, signal):
+        started = time.perf_counter()
+        execute(client, signal)
+        latencies.append(time.perf_counter() - started)
+
+    for signal in ["BUY", "SELL"]:
+        with ThreadPoolExecutor(max_workers=len(clients)) as pool:
+            list(pool.map(lambda c: one(c, signal), clients))
+
+    fakes = [c.api if isinstance(c, BrokerSession) else c for c in clients]
+    calls = sum(f.calls for f in fakes) / len(latencies)
+    latencies.sort()
+    print(f"{label:<16} p50 {latencies[len(latencies) // 2] * 1000:>7.1f} ms   "
+          f"max {latencies[-1] * 1000:>7.1f} ms   {calls:.2f} REST calls per trade")
+
+
+def main(users=20, call_ms=40):
+    delay = call_ms / 1000
+    print(f"{users} users, {call_ms} ms per REST call, one BUY and one SELL each\n")
+    run("sequential", [FakeAlpaca(delay) for _ in range(users)], legacy_trade)
+
+    broker._prices.clear()
+    sessions = [BrokerSession(FakeAlpaca(delay)) for _ in range(users)]
+    run("pooled session", sessions, lambda session, signal: trade(session, signal))
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,88 @@
+"""
+Server restart with and without the candle store: how many klines the
+lookback windows of every strategy pull from REST, and how long that takes
+against a broker-like delay per request.
+
+The "warm" store holds every bar up to `downtime_hours` before the restart,
+as if the server had been writing closed bars to it until it went down.
+Also times a 500-bar read from the store against parsing a Raw_Data CSV,
+which is what getting history from disk meant before.
+
+    python tools/bench_candle_store.py [request_ms] [downtime_hours]
+"""
+import functools
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from backtest import DATASETS
+from candle_store import CandleStore
+from market_data import KlineCache
+from kline_stream_server import ServerClock, synthetic_klines
+
+# (interval, bars) each live strategy asks for, per symbol (see the get_historical_data_* functions)
+LOOKBACKS = [("1h", 23 * 16), ("8h", 100), ("1d", 65), ("1d", 30), ("1h", 51 * 10), ("1d", 61)]
+SYMBOLS = ["BTCUSDT", "ETHUSDT"]
+
+
+class CountingDownload:
+    def __init__(self, clock, delay):
+        self.clock = clock
+        self.delay = delay
+        self.bars = 0
+        self.requests = 0
+
+    def __call__(self, symbol, interval, limit=None, start_time=None):
+        rows = synthetic_klines(self.clock, symbol, interval, limit=limit, start_time=start_time)
+        # Binance pages at 1000 bars per request
+        pages = max(1, -(-len(rows) // 1000))
+        self.requests += pages
+        self.bars += len(rows)
+        time.sleep(self.delay * pages)
+        return rows
+
+
+def restart(clock, delay, store):
+    download = CountingDownload(clock, delay)
+    cache = KlineCache(download=download, clock=lambda: clock.now_ms() / 1000, store=store)
+    started = time.perf_counter()
+    for symbol in SYMBOLS:
+        for interval, bars in LOOKBACKS:
+            cache.get_klines(symbol, interval, bars)
+    return time.perf_counter() - started, download
+
+
+def main(request_ms=150, downtime_hours=3):
+    delay, downtime_hours = float(request_ms) / 1000, float(downtime_hours)
+    clock = ServerClock()
+
+    with tempfile.TemporaryDirectory() as root:
+        store = CandleStore(root)
+        down_at = clock.now_ms() - int(downtime_hours * 3_600_000)
+        for symbol in SYMBOLS:
+            for interval in {interval for interval, _ in LOOKBACKS}:
+                rows = synthetic_klines(clock, symbol, interval, limit=2000)
+                store.append_klines(symbol, interval, [row for row in rows if row[6] < down_at])
+
+        print(f"Restart after {downtime_hours:g} h down, {request_ms} ms per REST request\n")
+        print(f"{'start':<6} {'requests':>9} {'bars downloaded':>16} {'time':>9}")
+        for label, attached in [("cold", None), ("warm", store)]:
+            elapsed, download = restart(clock, delay, attached)
+            print(f"{label:<6} {download.requests:>9} {download.bars:>16} {elapsed * 1000:>6.0f} ms")
+
+        # Reads: the newest 500 bars from the store vs parsing a CSV
+        loader, _ = DATASETS["btc_1d_2018_2025"]
+        series = CandleStore(root).series("BTCUSDT", "1h")
+        for label, read in [("CSV parse", loader), ("store mmap", functools.partial(series.read, limit=500))]:
+            started = time.perf_counter()
+            for _ in range(20):
+                read()
+            print(f"\n{label:<10} {(time.perf_counter() - started) / 20 * 1000:.2f} ms per read", end="")
+        print()
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:3])
@@ -0,0 +1,117 @@
+"""
+Write throughput of the per-analysis persistence with many users at once.
+
+Every simulated user runs `rounds` analyses back to back, and each analysis
+stores what a real one does when something changed: an equity snapshot, a
+new fill and the updated performance state. All users run concurrently
+against a fresh SQLite database per mode:
+
+- commit:       one transaction per analysis, default journal (the old path)
+- commit + WAL: the same, with the pragmas database.py now sets
+- write-behind: analyses queue their rows and share batched transactions
+
+    python tools/bench_db_writes.py [users] [rounds]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from cryptography.fernet import Fernet
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+START = datetime(2025, 1, 1)
+
+
+def analysis_rows(user_id, round_):
+    from models import EquitySnapshot, FilledOrder, PerformanceState
+
+    at = START + timedelta(minutes=round_)
+    snapshot = EquitySnapshot(user_id=user_id, timestamp=at, equity=100000.0 + round_)
+    fill = FilledOrder(
+        order_id=f"{user_id}-{round_}", user_id=user_id, seq=round_, side="buy" if round_ % 2 == 0 else "sell",
+        price=100.0 + round_, submitted_at=at, filled_at=at
+    )
+    state = PerformanceState(
+        user_id=user_id, last_submitted_at=at, num_fills=round_ + 1, num_pairs=(round_ + 1) // 2,
+        num_wins=0, last_trade_profit_ratio=0.0
+    )
+    return [snapshot, fill], [state]
+
+
+async def per_analysis_commit(session_factory, user_id, round_):
+    add, merge = analysis_rows(user_id, round_)
+    async with session_factory() as session:
+        for obj in merge:
+            await session.merge(obj)
+        session.add_all(add)
+        await session.commit()
+
+
+async def run(label, session_factory, users, rounds, writer=None):
+    samples, errors = [], 0
+
+    async def user(index):
+        nonlocal errors
+        user_id = f"user-{index}"
+        for round_ in range(rounds):
+            started = time.perf_counter()
+            try:
+                if writer is None:
+                    await per_analysis_commit(session_factory, user_id, round_)
+                else:
+                    add, merge = analysis_rows(user_id, round_)
+                    await writer.write(user_id, add=add, merge=merge)
+            except Exception:
+                errors += 1
+                continue
+            samples.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user(index) for index in range(users)))
+    elapsed = time.perf_counter() - started
+
+    samples.sort()
+    rows = len(samples) * 3
+    p50 = samples[len(samples) // 2] * 1000 if samples else float("nan")
+    p99 = samples[int(len(samples) * 0.99)] * 1000 if samples else float("nan")
+    print(f"{label:<14} {rows / elapsed:>12,.0f} {p50:>10.1f} ms {p99:>10.1f} ms {errors:>8}")
+
+
+async def main(users=1000, rounds=5):
+    from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+    from sqlalchemy.orm import sessionmaker
+    from database import Base, apply_sqlite_pragmas
+    from write_behind import WriteBehind
+
+    users, rounds = int(users), int(rounds)
+    print(f"{users} users x {rounds} analyses, 3 rows each\n")
+    print(f"{'mode':<14} {'rows/sec':>12} {'p50':>13} {'p99':>13} {'errors':>8}")
+    for label, pragmas, batched in [("commit", False, False), ("commit + WAL", True, False),
+                                    ("write-behind", True, True)]:
+        engine = create_async_engine(f"sqlite+aiosqlite:///./{label.replace(' ', '')}.db")
+        if pragmas:
+            apply_sqlite_pragmas(engine)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+        writer = None
+        if batched:
+            writer = WriteBehind(session_factory)
+            writer.start()
+        await run(label, session_factory, users, rounds, writer)
+        if writer is not None:
+            await writer.stop()
+            print(f"{'':<14} {writer.batches} transactions, {writer.rows} rows")
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("FERNET_KEY", Fernet.generate_key().decode())
+    with tempfile.TemporaryDirectory() as scratch:
+        os.chdir(scratch)
+        asyncio.run(main(*sys.argv[1:3]))
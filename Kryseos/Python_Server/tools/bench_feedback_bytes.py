@@ -0,0 +1,68 @@
+"""
+Bytes sent per performance_update for a long-lived account: the old
+full-state message against the snapshot/delta protocol.
+
+The account starts with `trades` closed trades and a full equity window;
+every update then adds one SELL (a trade ratio, a fill time and an equity
+point), as the strategy jobs do.
+
+    python tools/bench_feedback_bytes.py [trades] [updates]
+"""
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from equity_store import FEEDBACK_POINTS
+from feedback_stream import FeedbackStream
+from ws_bus import WebSocketBus
+
+
+def feedback_states(trades, updates):
+    rng = random.Random(7)
+    ratios = [round(rng.gauss(0.002, 0.02), 6) for _ in range(trades)]
+    start = datetime(2023, 1, 1)
+    times = [start + timedelta(hours=6 * i) for i in range(trades)]
+    equity = [round(10000 + 5 * i + rng.gauss(0, 20), 2) for i in range(FEEDBACK_POINTS)]
+
+    for _ in range(updates + 1):
+        yield {
+            "alpaca_user_id": "PA3XXXXXXX", "cash": round(equity[-1] / 2, 2), "currency": "USD",
+            "current_equity": equity[-1], "total_profit": round(equity[-1] - 10000, 2),
+            "profit_ratio": round(equity[-1] / 10000 - 1, 6),
+            "last_trade_profit_ratio": ratios[-1], "trade_profit_ratios": list(ratios),
+            "winning_rate": round(sum(r > 0 for r in ratios) / len(ratios), 4), "num_trades": len(ratios),
+            "max_drawdown": 0.08, "drawdown_days": 12, "sharpe": 1.1, "sortino": 1.6,
+            "profit_factor": 1.3, "avg_win": 0.015, "avg_loss": -0.012,
+            "equity_history": equity[-FEEDBACK_POINTS:],
+            "sell_fill_times": [t.strftime("%b %d, %Y, %I:%M:%S %p") for t in times]
+        }
+        ratios.append(round(rng.gauss(0.002, 0.02), 6))
+        times.append(times[-1] + timedelta(hours=6))
+        equity.append(round(equity[-1] * (1 + ratios[-1] / 2), 2))
+
+
+def main(trades=2000, updates=200):
+    trades, updates = int(trades), int(updates)
+    stream = FeedbackStream()
+    full, snapshot, deltas = [], None, []
+    for i, feedback in enumerate(feedback_states(trades, updates)):
+        message = stream.update("bench", feedback)
+        encoded = len(WebSocketBus.encode("performance_update", **message).encode())
+        if i == 0:
+            snapshot = encoded
+            continue
+        full.append(len(WebSocketBus.encode("performance_update", feedback).encode()))
+        deltas.append(encoded)
+
+    print(f"{trades} closed trades, {FEEDBACK_POINTS}-point equity window, {updates} updates\n")
+    print(f"snapshot on connect      {snapshot:>9,} bytes")
+    print(f"full update (old)        {sum(full) / len(full):>9,.0f} bytes/update")
+    print(f"delta update (v2)        {sum(deltas) / len(deltas):>9,.0f} bytes/update")
+    print(f"reduction                {sum(full) / sum(deltas):>9.0f}x")
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:3])
@@ -0,0 +1,97 @@
+"""
+Login lookup latency against a users table of N rows: the old full scan
+that decrypts every row versus the fingerprint index.
+
+Runs against a throwaway SQLite database in a temporary directory.
+
+    python tools/bench_login.py [users]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+from cryptography.fernet import Fernet
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+ACCOUNT = "https://paper-api.alpaca.markets"
+
+
+async def legacy_find_user_id(session, api_key, api_secret, account):
+    """The lookup /login did before the fingerprint column."""
+    from sqlalchemy.future import select
+    from database import fernet
+    from models import User
+
+    result = await session.execute(select(User))
+    for user in result.scalars().all():
+        try:
+            if (
+                fernet.decrypt(user.api_key.encode()).decode() == api_key and
+                fernet.decrypt(user.api_secret.encode()).decode() == api_secret and
+                user.account == account
+            ):
+                return user.user_id
+        except Exception:
+            continue
+    return None
+
+
+async def timed(lookup, credentials, repeats):
+    from database import AsyncSessionLocal
+
+    samples = []
+    for _ in range(repeats):
+        for api_key, api_secret in credentials:
+            async with AsyncSessionLocal() as session:
+                started = time.perf_counter()
+                user_id = await lookup(session, api_key, api_secret, ACCOUNT)
+                samples.append(time.perf_counter() - started)
+            assert user_id is not None
+    samples.sort()
+    return samples[len(samples) // 2], samples[int(len(samples) * 0.99)]
+
+
+async def main(users=10000):
+    from database import engine, fernet, init_db, AsyncSessionLocal, find_user_id
+    from models import User
+
+    await init_db()
+    credentials = [(uuid.uuid4().hex, uuid.uuid4().hex) for _ in range(users)]
+    async with AsyncSessionLocal() as session:
+        session.add_all([
+            User(
+                user_id=str(uuid.uuid4()),
+                api_key=fernet.encrypt(api_key.encode()).decode(),
+                api_secret=fernet.encrypt(api_secret.encode()).decode(),
+                account=ACCOUNT,
+                equity=[]
+            )
+            for api_key, api_secret in credentials
+        ])
+        await session.commit()
+
+    # Rows start without fingerprints, as in a database created before the column existed
+    started = time.perf_counter()
+    await init_db()
+    print(f"migration backfill of {users} users: {time.perf_counter() - started:.2f}s")
+
+    # First, middle and last row cover the scan's best, average and worst case
+    probes = [credentials[0], credentials[users // 2], credentials[-1]]
+    print(f"{'lookup':<14} {'p50':>12} {'p99':>12}")
+    for name, lookup, repeats in [("full scan", legacy_find_user_id, 1), ("fingerprint", find_user_id, 100)]:
+        p50, p99 = await timed(lookup, probes, repeats)
+        print(f"{name:<14} {p50 * 1000:>9.2f} ms {p99 * 1000:>9.2f} ms")
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("FERNET_KEY", Fernet.generate_key().decode())
+    with tempfile.TemporaryDirectory() as scratch:
+        # database.py opens ./trading.db relative to the working directory
+        os.chdir(scratch)
+        asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000))
@@ -0,0 +1,100 @@
+"""
+Overhead of the metrics instrumentation on the hot path.
+
+1. Cost of one histogram observation, unlabelled and labelled, single
+   threaded and with several threads observing the same series.
+2. `BrokerSession.call` against an instant fake client with and without
+   its histogram, i.e. the added cost per broker call with no network in
+   the way, as a share of a 20 ms REST round trip.
+3. Time to render /metrics for the series a busy server ends up with.
+
+    python tools/bench_metrics.py [iterations]
+"""
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import metrics
+import broker
+from broker import BrokerSession
+
+THREADS = 8
+
+
+class InstantAlpaca:
+    def get_clock(self):
+        return None
+
+
+class NoHistogram:
+    def labels(self, *values):
+        return self
+
+    def observe(self, value):
+        pass
+
+
+def per_call(fn, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations
+
+
+def threaded(fn, iterations):
+    def worker():
+        for _ in range(iterations // THREADS):
+            fn()
+
+    threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return (time.perf_counter() - started) / iterations
+
+
+def main(iterations=500000):
+    iterations = int(iterations)
+    plain = metrics.Histogram("bench_plain_seconds", "bench")
+    labelled = metrics.Histogram("bench_labelled_seconds", "bench", ["call"])
+    baseline = per_call(lambda: None, iterations)
+
+    print(f"{'operation':<36} {'ns/call':>9}")
+    rows = [
+        ("observe", per_call(lambda: plain.observe(0.003), iterations)),
+        ("labels(...).observe", per_call(lambda: labelled.labels("get_account").observe(0.003), iterations)),
+        (f"observe, {THREADS} threads", threaded(lambda: plain.observe(0.003), iterations)),
+    ]
+    for label, seconds in rows:
+        print(f"{label:<36} {(seconds - baseline) * 1e9:>9.0f}")
+
+    session = BrokerSession(InstantAlpaca())
+    call = lambda: session.call("get_clock")
+    with_metrics = per_call(call, iterations // 5)
+    histogram, broker.broker_call_seconds = broker.broker_call_seconds, NoHistogram()
+    try:
+        without = per_call(call, iterations // 5)
+    finally:
+        broker.broker_call_seconds = histogram
+    added = with_metrics - without
+    print(f"\nBrokerSession.call, instant client: {without * 1e9:.0f} ns without metrics, "
+          f"{with_metrics * 1e9:.0f} ns with (+{added * 1e9:.0f} ns, "
+          f"{added / 0.020 * 100:.4f}% of a 20 ms REST call)")
+
+    # A busy server: every REST call name, interval, strategy and model has a series
+    for name in ["get_account", "get_position", "get_latest_crypto_trades", "submit_order",
+                 "close_all_positions", "list_orders", "get_clock"]:
+        broker.broker_call_seconds.labels(name).observe(0.05)
+    started = time.perf_counter()
+    for _ in range(100):
+        text = metrics.render()
+    print(f"\nrender /metrics: {len(text.splitlines())} lines in {(time.perf_counter() - started) * 10:.2f} ms")
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:2])
@@ -0,0 +1,94 @@
+"""
+Timing of the performance analytics on long histories, and a check of the
+vectorized trade pairing and rolling drawdown against the original loops.
+
+    python tools/bench_performance.py [points]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from performance import (
+    pair_trades, trade_metrics, equity_metrics, rolling_sharpe, rolling_sortino,
+    rolling_max_drawdown, rolling_trade_metrics
+)
+
+
+def loop_pair_trade_profit_ratios(sides, prices):
+    """The pairing loop analyze_trading_performance used to run."""
+    trade_profit_ratios = []
+    i = 0
+    while i < len(sides) - 1:
+        if sides[i] != sides[i + 1]:
+            buy_price = prices[i] if sides[i] == 'buy' else prices[i + 1]
+            sell_price = prices[i + 1] if sides[i] == 'buy' else prices[i]
+            trade_profit_ratios.append((sell_price - buy_price) / sell_price)
+            i += 2
+        else:
+            i += 1
+    return trade_profit_ratios
+
+
+def offset_rolling_max_drawdown(equity, window):
+    """The rolling drawdown as first written: every window walked forward together, one offset at a time."""
+    out = np.full(len(equity), np.nan)
+    count = len(equity) - window + 1
+    if count <= 0:
+        return out
+    running_peak = equity[:count].copy()
+    deepest = np.zeros(count)
+    for offset in range(1, window):
+        values = equity[offset:offset + count]
+        np.maximum(running_peak, values, out=running_peak)
+        np.minimum(deepest, values / running_peak - 1, out=deepest)
+    out[window - 1:] = deepest
+    return out
+
+
+def timed(fn, *args, repeats=5):
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main(points=1_000_000):
+    rng = np.random.default_rng(3)
+    equity = 10000 * np.exp(np.cumsum(rng.normal(0, 0.01, points)))
+    sides = rng.choice(np.array(["buy", "sell"]), points // 10, p=[0.55, 0.45])
+    prices = 30000 * np.exp(np.cumsum(rng.normal(0, 0.02, len(sides))))
+
+    loop_cost, expected = timed(loop_pair_trade_profit_ratios, sides.tolist(), prices.tolist(), repeats=1)
+    pair_cost, (ratios, _) = timed(pair_trades, sides, prices)
+    assert np.allclose(ratios, expected) and len(ratios) == len(expected)
+    print(f"pairing {len(sides)} fills: loop {loop_cost * 1000:.1f} ms, vectorized {pair_cost * 1000:.1f} ms "
+          f"({len(ratios)} trades, identical)")
+
+    loop_cost, expected = timed(offset_rolling_max_drawdown, equity, 365, repeats=1)
+    block_cost, drawdowns = timed(rolling_max_drawdown, equity, 365, repeats=1)
+    assert np.array_equal(drawdowns, expected, equal_nan=True)
+    print(f"rolling_max_drawdown(365): offset loop {loop_cost * 1000:.1f} ms, blocks {block_cost * 1000:.1f} ms "
+          f"(identical)")
+
+    print(f"\n{points} equity points / {len(ratios)} trades")
+    for name, fn, args in [
+        ("equity_metrics", equity_metrics, (equity,)),
+        ("trade_metrics", trade_metrics, (ratios,)),
+        ("rolling_sharpe(30)", rolling_sharpe, (equity, 30)),
+        ("rolling_sortino(30)", rolling_sortino, (equity, 30)),
+        ("rolling_max_drawdown(30)", rolling_max_drawdown, (equity, 30)),
+        ("rolling_max_drawdown(365)", rolling_max_drawdown, (equity, 365)),
+        ("rolling_trade_metrics(50)", rolling_trade_metrics, (ratios, 50)),
+    ]:
+        cost, _ = timed(fn, *args)
+        print(f"  {name:<28} {cost * 1000:>8.1f} ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,142 @@
+"""
+Server restart with N stored users, some of whom had a bot running.
+
+- legacy:   the old startup, which decrypted every user's credentials one
+            after another before serving requests, and restored no bots
+            because trading configs were not stored
+- restore:  the current startup, which serves requests right away while
+            the users with an active config are restored in the background,
+            their credentials decrypted when their session starts
+
+Reports time until GET / answers, until every active bot is running and
+until each has sent its first performance analysis.
+The broker answers after `broker_ms` and the bots use a strategy id with
+no signal work, so only the session start itself is measured.
+
+Runs against a throwaway SQLite database in a temporary directory.
+
+    python tools/bench_restore.py [users] [active_percent] [broker_ms]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import uuid
+from types import SimpleNamespace
+
+from cryptography.fernet import Fernet
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+ACCOUNT = "https://paper-api.alpaca.markets"
+IDLE_STRATEGY = 0  # Not in the registry: the bot runs without evaluating anything
+
+
+class FakeAlpaca:
+    def __init__(self, delay):
+        self.delay = delay
+
+    def get_account(self):
+        time.sleep(self.delay)
+        return SimpleNamespace(equity="10000", account_number="PA0", cash="5000", currency="USD")
+
+    def list_orders(self, **kwargs):
+        time.sleep(self.delay)
+        return []
+
+
+async def legacy_load_existing_users():
+    """What startup did before trading configs were stored: decrypt every user."""
+    from sqlalchemy.future import select
+    from database import AsyncSessionLocal, fernet
+    from models import User
+
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(select(User))
+        return {
+            user.user_id: {
+                "api_key": fernet.decrypt(user.api_key.encode()).decode(),
+                "api_secret": fernet.decrypt(user.api_secret.encode()).decode(),
+                "account": user.account
+            }
+            for user in result.scalars().all()
+        }
+
+
+async def seed(users, active):
+    from database import init_db, fernet, AsyncSessionLocal, credential_fingerprint
+    from models import User, TradingConfig
+
+    await init_db()
+    async with AsyncSessionLocal() as session:
+        user_ids = [str(uuid.uuid4()) for _ in range(users)]
+        for user_id in user_ids:
+            api_key, api_secret = uuid.uuid4().hex, uuid.uuid4().hex
+            session.add(User(
+                user_id=user_id,
+                api_key=fernet.encrypt(api_key.encode()).decode(),
+                api_secret=fernet.encrypt(api_secret.encode()).decode(),
+                account=ACCOUNT,
+                credential_fingerprint=credential_fingerprint(api_key, api_secret, ACCOUNT),
+                equity=[]
+            ))
+        session.add_all([
+            TradingConfig(user_id=user_id, symbol="BTC/USD", strategy=IDLE_STRATEGY, risk=1.0,
+                          account=ACCOUNT, active=True)
+            for user_id in user_ids[:active]
+        ])
+        await session.commit()
+    return user_ids[:active]
+
+
+async def main(users=10000, active_percent=10, broker_ms=50):
+    import logging
+    import httpx
+    import services
+    from app import app, startup_event, shutdown_event
+    from broker import BrokerSession
+    from database import init_db
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    active = users * active_percent // 100
+    active_ids = await seed(users, active)
+    delay = broker_ms / 1000
+    services.get_broker_session = lambda *credentials: BrokerSession(FakeAlpaca(delay))
+    print(f"{users} stored users, {active} with an active config, {broker_ms} ms broker\n")
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        started = time.perf_counter()
+        await init_db()
+        legacy = await legacy_load_existing_users()
+        legacy_ready = time.perf_counter() - started
+
+        started = time.perf_counter()
+        await startup_event()
+        response = await client.get("/")
+        ready = time.perf_counter() - started
+        assert response.status_code == 200
+
+        while not all(services.user_running_flags.get(user_id, [False])[0] for user_id in active_ids):
+            await asyncio.sleep(0.01)
+        running = time.perf_counter() - started
+        decrypted = len(services.user_credentials)
+        while not all(services.user_feedback.get(user_id) for user_id in active_ids):
+            await asyncio.sleep(0.05)
+        analysed = time.perf_counter() - started
+        await shutdown_event()
+
+        print(f"\n{'startup':<9} {'ready':>9} {'bots running':>16} {'first analysis':>15} {'decrypted':>10}")
+        print(f"{'legacy':<9} {legacy_ready:>8.2f}s {'0 (not stored)':>16} {'-':>15} {len(legacy):>10}")
+        print(f"{'restore':<9} {ready:>8.2f}s {f'{active} in {running:.2f}s':>16} {analysed:>14.2f}s {decrypted:>10}")
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("FERNET_KEY", Fernet.generate_key().decode())
+    os.environ.setdefault("KLINE_STREAM", "0")
+    os.environ.setdefault("CANDLE_STORE", "0")
+    with tempfile.TemporaryDirectory() as scratch:
+        # app.py and database.py work relative to the current directory
+        os.chdir(scratch)
+        asyncio.run(main(*(int(arg) for arg in sys.argv[1:4])))
@@ -0,0 +1,56 @@
+"""
+How evaluation times line up with bar closes: the old schedule (every
+SLEEP_TIMES seconds from when each user pressed start) against bar-close
+aligned group jobs.
+
+Users start at random times over a day on random strategies; the script
+reports how stale the newest closed bar is at each evaluation, how much of
+the bar being evaluated was still forming, and how many distinct instants
+the scheduler wakes up at.
+
+    python tools/bench_schedule_alignment.py [users] [days]
+"""
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from scheduler import next_bar_close, BAR_CLOSE_DELAY_SECONDS
+
+# Copied from services.SLEEP_TIMES so the script does not import the server
+SLEEP_TIMES = {1: 86400, 2: 3600 * 16, 3: 3600 * 8, 4: 86400, 5: 86400, 6: 36000}
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+def main(users=1000, days=7):
+    users, days = int(users), int(days)
+    rng = random.Random(3)
+    start, end = 1_700_006_400, 1_700_006_400 + days * 86400
+    starts = [(rng.choice(list(SLEEP_TIMES)), start + rng.uniform(0, 86400)) for _ in range(users)]
+
+    print(f"{users} users over {days} days\n")
+    print(f"{'schedule':<10} {'evaluations':>12} {'wake-ups':>9} {'bar age p50':>12} {'p99':>9} {'partial bars':>13}")
+    for mode in ["relative", "aligned"]:
+        runs = []
+        for strategy, started in starts:
+            interval = SLEEP_TIMES[strategy]
+            t = started if mode == "relative" else next_bar_close(interval, started)
+            while t < end:
+                runs.append((strategy, t))
+                t = t + interval if mode == "relative" else next_bar_close(interval, t)
+
+        # Time since the evaluated bar's close, and whether a forming bar was part of the data
+        ages = [t - t // SLEEP_TIMES[s] * SLEEP_TIMES[s] for s, t in runs]
+        partial = sum(age > BAR_CLOSE_DELAY_SECONDS for age in ages) / len(ages)
+        wakeups = len({round(t, 3) for _, t in runs})
+        print(f"{mode:<10} {len(runs):>12} {wakeups:>9} {percentile(ages, 0.5) / 3600:>10.2f} h "
+              f"{percentile(ages, 0.99) / 3600:>7.2f} h {partial:>12.0%}")
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:3])
@@ -0,0 +1,117 @@
+"""
+Per-bar cost of the streaming indicators versus recomputing the pandas
+formulas from the strategy modules over the whole window.
+
+    python tools/bench_streaming_indicators.py [bars]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from streaming_indicators import RollingMean, MACD, RSI, ADX, HMA
+
+
+def random_bars(n, seed=7):
+    rng = np.random.default_rng(seed)
+    close = 30000 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+    spread = np.abs(rng.normal(0, 0.01, n)) * close
+    return pd.DataFrame({
+        "high": close + spread,
+        "low": close - spread,
+        "close": close,
+    })
+
+
+def pandas_sma(df):
+    return df["close"].rolling(21).mean()
+
+
+def pandas_macd(df):
+    macd = df["close"].ewm(span=12, adjust=False).mean() - df["close"].ewm(span=26, adjust=False).mean()
+    return macd.ewm(span=9, adjust=False).mean()
+
+
+def pandas_rsi(df):
+    delta = df["close"].diff()
+    gain = delta.where(delta > 0, 0).rolling(14).mean()
+    loss = -delta.where(delta < 0, 0).rolling(14).mean()
+    return 100 - (100 / (1 + gain / loss))
+
+
+def pandas_adx(df):
+    tr = np.maximum.reduce([
+        df["high"] - df["low"],
+        abs(df["high"] - df["close"].shift(1)),
+        abs(df["low"] - df["close"].shift(1))
+    ])
+    atr = pd.Series(tr).rolling(14).mean()
+    up = df["high"] - df["high"].shift(1)
+    down = df["low"].shift(1) - df["low"]
+    plus_dm = pd.Series(np.where(up > down, np.maximum(up, 0), 0))
+    minus_dm = pd.Series(np.where(down > up, np.maximum(down, 0), 0))
+    plus_di = 100 * (plus_dm.rolling(14).mean() / atr)
+    minus_di = 100 * (minus_dm.rolling(14).mean() / atr)
+    dx = 100 * (abs(plus_di - minus_di) / (plus_di + minus_di))
+    return dx.rolling(14).mean()
+
+
+def pandas_hma(df, length=55):
+    sqrt_len = int(np.sqrt(length))
+    half_len = length // 2
+    weights_len = np.arange(1, length + 1)
+    weights_half = np.arange(1, half_len + 1)
+    weights_sqrt = np.arange(1, sqrt_len + 1)
+    wma_full = df["close"].rolling(length).apply(lambda x: np.dot(x, weights_len) / weights_len.sum(), raw=True)
+    wma_half = df["close"].rolling(half_len).apply(lambda x: np.dot(x, weights_half) / weights_half.sum(), raw=True)
+    raw_hull = 2 * wma_half - wma_full
+    return raw_hull.rolling(sqrt_len).apply(lambda x: np.dot(x, weights_sqrt) / weights_sqrt.sum(), raw=True)
+
+
+CASES = [
+    ("SMA(21)", pandas_sma, lambda: RollingMean(21), lambda ind, bar: ind.update(bar.close)),
+    ("MACD signal", pandas_macd, MACD, lambda ind, bar: ind.update(bar.close)[1]),
+    ("RSI(14)", pandas_rsi, RSI, lambda ind, bar: ind.update(bar.close)),
+    ("ADX(14)", pandas_adx, ADX, lambda ind, bar: ind.update(bar.high, bar.low, bar.close)),
+    ("HMA(55)", pandas_hma, HMA, lambda ind, bar: ind.update(bar.close)),
+]
+
+
+def main(bars=5000, window=500, repeats=50):
+    df = random_bars(bars)
+    rows = list(df.itertuples(index=False))
+
+    print(f"{'indicator':<12} {'max rel diff':>14} {'full recompute':>16} {'streaming update':>18} {'speedup':>9}")
+    for name, full, make, step in CASES:
+        indicator = make()
+        streamed = np.array([step(indicator, bar) for bar in rows])
+        expected = full(df).to_numpy()
+        both = ~np.isnan(expected)
+        assert np.array_equal(both, ~np.isnan(streamed)), f"{name}: warm-up length differs"
+        diff = np.max(np.abs(streamed[both] - expected[both]) / np.maximum(np.abs(expected[both]), 1.0))
+
+        # Full recompute over the lookback window the strategies use, once per new bar
+        tail = df.iloc[-window:]
+        start = time.perf_counter()
+        for _ in range(repeats):
+            full(tail)
+        full_cost = (time.perf_counter() - start) / repeats
+
+        indicator = make()
+        for bar in rows[:-repeats]:
+            step(indicator, bar)
+        start = time.perf_counter()
+        for bar in rows[-repeats:]:
+            step(indicator, bar)
+        stream_cost = (time.perf_counter() - start) / repeats
+
+        print(f"{name:<12} {diff:>14.2e} {full_cost * 1e6:>13.1f} us {stream_cost * 1e6:>15.2f} us "
+              f"{full_cost / stream_cost:>8.0f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
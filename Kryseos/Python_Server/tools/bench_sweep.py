@@ -0,0 +1,54 @@
+"""
+Throughput of the parameter sweep, in backtests (combinations) per second.
+
+1. One process, the same combinations with indicators recomputed for each
+   (a fresh `Indicators` per call, as a single backtest does) and with one
+   `Indicators` shared across them, as a sweep worker does.
+2. The full default grid of each strategy through `run_sweep`.
+
+    python tools/bench_sweep.py [workers] [dataset]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from backtest import DATASETS, STRATEGIES, Indicators, evaluate
+from sweep import expand_grid, run_sweep
+
+SAMPLE = 500
+SWEPT = ["SMA", "MACD", "HMA", "SMA&ADX", "RSI&SMA50"]
+
+
+def serial(bars, symbol, strategy, combos, shared):
+    indicators = Indicators(bars) if shared else None
+    started = time.perf_counter()
+    for params in combos:
+        evaluate(bars, STRATEGIES[strategy](bars, symbol, indicators=indicators, **params))
+    return len(combos) / (time.perf_counter() - started)
+
+
+def main(workers=None, dataset="btc_daily"):
+    workers = int(workers) if workers else os.cpu_count()
+    loader, symbol = DATASETS[dataset]
+    bars = loader()
+    print(f"{dataset}: {len(bars)} bars, {workers} workers\n")
+
+    print(f"{'strategy':<10} {'combos':>7} {'recompute/s':>12} {'shared/s':>9} {'sweep/s':>8} {'sweep time':>11}")
+    for strategy in SWEPT:
+        combos = expand_grid(strategy)
+        sample = combos[:SAMPLE]
+        recompute = serial(bars, symbol, strategy, sample, shared=False)
+        shared = serial(bars, symbol, strategy, sample, shared=True)
+
+        started = time.perf_counter()
+        results = run_sweep(strategy, datasets=[dataset], workers=workers)
+        elapsed = time.perf_counter() - started
+        assert len(results) == len(combos)
+        print(f"{strategy:<10} {len(combos):>7} {recompute:>12.0f} {shared:>9.0f} "
+              f"{len(combos) / elapsed:>8.0f} {elapsed:>10.1f}s")
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:3])
@@ -0,0 +1,100 @@
+"""
+Publish-to-send latency of the WebSocket bus with many sockets, some slow,
+against the old sequential send loop.
+
+Every socket belongs to its own user; a background thread publishes one
+performance update per user, as the strategy jobs do after a SELL.
+
+    python tools/bench_ws_bus.py [sockets] [slow_fraction] [slow_ms]
+"""
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from ws_bus import WebSocketBus
+
+FEEDBACK = {
+    "cash": 5000.0, "current_equity": 10250.5, "total_profit": 250.5, "profit_ratio": 0.025,
+    "winning_rate": 0.6, "num_trades": 10, "trade_profit_ratios": [0.01] * 10,
+    "equity_history": [10000.0 + i for i in range(100)]
+}
+
+
+class FakeSocket:
+    def __init__(self, delay):
+        self.delay = delay
+        self.received = 0
+        self.done = None
+
+    async def send_text(self, text):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.received += 1
+        if self.done is not None:
+            self.done.set_result(time.perf_counter())
+            self.done = None
+
+    async def close(self):
+        pass
+
+
+def make_sockets(count, slow_fraction, slow_delay):
+    slow_every = int(1 / slow_fraction) if slow_fraction else 0
+    return [FakeSocket(slow_delay if slow_every and i % slow_every == 0 else 0) for i in range(count)]
+
+
+def summary(label, latencies, elapsed):
+    """Latencies are from publish (the start of the broadcast, for the old loop) to the send completing."""
+    latencies.sort()
+    print(f"{label:<12} p50 {latencies[len(latencies) // 2] * 1000:>8.1f} ms   "
+          f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:>8.1f} ms   "
+          f"all delivered in {elapsed:.2f} s")
+
+
+async def sequential(sockets):
+    """The old broadcast: one json.dumps and one awaited send per socket, in turn."""
+    started = time.perf_counter()
+    latencies = []
+    for ws in sockets:
+        await ws.send_text(json.dumps({"type": "performance_update", "data": FEEDBACK}))
+        latencies.append(time.perf_counter() - started)
+    summary("sequential", latencies, time.perf_counter() - started)
+
+
+async def bus(sockets):
+    bus = WebSocketBus()
+    bus.start()
+    loop = asyncio.get_running_loop()
+    futures = []
+    for i, ws in enumerate(sockets):
+        ws.done = loop.create_future()
+        futures.append(ws.done)
+        bus.subscribe(f"user-{i}", ws)
+
+    started = time.perf_counter()
+    publisher = threading.Thread(target=lambda: [
+        bus.publish(f"user-{i}", "performance_update", FEEDBACK) for i in range(len(sockets))
+    ])
+    publisher.start()
+    done_at = await asyncio.gather(*futures)
+    publisher.join()
+    summary("bus", list(bus.latencies), max(done_at) - started)
+
+    for subscriber in [s for subs in bus.topics.values() for s in subs]:
+        subscriber.task.cancel()
+
+
+def main(count=20000, slow_fraction=0.01, slow_ms=200):
+    count, slow_fraction, slow_delay = int(count), float(slow_fraction), float(slow_ms) / 1000
+    print(f"{count} sockets, {slow_fraction:.0%} of them take {slow_ms} ms per send\n")
+    asyncio.run(sequential(make_sockets(count, slow_fraction, slow_delay)))
+    asyncio.run(bus(make_sockets(count, slow_fraction, slow_delay)))
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:4])
@@ -0,0 +1,90 @@
+"""
+Runs KlineStream against the local stand-in stream server and checks it.
+
+The stand-in clock runs fast (by default an hourly bar closes every 0.1 s)
+and the server drops each connection after a while, so the run goes through
+several reconnects with REST backfills. At the end the cached windows must
+match the synthetic klines bar for bar, no close may be announced twice, and
+the last bar closed before the end (with 100 ms of slack) must have been
+announced. Bars that closed during an
+outage are superseded: after the backfill only the newest close is
+announced, since strategies act on the latest bar alone.
+
+    python tools/check_kline_stream.py [seconds] [speed] [drop_after]
+"""
+import asyncio
+import functools
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from kline_stream import KlineStream
+from market_data import KlineCache, INTERVAL_MS
+from kline_stream_server import ServerClock, StandInServer, synthetic_klines
+
+PORT = 9777
+KEYS = [("BTCUSDT", "1h"), ("ETHUSDT", "1h"), ("BTCUSDT", "8h")]
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)] if values else float("nan")
+
+
+async def main(seconds=6.0, speed=36000.0, drop_after=1.5):
+    clock = ServerClock(speed, start_ms=1_700_000_000_000)
+    server = StandInServer(clock, drop_after=drop_after)
+    await server.serve(port=PORT)
+
+    cache = KlineCache(min_refresh_seconds=0, download=functools.partial(synthetic_klines, clock),
+                       clock=lambda: clock.now_ms() / 1000)
+    stream = KlineStream(cache, url=f"ws://127.0.0.1:{PORT}/stream", reconnect_seconds=0.2)
+    events = []
+    stream.add_listener(lambda symbol, interval, close_ms: events.append((symbol, interval, close_ms, time.monotonic())))
+
+    loop = asyncio.get_running_loop()
+    for symbol, interval in KEYS:
+        await loop.run_in_executor(None, cache.get_klines, symbol, interval, 300)
+        stream.subscribe(symbol, interval)
+    stream.start()
+    await asyncio.sleep(seconds)
+    cutoff_ms = clock.now_ms() - 0.1 * speed * 1000
+    await stream.stop()
+
+    print(f"{seconds:.0f} s at {speed:.0f}x, connection dropped every {drop_after} s "
+          f"({server.connections} connections, {stream.backfills} backfills); "
+          f"the server emits every {server.tick * 1000:.0f} ms\n")
+    failures = 0
+    for symbol, interval in KEYS:
+        rows = await loop.run_in_executor(None, cache.get_klines, symbol, interval, 300)
+        expected = synthetic_klines(clock, symbol, interval, start_time=rows[0][0])
+        closed = [row for row in rows if row[6] < clock.now_ms()]
+        mismatched = sum(row != expected[i] for i, row in enumerate(closed))
+
+        closes = [close_ms for s, i, close_ms, _ in events if (s, i) == (symbol, interval)]
+        length = INTERVAL_MS[interval]
+        announced = set(closes)
+        due = range(min(closes), max(closes) + 1, length) if closes else []
+        superseded = sum(close_ms not in announced for close_ms in due)
+        duplicates = len(closes) - len(announced)
+        last_due = max(row[6] for row in closed if row[6] <= cutoff_ms)
+        last_missing = int(last_due not in announced)
+
+        # Wall time between the bar closing on the server clock and the listener call
+        delays = [(at - clock.wall_time(close_ms + 1)) * 1000
+                  for s, i, close_ms, at in events if (s, i) == (symbol, interval)]
+        failures += mismatched + duplicates + last_missing
+        print(f"{symbol} {interval:<3}  bars {len(closed):>4}  mismatched {mismatched}  "
+              f"closes {len(closes):>3}  superseded {superseded}  duplicated {duplicates}  "
+              f"last announced {'no' if last_missing else 'yes'}  "
+              f"delay p50 {percentile(delays, 0.5):.1f} ms  p99 {percentile(delays, 0.99):.1f} ms")
+
+    print("\nOK" if failures == 0 else f"\nFAILED ({failures} problems)")
+    return failures
+
+
+if __name__ == "__main__":
+    args = [float(arg) for arg in sys.argv[1:4]]
+    sys.exit(1 if asyncio.run(main(*args)) else 0)
@@ -0,0 +1,134 @@
+"""
+Checks the profiler end to end and measures what it costs when off.
+
+1. Cost of `span` with no capture running, against a bare function call.
+2. A capture limited to one user while strategies evaluate on synthetic
+   klines and two users trade against a fake broker: the folded stacks
+   must parse and contain the strategy code, and the trace must hold the
+   fetch -> indicators -> signal -> trade spans, none from the other user.
+
+    python tools/check_profiling.py [seconds]
+"""
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+
+from cryptography.fernet import Fernet
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+# TradeExecutor imports database.py, which needs a key (nothing is encrypted here)
+os.environ.setdefault("FERNET_KEY", Fernet.generate_key().decode())
+
+import profiling
+import strategy_registry
+from broker import BrokerSession
+from data_planner import DataPlanner
+from market_data import KlineCache
+from profiling import span
+from strategy_registry import evaluate_strategy, strategy_needs
+from TradeExecutor import trade
+from kline_stream_server import ServerClock, synthetic_klines
+
+
+class FakeAlpaca:
+    def get_account(self):
+        time.sleep(0.002)
+        return SimpleNamespace(cash="10000", equity="10000")
+
+    def get_position(self, symbol):
+        raise ValueError("no position")
+
+    def get_latest_crypto_trades(self, symbols):
+        return {symbol: SimpleNamespace(p=50000.0) for symbol in symbols}
+
+    def submit_order(self, **order):
+        time.sleep(0.005)
+
+
+def disabled_cost(iterations=1000000):
+    def bare():
+        return None
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        bare()
+    baseline = (time.perf_counter() - started) / iterations
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        with span("stage", "user"):
+            pass
+    return (time.perf_counter() - started) / iterations, baseline
+
+
+def workload(stop, user_id):
+    api = BrokerSession(FakeAlpaca())
+    while not stop.is_set():
+        for strategy in [2, 3, 6]:
+            evaluate_strategy(strategy, "BTC/USD")
+        trade(api, "BUY", 0.1, "BTC/USD", user_id=user_id)
+        api.invalidate()
+
+
+def main(seconds=2):
+    seconds = float(seconds)
+    with_span, baseline = disabled_cost()
+    print(f"span() with profiling off: {with_span * 1e9:.0f} ns (a bare call: {baseline * 1e9:.0f} ns), "
+          f"profiler threads: {sum(t.name == 'profiler' for t in threading.enumerate())}")
+
+    clock = ServerClock()
+    download = lambda symbol, interval, limit=None, start_time=None: synthetic_klines(
+        clock, symbol, interval, limit=limit, start_time=start_time)
+    strategy_registry.data_planner = DataPlanner(strategy_needs(), cache=KlineCache(download=download))
+
+    failures = []
+    with tempfile.TemporaryDirectory() as root:
+        profiling.PROFILE_DIR = root
+        capture = profiling.Capture(seconds, user_id="alice", directory=root)
+        profiling._capture = capture
+        capture._thread.start()
+
+        stop = threading.Event()
+        workers = [threading.Thread(target=workload, args=(stop, user), name=f"strategy-{user}")
+                   for user in ["alice", "bob"]]
+        for worker in workers:
+            worker.start()
+        capture._thread.join()
+        stop.set()
+        for worker in workers:
+            worker.join()
+
+        with open(capture.files["folded"]) as f:
+            folded = [line.rsplit(" ", 1) for line in f.read().splitlines()]
+        with open(capture.files["trace"]) as f:
+            events = json.load(f)["traceEvents"]
+
+    if not folded or not all(count.isdigit() for _, count in folded):
+        failures.append("folded stacks do not parse")
+    if not any("evaluate_strategy" in stack for stack, _ in folded):
+        failures.append("no samples inside evaluate_strategy")
+    spans = [event for event in events if event["ph"] == "X"]
+    names = {event["name"] for event in spans}
+    for stage in ["fetch", "indicators", "signal", "trade"]:
+        if stage not in names:
+            failures.append(f"no {stage} spans")
+    if any(event["args"].get("user_id") == "bob" for event in spans):
+        failures.append("spans from a user outside the filter")
+
+    samples = sum(int(count) for _, count in folded)
+    print(f"capture: {samples} samples in {len(folded)} stacks, {len(spans)} spans ({', '.join(sorted(names))})")
+    for stage in ["fetch", "indicators", "signal", "trade"]:
+        durations = sorted(event["dur"] for event in spans if event["name"] == stage)
+        if durations:
+            print(f"  {stage:<11} {len(durations):>5} spans, p50 {durations[len(durations) // 2] / 1000:.2f} ms")
+
+    print("\nOK" if not failures else "\nFAILED: " + "; ".join(failures))
+    return len(failures)
+
+
+if __name__ == "__main__":
+    sys.exit(1 if main(*sys.argv[1:2]) else 0)
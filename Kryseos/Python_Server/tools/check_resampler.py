@@ -0,0 +1,122 @@
+"""
+Checks IncrementalResampler against pandas and shows what the data planner saves.
+
+1. Feeds synthetic base klines (with random gaps) bar by bar into the
+   resampler for every timeframe the strategies use and compares the result
+   with `resample_closed` over the same bars, after each of several cut-off
+   points.
+2. Times one incremental update against re-resampling the whole window, as
+   each evaluation used to.
+3. Counts kline series and REST requests per symbol for one evaluation of
+   every strategy: the old per-strategy downloads against the planner.
+
+    python tools/check_resampler.py [base_bars]
+"""
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from data_planner import DataPlanner
+from market_data import KlineCache, klines_to_frame, resample_closed
+from resampler import IncrementalResampler, timeframe_ms
+from strategy_registry import strategy_needs
+from kline_stream_server import ServerClock, synthetic_klines
+
+# What each strategy downloaded before the planner: (interval, bars)
+OLD_DOWNLOADS = [("1d", 61), ("1h", 23 * 16), ("8h", 100), ("1d", 65), ("1d", 30), ("1h", 51 * 10)]
+
+
+def compare(rows, timeframe, base_ms):
+    resampler = IncrementalResampler(timeframe_ms(timeframe), base_ms, max_bars=10 ** 6)
+    for row in rows:
+        resampler.update(row[0], *(float(v) for v in row[1:6]))
+    ours = resampler.frame()
+
+    expected = resample_closed(klines_to_frame(rows), timeframe)
+    if rows[0][0] % timeframe_ms(timeframe):
+        expected = expected.iloc[1:]  # the resampler leaves a partial first bucket out
+    expected = expected[["open", "high", "low", "close", "volume"]]
+
+    same_index = ours.index.equals(expected.index)
+    same_values = same_index and np.allclose(ours.to_numpy(), expected.to_numpy(), rtol=1e-12, equal_nan=True)
+    return same_index and same_values, len(ours)
+
+
+class CountingDownload:
+    def __init__(self, clock):
+        self.clock = clock
+        self.requests = 0
+        self.keys = set()
+
+    def __call__(self, symbol, interval, limit=None, start_time=None):
+        self.requests += 1
+        self.keys.add((symbol, interval))
+        return synthetic_klines(self.clock, symbol, interval, limit=limit, start_time=start_time)
+
+
+def main(base_bars=3000):
+    base_bars = int(base_bars)
+    clock = ServerClock()
+    needs = strategy_needs()
+    planner = DataPlanner(needs, cache=KlineCache(download=lambda *a, **k: []))
+    base_ms = planner.base_ms
+    print(f"Timeframes {sorted(needs, key=timeframe_ms)} from {planner.base_interval} base bars "
+          f"({planner.window} per symbol)\n")
+
+    rng = random.Random(11)
+    rows = synthetic_klines(clock, "BTCUSDT", planner.base_interval, limit=base_bars)[:-1]
+    rows = [row for row in rows if rng.random() > 0.01]  # about 1% of the base bars missing
+    failures = 0
+    for timeframe in sorted(needs, key=timeframe_ms):
+        for cut in [len(rows) // 3 + 1, len(rows) // 2 + 3, len(rows)]:
+            for offset in [0, 1, 5]:
+                ok, bars = compare(rows[offset:cut], timeframe, base_ms)
+                failures += not ok
+        print(f"{timeframe:>4}: {'matches' if ok else 'DIFFERS from'} resample_closed ({bars} bars)")
+
+    # One evaluation's worth of new data: incremental update vs resampling the window
+    frame = klines_to_frame(rows[-planner.window:])
+    resampler = IncrementalResampler(timeframe_ms("16h"), base_ms)
+    for row in rows[:-1]:
+        resampler.update(row[0], *(float(v) for v in row[1:6]))
+    started = time.perf_counter()
+    for _ in range(200):
+        resample_closed(frame, "16h")
+    full = (time.perf_counter() - started) / 200
+    started = time.perf_counter()
+    for _ in range(200):
+        resampler.last_open = rows[-2][0]
+        resampler.update(rows[-1][0], *(float(v) for v in rows[-1][1:6]))
+    step = (time.perf_counter() - started) / 200
+    print(f"\nresample {planner.window} bars: {full * 1000:.2f} ms   incremental update: {step * 1e6:.1f} us")
+
+    # Series and requests per symbol for one evaluation of every strategy, twice, with the
+    # cache's refresh throttle expiring in between as it does between bar closes
+    old, new = CountingDownload(clock), CountingDownload(clock)
+    cache = KlineCache(download=old, min_refresh_seconds=0.5)
+    planner = DataPlanner(needs, cache=KlineCache(download=new, min_refresh_seconds=0.5))
+    counts = []
+    for _ in range(2):
+        before = old.requests, new.requests
+        for interval, bars in OLD_DOWNLOADS:
+            cache.get_klines("BTCUSDT", interval, bars + 1)
+        for timeframe, lookback in needs.items():
+            planner.bars("BTC/USD", timeframe, lookback)
+        counts.append((old.requests - before[0], new.requests - before[1]))
+        time.sleep(0.6)
+    (old_cold, new_cold), (old_next, new_next) = counts
+    print("\nper symbol      series  requests (first cycle)  requests (next cycle)")
+    print(f"per strategy    {len(old.keys):>6}  {old_cold:>22}  {old_next:>21}")
+    print(f"planner         {len(new.keys):>6}  {new_cold:>22}  {new_next:>21}")
+
+    print("\nOK" if failures == 0 else f"\nFAILED ({failures} mismatches)")
+    return failures
+
+
+if __name__ == "__main__":
+    sys.exit(1 if main(*sys.argv[1:2]) else 0)
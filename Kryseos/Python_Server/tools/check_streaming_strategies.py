@@ -0,0 +1,127 @@
+"""
+Checks the streaming strategy indicators against the full-frame ones.
+
+Steps a clock through synthetic klines one base bar at a time and, after
+every step, evaluates each streaming strategy with the BarStream the data
+planner keeps (fed each bar as it closes). The indicator columns
+`check_signal_*` reads, and the signal, must match the original
+`indicators_*` run over every bar since the stream was warmed up, and the
+signal must match the one from the lookback frame evaluations used before.
+Also times one evaluation each way.
+
+    python tools/check_streaming_strategies.py [steps]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from data_planner import DataPlanner
+from market_data import INTERVAL_MS, to_binance_symbol
+from strategy_registry import STRATEGY_REGISTRY, strategy_needs
+from kline_stream_server import synthetic_kline, synthetic_klines
+
+SYMBOL = "BTC/USD"
+TOLERANCE = 1e-9
+
+
+class ManualClock:
+    def __init__(self, now_ms):
+        self.ms = now_ms
+
+    def now_ms(self):
+        return self.ms
+
+
+class SyntheticCache:
+    """`synthetic_klines` with the closed bars generated once."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.closed = {}
+
+    def get_klines(self, symbol, interval, limit):
+        length = INTERVAL_MS[interval]
+        current = self.clock.now_ms() // length * length
+        rows = []
+        for open_ms in range(current - (limit - 1) * length, current, length):
+            row = self.closed.get((symbol, interval, open_ms))
+            if row is None:
+                k = synthetic_kline(symbol, interval, open_ms)
+                row = self.closed[(symbol, interval, open_ms)] = [k["t"], k["o"], k["h"], k["l"], k["c"], k["v"], k["T"]]
+            rows.append(row)
+        return rows + synthetic_klines(self.clock, symbol, interval, limit=1)
+
+
+def compare(streamed, expected, check):
+    """Largest relative difference (inf when the NaN masks or bars differ) and whether the signals agree."""
+    expected = expected.iloc[-len(streamed):]
+    ours, theirs = streamed.to_numpy(dtype=float), expected[list(streamed.columns)].to_numpy(dtype=float)
+    if not streamed.index.equals(expected.index) or not np.array_equal(np.isnan(ours), np.isnan(theirs)):
+        diff = np.inf
+    else:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            diff = np.nanmax(np.abs(ours - theirs) / np.maximum(np.abs(theirs), 1.0), initial=0.0)
+    return diff, check(streamed, SYMBOL) == check(expected, SYMBOL)
+
+
+def main(steps=1000):
+    steps = int(steps)
+    needs = strategy_needs()
+    clock = ManualClock(1_700_000_000_000)
+    cache = SyntheticCache(clock)
+    planner = DataPlanner(needs, cache=cache, clock=lambda: clock.ms / 1000)
+    # Holds every bar the streams will see, for the reference computation
+    history = DataPlanner({tf: lookback + steps for tf, lookback in needs.items()}, cache=cache,
+                          clock=lambda: clock.ms / 1000)
+    base_ms = INTERVAL_MS[planner.base_interval]
+    specs = [spec for spec in STRATEGY_REGISTRY.values() if spec.stream is not None]
+
+    stats = {spec.name: {"diff": 0.0, "signals": 0, "mismatched": 0, "live_mismatched": 0,
+                         "stream": 0.0, "frame": 0.0} for spec in specs}
+    seeds = {}
+    for _ in range(steps):
+        clock.ms += base_ms
+        rows = planner.closed_base_bars(SYMBOL)
+        history_rows = history.closed_base_bars(SYMBOL)
+        for spec in specs:
+            stat = stats[spec.name]
+            started = time.perf_counter()
+            streamed = planner.stream(SYMBOL, spec.timeframe, spec.name, spec.stream, rows)
+            middle = time.perf_counter()
+            live = spec.indicators(planner.bars(SYMBOL, spec.timeframe, spec.lookback, rows), SYMBOL)
+            stat["stream"] += middle - started
+            stat["frame"] += time.perf_counter() - middle
+
+            # The stream was warmed from the bars the planner held on its first call
+            seed = seeds.setdefault(spec.name, planner._resamplers[(to_binance_symbol(SYMBOL), spec.timeframe)]
+                                    .columns["open_time"][0])
+            bars = history.bars(SYMBOL, spec.timeframe, spec.lookback + steps, history_rows)
+            reference = spec.indicators(bars[bars.index >= np.datetime64(seed, "ms")].copy(), SYMBOL)
+
+            diff, same = compare(streamed, reference, spec.check)
+            stat["diff"] = max(stat["diff"], diff)
+            stat["mismatched"] += not same
+            stat["signals"] += spec.check(streamed, SYMBOL) is not None
+            stat["live_mismatched"] += spec.check(streamed, SYMBOL) != spec.check(live, SYMBOL)
+
+    failures = 0
+    print(f"{steps} {planner.base_interval} bars on {SYMBOL}\n")
+    print(f"{'strategy':<10} {'max diff':>9} {'signals':>8} {'mismatched':>11} "
+          f"{'vs lookback':>12} {'stream':>9} {'frame':>9}")
+    for name, stat in stats.items():
+        ok = stat["diff"] <= TOLERANCE and stat["mismatched"] == 0 and stat["live_mismatched"] == 0
+        failures += not ok
+        print(f"{name:<10} {stat['diff']:>9.1e} {stat['signals']:>8} {stat['mismatched']:>11} "
+              f"{stat['live_mismatched']:>12} "
+              f"{stat['stream'] / steps * 1e6:>7.0f}us {stat['frame'] / steps * 1e6:>7.0f}us{'' if ok else '  FAILED'}")
+
+    print("\nOK" if failures == 0 else f"\nFAILED ({failures} strategies)")
+    return failures
+
+
+if __name__ == "__main__":
+    sys.exit(1 if main(*sys.argv[1:2]) else 0)
@@ -0,0 +1,116 @@
+"""
+Import-time budget check for the server modules.
+
+Each module is imported in a fresh interpreter with `-X importtime`; the
+report shows what the module adds to startup and its heaviest imports, and
+the script exits non-zero when a module goes over its budget.
+
+    python tools/import_budget.py [--top N]
+"""
+import argparse
+import base64
+import os
+import subprocess
+import sys
+import tempfile
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# Cumulative import time allowed per module, in milliseconds
+BUDGETS_MS = {
+    "market_data": 1000,
+    "indicators": 300,
+    "streaming_indicators": 50,
+    "Model_strategy_BTC_ETH": 1000,
+    "inference": 300,
+    "scheduler": 100,
+    "signal_service": 50,
+    "TradeExecutor": 2500,
+    "services": 3000,
+    "routes": 3500,
+    "app": 4000,
+}
+
+# Modules that must never be imported just by starting the server
+FORBIDDEN = ["tensorflow", "keras", "joblib"]
+
+
+def measure(module):
+    env = dict(os.environ)
+    env.setdefault("FERNET_KEY", base64.urlsafe_b64encode(os.urandom(32)).decode())
+    env["PYTHONPATH"] = SERVER_DIR + os.pathsep + env.get("PYTHONPATH", "")
+
+    # Run from a scratch directory: app.py writes a .env next to where it starts
+    with tempfile.TemporaryDirectory() as cwd:
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=cwd, env=env, capture_output=True, text=True
+        )
+
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        try:
+            self_us, cumulative_us = int(parts[0]), int(parts[1])
+        except ValueError:
+            continue
+        name = parts[2].rstrip()
+        entries.append((name.strip(), len(name) - len(name.lstrip()), self_us, cumulative_us))
+    return result.returncode, result.stderr, entries
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--top", type=int, default=5, help="heaviest direct imports to list per module")
+    args = parser.parse_args()
+
+    failures = []
+    for module, budget in BUDGETS_MS.items():
+        code, stderr, entries = measure(module)
+        if code != 0:
+            print(f"{module:<24} FAILED TO IMPORT")
+            errors = [line for line in stderr.splitlines() if not line.startswith("import time:")]
+            print("    " + (errors[-1] if errors else "unknown error"))
+            failures.append(module)
+            continue
+
+        position = max((i for i, e in enumerate(entries) if e[0] == module), default=None)
+        if position is None:
+            print(f"{module:<24} not found in import trace")
+            failures.append(module)
+            continue
+        _, depth, _, cumulative_us = entries[position]
+        total_ms = cumulative_us / 1000
+        status = "ok" if total_ms <= budget else "OVER BUDGET"
+        print(f"{module:<24} {total_ms:>9.1f} ms  (budget {budget} ms)  {status}")
+
+        # A module's own imports are listed just before it, one level deeper
+        children = []
+        for entry in reversed(entries[:position]):
+            if entry[1] <= depth:
+                break
+            if entry[1] == depth + 2:
+                children.append(entry)
+        children.sort(key=lambda e: -e[3])
+        for name, _, _, cumulative_us in children[:args.top]:
+            print(f"    {name:<32} {cumulative_us / 1000:>9.1f} ms")
+
+        loaded = {e[0].split(".")[0] for e in entries}
+        for name in FORBIDDEN:
+            if name in loaded:
+                print(f"    imports {name} at startup")
+                status = "OVER BUDGET"
+
+        if status != "ok":
+            failures.append(module)
+
+    if failures:
+        print(f"\n❌ Over budget: {', '.join(failures)}")
+        sys.exit(1)
+    print("\n✅ All modules within budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Loads the Raw_Data CSVs into the local candle store.
+
+Every CSV has its own schema; the backtest loaders already normalize them
+to ascending OHLCV bars, so this maps each onto a (symbol, interval) series.
+Bars already in the store (e.g. appended from live klines) win over the
+CSVs, and earlier sources in SOURCES win over later ones, so running the
+tool again is safe.
+
+    python tools/ingest_raw_data.py [store_dir]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from backtest import DATASETS
+from candle_store import CandleStore, CANDLE_STORE_DIR, PRICE_COLUMNS
+from market_data import INTERVAL_MS
+
+# (symbol, interval) -> backtest datasets, highest priority first
+SOURCES = {
+    ("BTCUSDT", "1d"): ["btc_1d_2018_2025", "btc_daily"],
+    ("ETHUSDT", "1d"): ["eth_1d_2018_2024"]
+}
+
+
+def to_columns(bars):
+    open_time = (bars.index - pd.Timestamp(0)) // pd.Timedelta(milliseconds=1)
+    columns = {column: bars[column].to_numpy(dtype=np.float64) for column in PRICE_COLUMNS}
+    columns["open_time"] = np.asarray(open_time, dtype=np.int64)
+    return columns
+
+
+def merge(layers):
+    """Union of column sets by open time; the first layer holding a bar keeps it."""
+    open_time = np.concatenate([layer["open_time"] for layer in layers])
+    # np.unique keeps the first occurrence of each open time
+    _, first = np.unique(open_time, return_index=True)
+    return {
+        column: np.concatenate([np.asarray(layer[column]) for layer in layers])[first]
+        for column in layers[0]
+    }
+
+
+def main(root=CANDLE_STORE_DIR):
+    store = CandleStore(root)
+    for (symbol, interval), datasets in SOURCES.items():
+        started = time.perf_counter()
+        series = store.series(symbol, interval)
+        layers = [{column: np.array(values) for column, values in series.read().items()}]
+        for dataset in datasets:
+            loader, _ = DATASETS[dataset]
+            layers.append(to_columns(loader()))
+
+        merged = merge(layers)
+        series.replace(merged)
+
+        steps = np.diff(merged["open_time"])
+        gaps = int((steps != INTERVAL_MS[interval]).sum())
+        first, last = (pd.to_datetime(merged["open_time"][[0, -1]], unit="ms").date)
+        print(f"{symbol} {interval}: {len(merged['open_time'])} bars {first} .. {last}, "
+              f"{gaps} gaps, written in {(time.perf_counter() - started) * 1000:.0f} ms")
+    print(f"\nStore: {os.path.abspath(root)}")
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:2])
@@ -0,0 +1,138 @@
+"""
+Stand-in for the Binance kline stream, to run the server's KlineStream locally.
+
+Serves combined-stream messages (`{"stream": ..., "data": {"e": "kline", ...}}`)
+for every stream a connection SUBSCRIBEs to. Klines are synthetic but
+deterministic, so `synthetic_klines` can stand in for the REST endpoint too.
+The server clock runs `speed` times faster than wall time, so hourly bars
+can close every few milliseconds, and `drop_after` closes each connection
+after that many seconds to exercise reconnects and backfills.
+
+    python tools/kline_stream_server.py [port] [speed]
+    BINANCE_STREAM_URL=ws://127.0.0.1:9443/stream uvicorn app:app ...
+
+With the default speed of 1 the clock follows real time, so the app's REST
+backfill from Binance lines up with the streamed bar times.
+"""
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from market_data import INTERVAL_MS
+
+
+class ServerClock:
+    def __init__(self, speed=1.0, start_ms=None):
+        self.speed = speed
+        self.start_ms = int(time.time() * 1000) if start_ms is None else start_ms
+        self.started = time.monotonic()
+
+    def now_ms(self):
+        return int(self.start_ms + (time.monotonic() - self.started) * self.speed * 1000)
+
+    def wall_time(self, server_ms):
+        """Monotonic wall time at which the server clock reads `server_ms`."""
+        return self.started + (server_ms - self.start_ms) / 1000 / self.speed
+
+
+def synthetic_kline(symbol, interval, open_ms, closed=True):
+    length = INTERVAL_MS[interval]
+    rng = random.Random(f"{symbol}-{interval}-{open_ms}")
+    base = 30000.0 if symbol.startswith("BTC") else 2000.0
+    open_price = base * (1 + 0.2 * math.sin(open_ms / 8.64e8))
+    close_price = base * (1 + 0.2 * math.sin((open_ms + length) / 8.64e8))
+    high = max(open_price, close_price) * (1 + abs(rng.gauss(0, 0.004)))
+    low = min(open_price, close_price) * (1 - abs(rng.gauss(0, 0.004)))
+    volume = rng.uniform(100, 1000)
+    return {
+        "t": open_ms, "T": open_ms + length - 1, "s": symbol, "i": interval,
+        "o": f"{open_price:.2f}", "c": f"{close_price:.2f}", "h": f"{high:.2f}", "l": f"{low:.2f}",
+        "v": f"{volume:.4f}", "n": rng.randint(1000, 5000), "x": closed,
+        "q": f"{volume * close_price:.4f}", "V": f"{volume / 2:.4f}", "Q": f"{volume * close_price / 2:.4f}", "B": "0"
+    }
+
+
+def synthetic_klines(clock, symbol, interval, limit=None, start_time=None):
+    """The REST klines endpoint over the same synthetic data, newest bar still forming."""
+    length = INTERVAL_MS[interval]
+    current = clock.now_ms() // length * length
+    if start_time is not None:
+        first = -(-start_time // length) * length
+    else:
+        first = current - (limit - 1) * length
+    return [
+        [k["t"], k["o"], k["h"], k["l"], k["c"], k["v"], k["T"], k["q"], k["n"], k["V"], k["Q"], k["B"]]
+        for k in (synthetic_kline(symbol, interval, t, t < current) for t in range(first, current + 1, length))
+    ]
+
+
+class StandInServer:
+    def __init__(self, clock, tick=0.01, drop_after=None):
+        self.clock = clock
+        self.tick = tick
+        self.drop_after = drop_after
+        self.connections = 0
+
+    async def handler(self, websocket, path=None):
+        self.connections += 1
+        subscribed = {}  # stream name -> (symbol, interval, open time of the bar sent last)
+        connected_at = time.monotonic()
+
+        async def read_requests():
+            async for text in websocket:
+                request = json.loads(text)
+                for name in request.get("params", []):
+                    if request.get("method") == "SUBSCRIBE":
+                        symbol, interval = name.split("@kline_")
+                        length = INTERVAL_MS[interval]
+                        subscribed[name] = (symbol.upper(), interval, self.clock.now_ms() // length * length)
+                    elif request.get("method") == "UNSUBSCRIBE":
+                        subscribed.pop(name, None)
+                await websocket.send(json.dumps({"result": None, "id": request.get("id")}))
+
+        reader = asyncio.create_task(read_requests())
+        try:
+            while not reader.done():
+                if self.drop_after is not None and time.monotonic() - connected_at > self.drop_after:
+                    break
+                now = self.clock.now_ms()
+                for name, (symbol, interval, last_open) in list(subscribed.items()):
+                    length = INTERVAL_MS[interval]
+                    current = now // length * length
+                    for open_ms in range(last_open, current, length):
+                        await self._send(websocket, name, synthetic_kline(symbol, interval, open_ms))
+                    await self._send(websocket, name, synthetic_kline(symbol, interval, current, closed=False))
+                    if name in subscribed:
+                        subscribed[name] = (symbol, interval, current)
+                await asyncio.sleep(self.tick)
+        except Exception:
+            pass
+        finally:
+            reader.cancel()
+            await websocket.close()
+
+    @staticmethod
+    async def _send(websocket, name, k):
+        await websocket.send(json.dumps({"stream": name, "data": {"e": "kline", "E": k["t"], "s": k["s"], "k": k}}))
+
+    async def serve(self, host="127.0.0.1", port=9443):
+        import websockets
+        return await websockets.serve(self.handler, host, port)
+
+
+async def main(port=9443, speed=1.0):
+    server = StandInServer(ServerClock(speed), tick=1.0 if speed <= 1 else 0.01)
+    await server.serve(port=port)
+    print(f"Kline stand-in on ws://127.0.0.1:{port}/stream at {speed}x")
+    await asyncio.Future()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:3]
+    asyncio.run(main(int(args[0]) if args else 9443, float(args[1]) if len(args) > 1 else 1.0))
@@ -0,0 +1,112 @@
+"""
+Latency of an unrelated endpoint (GET /) while several accounts run
+performance analyses against a slow broker.
+
+The app is served in-process over ASGI, with a throwaway database in a
+temporary directory. "blocking" reproduces the old analysis that called
+the broker straight from the coroutine; "bridged" is the current
+`analyze_trading_performance`, which goes through `BrokerSession.run`.
+
+    python tools/load_test.py [slow_accounts] [broker_delay_ms] [requests]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+from cryptography.fernet import Fernet
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, SERVER_DIR)
+
+
+class SlowAlpaca:
+    def __init__(self, delay):
+        self.delay = delay
+
+    def get_account(self):
+        time.sleep(self.delay)
+        return SimpleNamespace(equity="10000", account_number="PA0", cash="5000", currency="USD")
+
+    def list_orders(self, **kwargs):
+        time.sleep(self.delay)
+        return []
+
+
+async def blocking_analysis(api, user_id):
+    """The broker part of the analysis as it used to run: on the event loop."""
+    api.get_account()
+    api.list_orders(status="filled", limit=100)
+
+
+async def measure(client, requests, analyses, interval=0.01):
+    """
+    Sends GET / every `interval` seconds and times each from when it was due,
+    so requests held up behind a blocked loop count their whole wait.
+    """
+    latencies = []
+    loop = asyncio.get_running_loop()
+
+    async def probe():
+        start = loop.time()
+        for k in range(requests):
+            due = start + k * interval
+            await asyncio.sleep(max(due - loop.time(), 0))
+            response = await client.get("/")
+            latencies.append(loop.time() - due)
+            assert response.status_code == 200
+
+    started = time.perf_counter()
+    await asyncio.gather(probe(), *analyses)
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)], elapsed
+
+
+async def main(accounts=8, delay_ms=500, requests=200):
+    import logging
+    import httpx
+    from app import app
+    from broker import BrokerSession
+    from database import init_db, AsyncSessionLocal
+    from models import User
+    from TradeExecutor import analyze_trading_performance
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    await init_db()
+    async with AsyncSessionLocal() as session:
+        session.add_all([
+            User(user_id=f"load-{i}", api_key="-", api_secret="-", account="-", equity=[])
+            for i in range(accounts)
+        ])
+        await session.commit()
+
+    delay = delay_ms / 1000
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        await client.get("/")
+        print(f"GET / x{requests} while {accounts} accounts analyse against a {delay_ms} ms broker\n")
+        print(f"{'mode':<10} {'p50':>10} {'p99':>10} {'wall':>8}")
+
+        for mode in ["idle", "blocking", "bridged"]:
+            if mode == "idle":
+                analyses = []
+            elif mode == "blocking":
+                analyses = [blocking_analysis(SlowAlpaca(delay), f"load-{i}") for i in range(accounts)]
+            else:
+                analyses = [
+                    analyze_trading_performance(BrokerSession(SlowAlpaca(delay)), f"load-{i}")
+                    for i in range(accounts)
+                ]
+            p50, p99, elapsed = await measure(client, requests, analyses)
+            print(f"{mode:<10} {p50 * 1000:>7.1f} ms {p99 * 1000:>7.1f} ms {elapsed:>6.1f} s")
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("FERNET_KEY", Fernet.generate_key().decode())
+    with tempfile.TemporaryDirectory() as scratch:
+        # app.py and database.py work relative to the current directory
+        os.chdir(scratch)
+        asyncio.run(main(*(int(arg) for arg in sys.argv[1:4])))
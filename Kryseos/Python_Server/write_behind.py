@@ -0,0 +1,215 @@
+import asyncio
+import os
+import time
+from collections import deque
+
+from sqlalchemy import insert, inspect
+from sqlalchemy.dialects import postgresql, sqlite
+
+import metrics
+from database import AsyncSessionLocal
+from models import EquitySnapshot, FilledOrder, PerformanceState
+
+FLUSH_INTERVAL_SECONDS = float(os.getenv("WRITE_BEHIND_INTERVAL_SECONDS", "0.05"))
+MAX_BATCH_ROWS = int(os.getenv("WRITE_BEHIND_MAX_BATCH_ROWS", "2000"))
+
+db_commit_seconds = metrics.histogram("kryseos_db_commit_seconds", "Write-behind batch transaction duration")
+
+
+# Dialects with INSERT ... ON CONFLICT DO UPDATE; others merge row by row
+_UPSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+def _row(obj):
+    """Column values of an ORM object, leaving out unset generated keys."""
+    row = {}
+    for column in inspect(obj).mapper.columns:
+        value = getattr(obj, column.key)
+        if value is None and column.primary_key:
+            continue
+        row[column.key] = value
+    return row
+
+
+def _coalesce_key(obj):
+    """Rows with the same key in one batch collapse to the last one written."""
+    if isinstance(obj, EquitySnapshot):
+        return ("equity", obj.user_id)
+    if isinstance(obj, FilledOrder):
+        return ("order", obj.order_id)
+    if isinstance(obj, PerformanceState):
+        return ("state", obj.user_id)
+    return ("row", id(obj))
+
+
+class _UserWrites:
+    def __init__(self):
+        self.adds = {}
+        self.merges = {}
+        self.waiters = []
+
+
+class WriteBehind:
+    """
+    Collects equity and order writes from every user and commits them
+    together, one transaction per `interval`, instead of one commit per
+    analysis fighting over the database's writer lock.
+
+    `write` queues new rows (`add`) and rows to upsert by primary key
+    (`merge`) as ORM objects; a batch stores them with one executemany per
+    table. It returns once the batch holding them has committed, so
+    the caller reads its own writes afterwards. Within a batch a user's
+    equity snapshots collapse to the latest, as do their performance state
+    and fills with the same order id. If a batch fails, each user's writes
+    are retried in their own transaction so one bad row only fails its
+    owner. Without a running flush loop, `write` commits immediately.
+    """
+
+    def __init__(self, session_factory=AsyncSessionLocal, interval=FLUSH_INTERVAL_SECONDS,
+                 max_batch_rows=MAX_BATCH_ROWS):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.max_batch_rows = max_batch_rows
+        self._pending = {}
+        self._pending_rows = 0
+        self._wakeup = None
+        self._task = None
+        self._closing = False
+
+        self.batches = 0
+        self.rows = 0
+        self.coalesced = 0
+        self.failed = 0
+        self.flush_times = deque(maxlen=1000)
+
+    def start(self):
+        if self._task is None:
+            self._closing = False
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """
+        Stops the flush loop and commits whatever is still queued. The loop
+        is asked to exit rather than cancelled, so a batch it is committing
+        finishes first.
+        """
+        task = self._task
+        if task is not None:
+            self._closing = True
+            self._wakeup.set()
+            await task
+            self._task = None
+        await self.flush()
+
+    async def write(self, user_id, add=(), merge=()):
+        pending = self._pending.setdefault(user_id, _UserWrites())
+        for target, objects in [(pending.adds, add), (pending.merges, merge)]:
+            for obj in objects:
+                key = _coalesce_key(obj)
+                if key in target:
+                    self.coalesced += 1
+                else:
+                    self._pending_rows += 1
+                target[key] = obj
+        waiter = asyncio.get_running_loop().create_future()
+        pending.waiters.append(waiter)
+
+        if self._task is None:
+            await self.flush()
+        elif self._pending_rows >= self.max_batch_rows:
+            self._wakeup.set()
+        await waiter
+
+    async def flush(self):
+        if not self._pending:
+            return
+        batch, self._pending, self._pending_rows = self._pending, {}, 0
+        started = time.perf_counter()
+        try:
+            try:
+                await self._commit(batch)
+            except Exception as e:
+                print(f"[write-behind] batch of {len(batch)} users failed ({e}), retrying per user")
+                for user_id, writes in batch.items():
+                    try:
+                        await self._commit({user_id: writes})
+                    except Exception as user_error:
+                        self.failed += 1
+                        print(f"[write-behind] writes for {user_id} failed: {user_error}")
+                        self._settle(writes, user_error)
+                    else:
+                        self._settle(writes)
+            else:
+                for writes in batch.values():
+                    self._settle(writes)
+        finally:
+            # Interrupted (e.g. cancelled) before every user was settled: nobody waits forever
+            interrupted = RuntimeError("write-behind flush was interrupted")
+            for writes in batch.values():
+                self._settle(writes, interrupted)
+        self.flush_times.append(time.perf_counter() - started)
+
+    async def _commit(self, batch):
+        adds, merges = {}, {}
+        for writes in batch.values():
+            for target, objects in [(adds, writes.adds), (merges, writes.merges)]:
+                for obj in objects.values():
+                    target.setdefault(type(obj), []).append(_row(obj))
+
+        started = time.perf_counter()
+        async with self.session_factory() as session:
+            upsert = _UPSERTS.get(session.bind.dialect.name)
+            for model, rows in merges.items():
+                if upsert is None:
+                    for row in rows:
+                        await session.merge(model(**row))
+                    continue
+                statement = upsert(model.__table__)
+                keys = [column.name for column in model.__table__.primary_key]
+                await session.execute(statement.on_conflict_do_update(
+                    index_elements=keys,
+                    set_={name: statement.excluded[name] for name in rows[0] if name not in keys}
+                ), rows)
+            for model, rows in adds.items():
+                await session.execute(insert(model), rows)
+            await session.commit()
+        db_commit_seconds.observe(time.perf_counter() - started)
+        self.batches += 1
+        self.rows += sum(len(writes.adds) + len(writes.merges) for writes in batch.values())
+
+    @staticmethod
+    def _settle(writes, error=None):
+        for waiter in writes.waiters:
+            if waiter.done():
+                continue
+            if error is None:
+                waiter.set_result(None)
+            else:
+                waiter.set_exception(error)
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"[write-behind] flush failed: {e}")
+
+    def stats(self):
+        times = sorted(self.flush_times)
+        return {
+            "batches": self.batches,
+            "rows": self.rows,
+            "coalesced": self.coalesced,
+            "failed": self.failed,
+            "pending_users": len(self._pending),
+            "flush_p50_ms": round(times[len(times) // 2] * 1000, 2) if times else None
+        }
+
+
+write_behind = WriteBehind()
@@ -0,0 +1,174 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+import metrics
+
+MAX_PENDING = int(os.getenv("WS_MAX_PENDING", "8"))
+SEND_TIMEOUT_SECONDS = float(os.getenv("WS_SEND_TIMEOUT_SECONDS", "5"))
+
+ws_send_seconds = metrics.histogram("kryseos_ws_send_seconds", "Time to write one message to a WebSocket")
+
+
+class Subscriber:
+    """One WebSocket: its pending messages and the task that writes them."""
+
+    def __init__(self, bus, topic, websocket):
+        self.bus = bus
+        self.topic = topic
+        self.websocket = websocket
+        # Message key -> (text, published_at); a newer message with the same key replaces an unsent one
+        self.pending = OrderedDict()
+        self.ready = asyncio.Event()
+        self.task = None
+        self.closed = False
+
+    def offer(self, key, text, published_at):
+        if self.closed:
+            return
+        if key in self.pending:
+            self.bus.coalesced += 1
+            self.pending.move_to_end(key)
+        elif len(self.pending) >= self.bus.max_pending:
+            # Too far behind to catch up: drop the consumer rather than hold others back
+            self.bus.dropped += 1
+            self.bus.unsubscribe(self, close=True)
+            return
+        self.pending[key] = (text, published_at)
+        self.ready.set()
+
+    async def run(self):
+        try:
+            while True:
+                await self.ready.wait()
+                while self.pending:
+                    _, (text, published_at) = self.pending.popitem(last=False)
+                    started = time.perf_counter()
+                    await asyncio.wait_for(self.websocket.send_text(text), self.bus.send_timeout)
+                    ws_send_seconds.observe(time.perf_counter() - started)
+                    self.bus.record_delivery(published_at)
+                self.ready.clear()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[ws] send failed for {self.topic}: {e}")
+            self.bus.unsubscribe(self, close=True)
+
+
+class WebSocketBus:
+    """
+    Publish/subscribe for WebSocket messages, owned by the server's event loop.
+
+    `publish` can be called from any thread: the message is serialized once
+    and handed to the loop, which queues it on every subscriber of the
+    topic. Each socket is written by its own task, so a slow client only
+    delays itself; while it lags, newer messages of the same kind replace
+    older unsent ones, and a client with too many kinds outstanding is
+    disconnected.
+    """
+
+    def __init__(self, max_pending=MAX_PENDING, send_timeout=SEND_TIMEOUT_SECONDS):
+        self.max_pending = max_pending
+        self.send_timeout = send_timeout
+        self.loop = None
+        self.topics = {}
+
+        self.published = 0
+        self.delivered = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.latencies = deque(maxlen=10000)
+        self._stats_lock = threading.Lock()
+
+    def start(self):
+        self.loop = asyncio.get_running_loop()
+
+    def subscribe(self, topic, websocket):
+        if self.loop is None:
+            self.start()
+        subscriber = Subscriber(self, topic, websocket)
+        self.topics.setdefault(topic, set()).add(subscriber)
+        subscriber.task = self.loop.create_task(subscriber.run())
+        return subscriber
+
+    def unsubscribe(self, subscriber, close=False):
+        subscriber.closed = True
+        subscribers = self.topics.get(subscriber.topic)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self.topics[subscriber.topic]
+        if subscriber.task is not None and subscriber.task is not asyncio.current_task():
+            subscriber.task.cancel()
+        if close:
+            self.loop.create_task(self._close(subscriber.websocket))
+
+    async def _close(self, websocket):
+        try:
+            await websocket.close()
+        except Exception:
+            pass
+
+    async def close_topic(self, topic):
+        for subscriber in list(self.topics.get(topic, ())):
+            self.unsubscribe(subscriber)
+            await self._close(subscriber.websocket)
+
+    def subscriber_count(self, topic=None):
+        if topic is not None:
+            return len(self.topics.get(topic, ()))
+        return sum(len(subscribers) for subscribers in self.topics.values())
+
+    @staticmethod
+    def encode(kind, data, **fields):
+        return json.dumps({"type": kind, **fields, "data": data})
+
+    def publish(self, topic, kind, data, key=None, **fields):
+        """Sends `{"type": kind, **fields, "data": data}` to every socket of `topic`. Safe from any thread."""
+        text = self.encode(kind, data, **fields)
+        published_at = time.perf_counter()
+        with self._stats_lock:
+            self.published += 1
+        if self.loop is None:
+            return
+
+        try:
+            in_loop = asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            in_loop = False
+        if in_loop:
+            self._deliver(topic, key or kind, text, published_at)
+        else:
+            self.loop.call_soon_threadsafe(self._deliver, topic, key or kind, text, published_at)
+
+    def send_to(self, subscriber, kind, data, key=None, **fields):
+        """Queues a message for one socket only (e.g. the state sent on connect)."""
+        subscriber.offer(key or kind, self.encode(kind, data, **fields), time.perf_counter())
+
+    def _deliver(self, topic, key, text, published_at):
+        for subscriber in list(self.topics.get(topic, ())):
+            subscriber.offer(key, text, published_at)
+
+    def record_delivery(self, published_at):
+        self.delivered += 1
+        self.latencies.append(time.perf_counter() - published_at)
+
+    def stats(self):
+        latencies = sorted(self.latencies)
+        return {
+            "topics": len(self.topics),
+            "subscribers": self.subscriber_count(),
+            "published": self.published,
+            "delivered": self.delivered,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+            "latency_ms_p50": latencies[len(latencies) // 2] * 1000 if latencies else None,
+            "latency_ms_p99": latencies[int(len(latencies) * 0.99)] * 1000 if latencies else None
+        }
+
+
+ws_bus = WebSocketBus()
+metrics.gauge("kryseos_open_sockets", "Connected WebSocket subscribers", ws_bus.subscriber_count)